@@ -0,0 +1,119 @@
+import time
+from collections import deque
+
+import cv2
+
+
+class StableDecode:
+    """
+    Decides when a payload has been read steadily enough to act on.
+
+    update() is fed every decode result (with the pipeline's result
+    sequence number, so a result shown on several UI frames is only counted
+    once). A payload is committed after it has been the decoded payload for
+    `frames` consecutive results. A committed payload is then ignored until
+    something else (another code, or nothing) has been seen for `frames`
+    results, so a code left in front of the camera is not committed twice.
+    """
+
+    def __init__(self, frames=3):
+        self.frames = frames
+        self.committed = None
+        self._candidate = None
+        self._count = 0
+        self._last_seq = None
+
+    def update(self, seq, payload):
+        """
+        Returns:
+            str: The payload to commit now, or None.
+        """
+        if seq == self._last_seq:
+            return None
+        self._last_seq = seq
+
+        if payload == self._candidate:
+            self._count += 1
+        else:
+            self._candidate = payload
+            self._count = 1
+
+        if self._count < self.frames:
+            return None
+        if payload == self.committed:
+            return None
+        if payload is None:
+            # The committed code has left the view
+            self.committed = None
+            return None
+        self.committed = payload
+        return payload
+
+    def reset(self):
+        self.committed = None
+        self._candidate = None
+        self._count = 0
+
+
+class ScanRate:
+    """Completed scans per minute, over the last `window` seconds and over the whole session."""
+
+    def __init__(self, window=60.0):
+        self.window = window
+        self.total = 0
+        self._times = deque()
+        self._started = time.monotonic()
+
+    def record(self):
+        now = time.monotonic()
+        self.total += 1
+        self._times.append(now)
+        self._expire(now)
+
+    def _expire(self, now):
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+
+    def per_minute(self):
+        """Scans per minute over the rolling window (or since start, if that is shorter)."""
+        now = time.monotonic()
+        self._expire(now)
+        span = min(self.window, now - self._started)
+        return len(self._times) * 60.0 / span if span > 0 else 0.0
+
+    def session_per_minute(self):
+        elapsed = time.monotonic() - self._started
+        return self.total * 60.0 / elapsed if elapsed > 0 else 0.0
+
+
+class Banner:
+    """
+    A non-blocking message drawn across the bottom of the video frame for a
+    few seconds, used instead of a modal messagebox in auto-scan mode.
+    """
+
+    def __init__(self, font=cv2.FONT_HERSHEY_SIMPLEX, font_scale=0.9, thickness=2):
+        self.font = font
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self.text = None
+        self.color = (255, 255, 255)
+        self._until = 0.0
+
+    def show(self, text, color, seconds=2.0):
+        self.text = text
+        self.color = color
+        self._until = time.monotonic() + seconds
+
+    def draw(self, frame):
+        if self.text is None or time.monotonic() >= self._until:
+            return
+        lines = self.text.split("\n")
+        line_height = cv2.getTextSize("Ag", self.font, self.font_scale, self.thickness)[0][1] + 14
+        top = frame.shape[0] - 50 - line_height * len(lines)
+        cv2.rectangle(frame, (0, top - 10), (frame.shape[1], top + line_height * len(lines)), (0, 0, 0), -1)
+        for i, line in enumerate(lines):
+            width = cv2.getTextSize(line, self.font, self.font_scale, self.thickness)[0][0]
+            x = max(10, (frame.shape[1] - width) // 2)
+            cv2.putText(frame, line, (x, top + line_height * (i + 1) - 10), self.font, self.font_scale,
+                        self.color, self.thickness, cv2.LINE_AA)
@@ -0,0 +1,240 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from fileOperation import checkDf as cmp
+from fileOperation.checkDf import extract_quantity
+from fileOperation.masterData import get_master_data, DEFAULT_CSV_PATH
+from frameSource import ImageFolderSource, open_source
+from scanPipeline import DECODE_PATHS
+
+logger = logging.getLogger(__name__)
+
+RECORD_FIELDS = [
+    'source', 'frame', 'kind', 'payload', 'product_id', 'csv_customer_id',
+    'qty', 'match', 'csv_main_part', 'qr2_main_part', 'error',
+]
+
+# --- Frame decoding (runs in worker processes) ---
+
+def _decode_image_file(path, decode_path):
+    frame = cv2.imread(path)
+    if frame is None:
+        logger.error("Could not read image: %s", path)
+        return []
+    return DECODE_PATHS[decode_path](frame)
+
+
+def _decode_array(frame, decode_path):
+    return DECODE_PATHS[decode_path](frame)
+
+
+def decode_image_folder(executor, folder, decode_path):
+    """Yields (source, frame_number, decoded) for every image in folder, in file-name order."""
+    paths = ImageFolderSource(folder).paths
+    logger.debug("Found %s images in %s", len(paths), folder)
+    results = executor.map(_decode_image_file, paths, [decode_path] * len(paths), chunksize=16)
+    for number, (path, decoded) in enumerate(zip(paths, results)):
+        yield os.path.basename(path), number, decoded
+
+
+def decode_source(executor, spec, decode_path, frame_step=1, max_frames=None, max_in_flight=64):
+    """
+    Yields (source, frame_number, decoded) for every frame_step-th frame of a
+    video file, stream URL or any other frameSource.open_source spec.
+
+    Frames are read in this process and decoded in the pool; at most
+    max_in_flight frames are queued so long videos do not fill memory.
+    Reading stops after max_frames frames, if given. Synthetic sources never
+    run out of frames, so they require max_frames.
+
+    Raises:
+        ValueError: If frame_step is below 1, or for a synthetic source without max_frames.
+    """
+    if frame_step < 1:
+        raise ValueError(f"frame_step must be at least 1, got {frame_step}")
+    if spec.startswith('synthetic:') and max_frames is None:
+        raise ValueError("A synthetic source never ends; give the number of frames to read")
+    cap = open_source(spec)
+    if not cap.isOpened():
+        cap.release()
+        raise IOError(f"Could not open video: {spec}")
+
+    source = cap.name
+    pending = deque()
+    number = 0
+    try:
+        while max_frames is None or number < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if number % frame_step == 0:
+                pending.append((number, executor.submit(_decode_array, frame, decode_path)))
+            number += 1
+            while len(pending) >= max_in_flight:
+                done_number, future = pending.popleft()
+                yield source, done_number, future.result()
+        while pending:
+            done_number, future = pending.popleft()
+            yield source, done_number, future.result()
+    finally:
+        cap.release()
+
+
+# --- ProductID lookup and comparison ---
+
+class BatchMatcher:
+    """
+    Replays the interactive workflow over a stream of decoded frames.
+
+    A payload containing a ProductID from the CSV becomes the current
+    product; any other payload seen while a product is current is treated
+    as the customer QR and compared with checkDf.compare_ids. A code that
+    stays in view over consecutive frames is only reported once.
+    """
+
+    def __init__(self, master_data, slices):
+        self.master_data = master_data
+        self.slices = slices  # (start_a, end_a, start_b, end_b) or None to skip comparison
+        self.product_id = None
+        self.previous_payloads = set()
+        self.counts = {'frames': 0, 'codes': 0, 'product': 0, 'customer': 0, 'unknown': 0, 'match': 0}
+
+    def process(self, source, frame_number, decoded):
+        """Returns the records for the codes that newly appeared in this frame."""
+        self.counts['frames'] += 1
+        payloads = [data for data, _ in decoded]
+        records = []
+        for payload in payloads:
+            if payload in self.previous_payloads:
+                continue
+            self.counts['codes'] += 1
+            records.append(self._classify(source, frame_number, payload))
+        self.previous_payloads = set(payloads)
+        return records
+
+    def _classify(self, source, frame_number, payload):
+        record = dict.fromkeys(RECORD_FIELDS)
+        record.update(source=source, frame=frame_number, payload=payload, qty=extract_quantity(payload))
+
+        product = self.master_data.find_product(payload)
+        if product is not None:
+            self.product_id, record['csv_customer_id'] = product
+            record.update(kind='product', product_id=self.product_id)
+        elif self.product_id is None:
+            record['kind'] = 'unknown'
+        else:
+            record.update(kind='customer', product_id=self.product_id)
+            if self.slices is not None:
+                result = cmp.compare_ids(self.product_id, payload, *self.slices,
+                                         csv_file_path=self.master_data.csv_path, master_data=self.master_data)
+                record.update(match=result.match, csv_customer_id=result.csv_customer_id,
+                              csv_main_part=result.csv_main_part, qr2_main_part=result.qr2_main_part,
+                              error=result.error)
+                if result.match:
+                    self.counts['match'] += 1
+                    self.product_id = None
+
+        self.counts[record['kind']] += 1
+        return record
+
+
+# --- Output ---
+
+class RecordWriter:
+    """Streams records to a .jsonl or .csv file, chosen by extension."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._csv = None
+        if path.lower().endswith('.csv'):
+            self._csv = csv.DictWriter(self._file, fieldnames=RECORD_FIELDS)
+            self._csv.writeheader()
+
+    def write(self, record):
+        if self._csv is not None:
+            self._csv.writerow(record)
+        else:
+            self._file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+def run_batch(input_path, output_path, csv_file_path=DEFAULT_CSV_PATH, slices=None,
+              workers=None, decode_path='pil', frame_step=1, max_frames=None):
+    """
+    Decodes a folder of images or a video file and writes one record per new code.
+
+    Returns:
+        dict: Summary counters (frames, codes, product/customer/unknown, match, seconds).
+    """
+    master_data = get_master_data(csv_file_path)
+    matcher = BatchMatcher(master_data, slices)
+    writer = RecordWriter(output_path)
+    start = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            if os.path.isdir(input_path):
+                frames = decode_image_folder(executor, input_path, decode_path)
+            else:
+                frames = decode_source(executor, input_path, decode_path, frame_step=frame_step,
+                                       max_frames=max_frames)
+            for source, frame_number, decoded in frames:
+                for record in matcher.process(source, frame_number, decoded):
+                    writer.write(record)
+    finally:
+        writer.close()
+
+    summary = dict(matcher.counts, seconds=time.perf_counter() - start)
+    return summary
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless batch decode of image folders and video files")
+    parser.add_argument("input", help="directory of images, a video file/stream URL or 'synthetic:PAYLOAD,...'")
+    parser.add_argument("-o", "--output", required=True, help="output .jsonl or .csv file")
+    parser.add_argument("--csv", default=DEFAULT_CSV_PATH, help="master CSV with ProductID/CustomerID")
+    parser.add_argument("--slices", type=int, nargs=4, metavar=('START_A', 'END_A', 'START_B', 'END_B'),
+                        help="CustomerID slicing parameters; without them customer codes are not compared")
+    parser.add_argument("--workers", type=int, default=None, help="decode processes (default: CPU count)")
+    parser.add_argument("--decode-path", choices=sorted(DECODE_PATHS), default='pil')
+    parser.add_argument("--frame-step", type=positive_int, default=1, help="decode every Nth video frame")
+    parser.add_argument("--frames", type=positive_int, default=None,
+                        help="stop after reading this many video frames (required for 'synthetic:' input)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format="%(levelname)s: %(message)s")
+
+    if args.input.startswith('synthetic:'):
+        if args.frames is None:
+            parser.error("synthetic input never ends; give --frames")
+    elif '://' not in args.input and not os.path.exists(args.input):
+        print(f"Error: Input not found: {args.input}", file=sys.stderr)
+        sys.exit(1)
+
+    summary = run_batch(args.input, args.output, csv_file_path=args.csv, slices=args.slices,
+                        workers=args.workers, decode_path=args.decode_path, frame_step=args.frame_step,
+                        max_frames=args.frames)
+    fps = summary['frames'] / summary['seconds'] if summary['seconds'] else 0.0
+    print(f"Processed {summary['frames']} frames ({fps:.1f} frames/s): {summary['codes']} codes, "
+          f"{summary['product']} product, {summary['customer']} customer, {summary['unknown']} unknown, "
+          f"{summary['match']} matches", file=sys.stderr)
@@ -0,0 +1,333 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Frame scenarios: (width, height), codes per frame, Gaussian blur kernel (0 = sharp)
+FRAME_SIZES = [(640, 480), (1280, 720), (1920, 1080)]
+CODE_COUNTS = [1, 4]
+BLUR_LEVELS = [0, 5, 9]
+
+LOOKUP_ROWS = [1_000, 10_000, 100_000, 1_000_000]
+
+# Relative change beyond which a metric counts as a regression
+DEFAULT_THRESHOLD = 0.25
+# The same for p95/p99 latencies, which move by tens of percent between identical runs
+TAIL_THRESHOLD = 1.0
+
+# Each benchmark runs this many times; every metric is the median over the rounds
+DEFAULT_ROUNDS = 3
+
+
+# --- Synthetic data ---
+
+def synthetic_frame(payloads, frame_size=(640, 480), blur=0, noise=0.0, seed=0):
+    """
+    Renders the payloads as QR codes (with qr_generate's settings) in a grid
+    on a white BGR frame, then applies Gaussian blur and noise.
+    """
+    from qr_generate import make_qr_image
+
+    width, height = frame_size
+    columns = int(np.ceil(np.sqrt(len(payloads))))
+    rows = int(np.ceil(len(payloads) / columns))
+    cell = min(width // columns, height // rows)
+    code_size = int(cell * 0.8)
+
+    frame = np.full((height, width), 255, np.uint8)
+    for i, payload in enumerate(payloads):
+        code = np.array(make_qr_image(payload).convert('L'))
+        code = cv2.resize(code, (code_size, code_size), interpolation=cv2.INTER_NEAREST)
+        x0 = (i % columns) * cell + (cell - code_size) // 2
+        y0 = (i // columns) * cell + (cell - code_size) // 2
+        frame[y0:y0 + code_size, x0:x0 + code_size] = code
+
+    if blur:
+        frame = cv2.GaussianBlur(frame, (blur | 1, blur | 1), 0)
+    if noise:
+        rng = np.random.default_rng(seed)
+        frame = np.clip(frame + rng.normal(0, noise, frame.shape), 0, 255).astype(np.uint8)
+    return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+
+
+def synthetic_ids(rows):
+    """ProductIDs and CustomerIDs shaped like the ones in userr.csv."""
+    product_ids = [f"PID{n:08d}" for n in range(rows)]
+    customer_ids = [f"HHID3{n:08d}ID0018" for n in range(rows)]
+    return product_ids, customer_ids
+
+
+def write_master_csv(path, rows):
+    product_ids, customer_ids = synthetic_ids(rows)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write("ProductID,CustomerID\n")
+        f.writelines(f"{p},{c}\n" for p, c in zip(product_ids, customer_ids))
+    return product_ids, customer_ids
+
+
+def _latency(samples):
+    """p50/p95/p99 in microseconds of a list of durations in seconds."""
+    p50, p95, p99 = np.quantile(np.asarray(samples), [0.5, 0.95, 0.99]) * 1e6
+    return {'p50_us': float(p50), 'p95_us': float(p95), 'p99_us': float(p99)}
+
+
+# --- Benchmarks ---
+# Each returns {metric name: {'value', 'unit', 'better': 'higher' | 'lower'}}
+
+def bench_decode(frame_sizes=FRAME_SIZES, code_counts=CODE_COUNTS, blur_levels=BLUR_LEVELS,
+                 repeat=10, paths=None):
+    """Frames per second and decode success rate of each decode path on synthetic frames."""
+    from scanPipeline import DECODE_PATHS
+
+    results = {}
+    for name, decoder in (paths or DECODE_PATHS).items():
+        for frame_size in frame_sizes:
+            for count in code_counts:
+                for blur in blur_levels:
+                    payloads = [f"HHIDPID{n:08d}ID{n % 10000:04d}" for n in range(count)]
+                    frame = synthetic_frame(payloads, frame_size, blur=blur)
+                    decoder(frame)  # warm-up
+
+                    found = 0
+                    start = time.perf_counter()
+                    for _ in range(repeat):
+                        found += len({data for data, _ in decoder(frame)} & set(payloads))
+                    elapsed = time.perf_counter() - start
+
+                    key = f"decode.{name}.{frame_size[0]}x{frame_size[1]}.codes{count}.blur{blur}"
+                    results[f"{key}.fps"] = {'value': repeat / elapsed, 'unit': 'frames/s', 'better': 'higher'}
+                    results[f"{key}.found"] = {'value': found / (repeat * count), 'unit': 'fraction',
+                                               'better': 'higher'}
+    return results
+
+
+def bench_lookup(row_counts=LOOKUP_ROWS, lookups=2000, workdir=None):
+    """Master CSV load time and ProductID lookup latency for both index kinds."""
+    from fileOperation.masterData import read_master_csv
+    from fileOperation.productIndex import ProductIndex, SortedProductIndex
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for rows in row_counts:
+        path = os.path.join(workdir, f"userr_{rows}.csv")
+        product_ids, _ = write_master_csv(path, rows)
+
+        start = time.perf_counter()
+        df = read_master_csv(path)
+        results[f"lookup.{rows}.csv_load_s"] = {'value': time.perf_counter() - start, 'unit': 's',
+                                                'better': 'lower'}
+
+        payloads = [f"LBL-{product_ids[i]}-0009" for i in rng.integers(0, rows, lookups)]
+        for kind, cls in (('dict', ProductIndex), ('sorted', SortedProductIndex)):
+            start = time.perf_counter()
+            index = cls.from_dataframe(df)
+            results[f"lookup.{rows}.{kind}.build_s"] = {'value': time.perf_counter() - start, 'unit': 's',
+                                                        'better': 'lower'}
+            samples = []
+            for payload in payloads:
+                start = time.perf_counter()
+                index.find(payload)
+                samples.append(time.perf_counter() - start)
+            for stat, value in _latency(samples).items():
+                results[f"lookup.{rows}.{kind}.{stat}"] = {'value': value, 'unit': 'us', 'better': 'lower'}
+    return results
+
+
+def bench_compare(rows=10_000, calls=2000, workdir=None):
+    """checkDf.compare_ids latency against a cached master CSV, and the file-based compare() wrapper."""
+    from fileOperation import checkDf
+    from fileOperation.masterData import get_master_data
+
+    path = os.path.join(workdir, f"userr_compare_{rows}.csv")
+    product_ids, customer_ids = write_master_csv(path, rows)
+    get_master_data(path)  # load once, as the scanner does at startup
+
+    rng = np.random.default_rng(1)
+    picks = rng.integers(0, rows, calls)
+    samples = []
+    for i in picks:
+        start = time.perf_counter()
+        checkDf.compare_ids(product_ids[i], customer_ids[i], 4, 14, 4, 14, csv_file_path=path)
+        samples.append(time.perf_counter() - start)
+    results = {f"compare.ids.{stat}": {'value': value, 'unit': 'us', 'better': 'lower'}
+               for stat, value in _latency(samples).items()}
+
+    # The older file-based entry point re-reads both IDs from files on every call.
+    # The input files are written up front, so only compare() itself is timed.
+    file_pairs = []
+    for n, i in enumerate(picks[:calls // 4]):
+        file_1 = os.path.join(workdir, f"compare_qr1_{n}.txt")
+        file_2 = os.path.join(workdir, f"compare_qr2_{n}.txt")
+        with open(file_1, 'w') as f:
+            f.write(product_ids[i])
+        with open(file_2, 'w') as f:
+            f.write(customer_ids[i])
+        file_pairs.append((file_1, file_2))
+    samples = []
+    for file_1, file_2 in file_pairs:
+        start = time.perf_counter()
+        checkDf.compare(file_1, file_2, 4, 14, 4, 14, csv_file_path=path)
+        samples.append(time.perf_counter() - start)
+    if samples:
+        results.update({f"compare.files.{stat}": {'value': value, 'unit': 'us', 'better': 'lower'}
+                        for stat, value in _latency(samples).items()})
+    return results
+
+
+def bench_generation(codes=500, workers=None, workdir=None):
+    """Bulk QR generation rate, uncached and from a warm QrImageCache."""
+    from qrCache import QrImageCache
+    from qr_generate import generate_bulk
+
+    source = os.path.join(workdir, "generate_source.csv")
+    write_master_csv(source, codes)
+    cache = QrImageCache(os.path.join(workdir, "qr_cache"))
+
+    results = {}
+    for label, use_cache in (('uncached', None), ('cold_cache', cache), ('warm_cache', cache)):
+        output = os.path.join(workdir, f"labels_{label}.zip")
+        stats = generate_bulk(source, output, output_format='zip', workers=workers, cache=use_cache)
+        results[f"generate.{label}.codes_per_s"] = {'value': stats['codes_per_second'], 'unit': 'codes/s',
+                                                    'better': 'higher'}
+    return results
+
+
+BENCHMARKS = {
+    'decode': bench_decode,
+    'lookup': bench_lookup,
+    'compare': bench_compare,
+    'generate': bench_generation,
+}
+
+
+def environment():
+    import pandas
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'pandas': pandas.__version__,
+    }
+
+
+def run(names=tuple(BENCHMARKS), quick=False, rounds=DEFAULT_ROUNDS):
+    """
+    Runs the named benchmarks in a temporary directory.
+
+    With quick=True the scenario grid is reduced (one frame size, lookup up
+    to 100k rows, fewer calls) for a fast smoke run. Each benchmark runs
+    `rounds` times, each time in a fresh directory (so caches start cold
+    again), and every metric is the median over the rounds.
+
+    Returns:
+        dict: {'created', 'environment', 'quick', 'results': {metric: {...}}}
+    """
+    options = {
+        'decode': {'frame_sizes': FRAME_SIZES[:1], 'blur_levels': BLUR_LEVELS[:2], 'repeat': 3} if quick else {},
+        'lookup': {'row_counts': LOOKUP_ROWS[:3], 'lookups': 500} if quick else {},
+        'compare': {'calls': 500} if quick else {},
+        'generate': {'codes': 100} if quick else {},
+    }
+    samples = {}
+    with tempfile.TemporaryDirectory(prefix="bht-bench-") as workdir:
+        for name in names:
+            logger.info("Running %s benchmark", name)
+            started = time.perf_counter()
+            for number in range(rounds):
+                kwargs = dict(options[name])
+                if name != 'decode':
+                    kwargs['workdir'] = os.path.join(workdir, f"{name}-{number}")
+                    os.makedirs(kwargs['workdir'])
+                for metric, entry in BENCHMARKS[name](**kwargs).items():
+                    samples.setdefault(metric, []).append(entry)
+            logger.info("%s benchmark finished in %.1fs", name, time.perf_counter() - started)
+
+    results = {metric: dict(entries[0], value=float(np.median([entry['value'] for entry in entries])))
+               for metric, entries in samples.items()}
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': environment(),
+        'quick': quick,
+        'rounds': rounds,
+        'results': results,
+    }
+
+
+def compare_runs(current, baseline, threshold=DEFAULT_THRESHOLD, tail_threshold=TAIL_THRESHOLD):
+    """
+    Compares two run() results metric by metric. p95/p99 latencies are
+    held to tail_threshold instead of threshold.
+
+    Returns:
+        list: (metric, baseline value, current value, relative change, status)
+              tuples, where status is 'regression', 'improvement' or 'ok'.
+              The relative change is signed so that positive is always better.
+    """
+    rows = []
+    for metric, entry in sorted(current['results'].items()):
+        old = baseline.get('results', {}).get(metric)
+        if old is None or not old['value']:
+            continue
+        change = (entry['value'] - old['value']) / abs(old['value'])
+        if entry.get('better') == 'lower':
+            change = -change
+        limit = tail_threshold if metric.endswith(('.p95_us', '.p99_us')) else threshold
+        status = 'regression' if change < -limit else ('improvement' if change > limit else 'ok')
+        rows.append((metric, old['value'], entry['value'], change, status))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the decode, lookup, compare and generation hot paths")
+    parser.add_argument("benchmarks", nargs='*', metavar="BENCHMARK",
+                        help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative change counted as a regression (default: 0.25)")
+    parser.add_argument("--tail-threshold", type=float, default=TAIL_THRESHOLD,
+                        help="the same for p95/p99 latencies (default: 1.0)")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS,
+                        help="runs of each benchmark; the median of each metric is reported (default: 3)")
+    parser.add_argument("--quick", action="store_true", help="smaller scenario grid for a fast run")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    # The per-call debug output of checkDf would dominate the compare timings
+    logging.getLogger('fileOperation').setLevel(logging.WARNING)
+
+    report = run(args.benchmarks or tuple(BENCHMARKS), quick=args.quick, rounds=args.rounds)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    for metric, entry in sorted(report['results'].items()):
+        print(f"{metric:<55} {entry['value']:>14.3f} {entry['unit']}")
+    print(f"\nResults written to '{args.output}'")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare_runs(report, baseline, args.threshold, args.tail_threshold)
+        regressions = [row for row in rows if row[4] == 'regression']
+        print(f"\nCompared with '{args.baseline}' ({baseline.get('created', 'unknown date')}):")
+        for metric, old, new, change, status in rows:
+            if status != 'ok':
+                print(f"{status.upper():<12} {metric:<55} {old:>12.3f} -> {new:>12.3f} ({change:+.1%})")
+        print(f"{len(regressions)} regressions, "
+              f"{sum(1 for row in rows if row[4] == 'improvement')} improvements, {len(rows)} metrics compared")
+        sys.exit(1 if regressions else 0)
@@ -1,16 +1,12 @@
 import cv2
 import sys
+from frameSource import WebcamSource
 
-def initialize_camera():
-    # Try different camera indices and backends
-    for i in range(0, 3):  # Try indices 0-2
-        # Try different backends
-        for backend in [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]:
-            cap = cv2.VideoCapture(i, backend)
-            if cap.isOpened():
-                print(f"Camera opened at index {i} with backend {backend}")
-                return cap
-            cap.release()
+def initialize_camera(width=None, height=None, fps=None):
+    # Try camera indices 0-2 with the platform's capture backends
+    cap = WebcamSource(width=width, height=height, fps=fps)
+    if cap.isOpened():
+        return cap
     
     print("ERROR: Could not open any camera", file=sys.stderr)
     print("Troubleshooting steps:")
@@ -1,126 +1,278 @@
+import time
+
+# Measured from here: the startup budget covers our imports, not interpreter start-up
+_IMPORT_START = time.perf_counter()
+
 import cv2
-from pyzbar.pyzbar import decode
-from PIL import Image
+import argparse
+import logging
 import os
-import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import pandas as pd
 from fileOperation import checkDf as cmp
-import tkinter as tk
-from tkinter import simpledialog, messagebox
+from fileOperation.checkDf import extract_quantity
+from fileOperation.masterData import get_master_data, master_fingerprint, MasterDataWatcher
+from fileOperation.matchLog import MatchLogWriter, BACKENDS as LOG_BACKENDS
+from fileOperation.scanDedup import ScanDeduplicator, PAIR_LIST_NAME
+from fileOperation.scanDb import ScanDatabase
+from scanPipeline import ScanPipeline, DECODE_PATHS
+from frameSource import open_source
+from autoScan import StableDecode, ScanRate, Banner
+from multiScan import classify_codes, pair_codes, compare_pairs, pair_quantities, PairResult
+from metrics import METRICS, draw_overlay, serve_metrics
+from hudOverlay import OverlayLayer, TextLine, wrap
+from siteProfile import (DEFAULT_PROFILE_PATH, load_site_profile, save_site_profile, profile_slices, slices_profile,
+                         options_argv)
 import re
 
-# --- GUI Helper Function ---
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
 
-def get_integer_input_gui(prompt, title):
-    root = tk.Tk()
-    root.withdraw()
-    while True:
-        try:
-            value = simpledialog.askinteger(title, prompt)
-            if value is None:
-                messagebox.showinfo("Cancelled", "Input cancelled. Exiting application.")
-                return None
-            return value
-        except ValueError:
-            messagebox.showerror("Invalid Input", "Invalid input. Please enter an integer.")
-        finally:
-            # Ensure the Tkinter window is properly destroyed, especially important in loops
+logger = logging.getLogger(__name__)
+
+# Seconds from import to the first displayed frame, excluding time spent in dialogs
+STARTUP_BUDGET = 0.8
+
+# Socket timeout for the validation service in thin-client mode; a request blocks the UI for at most this
+SERVICE_TIMEOUT = 1.0
+
+SLICE_PROMPTS = [
+    ("Enter start index for CSV CustomerID (main part): ", "CSV Main Start"),
+    ("Enter end index for CSV CustomerID (main part): ", "CSV Main End"),
+    ("Enter start index for QR2 CustomerID (main part): ", "QR2 Main Start"),
+    ("Enter end index for QR2 CustomerID (main part): ", "QR2 Main End"),
+]
+
+# --- GUI Helper Functions ---
+# tkinter is only imported once a dialog is actually shown, so scanning with a
+# saved site profile in auto mode never loads it
+
+def _messagebox():
+    from tkinter import messagebox
+    return messagebox
+
+
+def get_integer_input_gui(prompt, title, parent=None):
+    import tkinter as tk
+    from tkinter import simpledialog, messagebox
+
+    root = parent
+    if root is None:
+        root = tk.Tk()
+        root.withdraw()
+    try:
+        while True:
+            try:
+                value = simpledialog.askinteger(title, prompt, parent=root)
+                if value is None:
+                    messagebox.showinfo("Cancelled", "Input cancelled. Exiting application.", parent=root)
+                    return None
+                return value
+            except ValueError:
+                messagebox.showerror("Invalid Input", "Invalid input. Please enter an integer.", parent=root)
+    finally:
+        # Ensure the Tkinter window is properly destroyed if we created it
+        if parent is None:
             try:
                 root.destroy()
-            except:
+            except Exception:
                 pass
 
-# --- Helper function to extract quantity from QR data ---
 
-def extract_quantity(qr_data):
-    """Extracts the last 4 characters of the QR code data as the quantity."""
-    if qr_data is None:
-        return ""
-    # Ensure the data is treated as a string and handle potential encoding issues if needed
-    data_str = str(qr_data).strip()
-    
-    # We assume the quantity is strictly the last 4 characters
-    if len(data_str) >= 4:
-        return data_str[-4:]
+def ask_slice_parameters():
+    """
+    Asks for the four CustomerID slicing parameters in one Tk session.
+
+    Returns:
+        tuple: (start_a, end_a, start_b, end_b), or None if the user cancelled.
+    """
+    import tkinter as tk
+    from tkinter import messagebox
+
+    root = tk.Tk()
+    root.withdraw()
+    try:
+        messagebox.showinfo("Input Parameters",
+                            "Please enter the string slicing parameters for the main part.\n\n"
+                            "These define which parts of the CustomerID strings will be compared.", parent=root)
+        values = []
+        for prompt, title in SLICE_PROMPTS:
+            value = get_integer_input_gui(prompt, title, parent=root)
+            if value is None:
+                return None
+            values.append(value)
+        messagebox.showinfo("Parameters Set", "Parameters set. Initializing camera...", parent=root)
+        return tuple(values)
+    finally:
+        root.destroy()
+
+def report_startup(phases, started, dialog_seconds, budget):
+    """
+    Logs how long the scanner took to show its first frame, broken down by
+    phase, and warns when that is over budget. Time spent in dialogs is not
+    counted.
+    """
+    total = phases['imports'] + time.perf_counter() - started - dialog_seconds
+    METRICS.observe('startup', total)
+    breakdown = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in phases.items())
+    if total > budget:
+        logger.warning("Ready to scan in %.2fs, over the %.2fs startup budget (%s)", total, budget, breakdown)
     else:
-        # If the string is shorter than 4 characters, return the whole string or handle as needed
-        return data_str
+        logger.info("Ready to scan in %.2fs (%s)", total, breakdown)
 
 # --- Main QR Scanning and Comparison Function ---
 
-def scan_and_compare_qrcodes():
+def scan_and_compare_qrcodes(use_process_pool=False, decode_workers=None, decode_path='pil',
+                             adaptive=None, source=None, log_backend='tsv', log_fsync_interval=5.0,
+                             dedup_window=300, remember_pairs=False, auto_scan=False, stable_frames=3, result_hold=1.5,
+                             multi_code=False, reload_interval=2.0, show_metrics=False, metrics_port=None,
+                             slices=None, site=None, profile_path=DEFAULT_PROFILE_PATH,
+                             startup_budget=STARTUP_BUDGET, server=None):
+    """
+    Runs the interactive product/customer scan workflow.
+
+    Args:
+        use_process_pool (bool): Decode frames in a process pool instead of a single thread.
+        decode_workers (int): Number of decode processes (defaults to the CPU count).
+        decode_path (str): 'pil' for the original RGB/PIL decode, 'gray' for the
+                           buffer-reusing grayscale path, 'cascade' for the
+                           escalating preprocessing cascade for hard-to-read labels.
+        adaptive (dict): AdaptiveDecoder options to enable ROI tracking and
+                         frame skipping, or None to decode every full frame.
+        source (str): Frame source for frameSource.open_source: a camera index,
+                      video file/stream URL, image folder or "synthetic:..." spec.
+                      None probes the first available webcam.
+        log_backend (str): Match log format: 'tsv', 'sqlite' or 'parquet'.
+        log_fsync_interval (float): Seconds between match log fsyncs (0 = every batch).
+        dedup_window (float): Seconds after a product/customer pair is logged during which
+                              it is not logged again, or None to disable duplicate suppression.
+        remember_pairs (bool): Also never log a pair again that was logged in any earlier
+                               session. Logged pairs are kept in scanned_pairs.json.
+        auto_scan (bool): Commit a code by itself once it has decoded identically for
+                          stable_frames consecutive results, advance from the result
+                          after result_hold seconds, and show results as on-screen
+                          banners instead of message boxes. 's' still works.
+        stable_frames (int): Consecutive identical decodes needed to commit a code in auto mode.
+        result_hold (float): Seconds a comparison result stays on screen in auto mode.
+        multi_code (bool): Decode every code in the frame, tell product from customer
+                           codes with the ProductID index, pair each product code with
+                           the nearest customer code and compare all pairs at once.
+        reload_interval (float): Seconds between checks of the master CSV for changes; a
+                                 changed file is reloaded in the background without
+                                 interrupting scanning. None disables reloading.
+        show_metrics (bool): Start with the FPS/latency overlay shown ('m' toggles it).
+        metrics_port (int): Serve stage timings in Prometheus text format on
+                            http://127.0.0.1:<port>/metrics, or None for no endpoint.
+        slices (tuple): (start_a, end_a, start_b, end_b) CustomerID slicing parameters.
+                        None takes them from the site profile, or asks for them.
+        site (str): Site whose saved profile supplies the slicing parameters; parameters
+                    entered in the dialogs are saved to it for the next launch.
+        profile_path (str): JSON file holding the site profiles.
+        startup_budget (float): Seconds from import to the first displayed frame (excluding
+                                dialogs) above which a slow start is logged as a warning.
+        server (str): "host:port" of a scanService validation service. The scanner then
+                      runs as a thin client: lookups and comparisons go to the service,
+                      which also keeps the match log, scan database and duplicate list,
+                      so the local CSV, logs and hot reload are not used.
+    """
     script_dir = os.path.dirname(os.path.abspath(__file__))
     output_dir = script_dir
     
-    # Define file paths for temporary storage and output
-    # This file stores the matched ProductID from CSV, which is needed for the cmp.compare lookup
-    qr1_content_for_cmp_file = os.path.join(output_dir, "qr_1_content_for_cmp.txt") 
-    qr2_content_file = os.path.join(output_dir, "qr_2_content.txt") # Stores raw QR2 content
+    # Define file paths for input and output
     csv_file_path = os.path.join(output_dir, 'userr.csv')
     
     # New output file for logging successful matches
     match_log_file = os.path.join(output_dir, "match_log.txt")
-
-    print(f"DEBUG: Script directory: {script_dir}")
-    print(f"DEBUG: Expected csv_file_path: {csv_file_path}")
-    print(f"DEBUG: Expected match_log_file path: {match_log_file}")
-
-    # Initial cleanup of temporary files
-    for f in [qr1_content_for_cmp_file, qr2_content_file]:
-        if os.path.exists(f):
-            print(f"DEBUG: Removing existing temporary file: {f}")
-            os.remove(f)
-    
-    # Load and preprocess CSV data
-    try:
-        df = pd.read_csv(csv_file_path, encoding='utf-8-sig', engine='python', sep=',', on_bad_lines='skip')
-        
-        df.columns = df.columns.str.strip().str.lower()
-
-        if 'productid' not in df.columns or 'customerid' not in df.columns:
-            messagebox.showerror("CSV Column Error", f"Error: 'productid' or 'customerid' column not found in the CSV file.\nAvailable columns: {df.columns.tolist()}")
+    # Every logged product/customer pair, for the long-term duplicate check (remember_pairs)
+    pair_list_file = os.path.join(output_dir, PAIR_LIST_NAME)
+    # Local database of every compared scan (query it with: python -m fileOperation.scanDb query)
+    scan_db_file = os.path.join(output_dir, "scans.db")
+
+    logger.debug("Script directory: %s", script_dir)
+    logger.debug("Expected csv_file_path: %s", csv_file_path)
+    logger.debug("Expected match_log_file path: %s", match_log_file)
+
+    startup = {'imports': _IMPORT_SECONDS}
+    started = time.perf_counter()
+
+    # Load the CSV data through the shared master-data store (also used by cmp.compare).
+    # It is parsed in the background while the slicing parameters are resolved and the camera opens.
+    # A thin client only checks that the validation service answers.
+    client = None
+    fingerprint_future = None
+    loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="master-data")
+    if server:
+        from scanService import ScanServiceClient
+        client = ScanServiceClient(server, terminal=site, timeout=SERVICE_TIMEOUT)
+        master_future = loader.submit(client.ping)
+    else:
+        master_future = loader.submit(get_master_data, csv_file_path)
+        if reload_interval:
+            # The hot-reload watcher's starting fingerprint hashes the whole CSV; take it here too
+            fingerprint_future = loader.submit(lambda: master_fingerprint(master_future.result()))
+    loader.shutdown(wait=False)
+
+    # Slicing parameters: explicit, from the saved site profile, or asked for once and saved
+    if slices is None and site:
+        slices = profile_slices(load_site_profile(site, profile_path))
+        if slices is None:
+            logger.info("No saved slicing parameters for site '%s'", site)
+    dialog_seconds = 0.0
+    if slices is None:
+        dialog_start = time.perf_counter()
+        slices = ask_slice_parameters()
+        dialog_seconds = time.perf_counter() - dialog_start
+        if slices is None:
             return
-        
-        df['productid'] = df['productid'].astype(str).str.strip() 
-        df['customerid'] = df['customerid'].astype(str).str.strip() 
+        if site:
+            try:
+                save_site_profile(site, slices_profile(slices), profile_path)
+            except OSError as e:
+                logger.error("Could not save profile for site '%s': %s", site, e)
+    start_a, end_a, start_b, end_b = slices
+    logger.debug("Slicing parameters: CSV[%s:%s], QR2[%s:%s]", start_a, end_a, start_b, end_b)
+
+    # Initialize camera (or another frame source, e.g. a recorded video)
+    camera_start = time.perf_counter()
+    cap = open_source(source)
+    startup['camera'] = time.perf_counter() - camera_start
+    
+    if not cap.isOpened():
+        cap.release()
+        _messagebox().showerror("Camera Error", f"Error: Could not open frame source: {source or 'any webcam'}.")
+        print(f"Error: Could not open frame source: {source or 'any webcam'}.")
+        return
 
+    wait_start = time.perf_counter()
+    try:
+        if client is not None:
+            from scanService import RemoteProductIndex
+            master_data = None
+            rows = master_future.result()['rows']
+            product_index = RemoteProductIndex(client)
+            logger.info("Validating scans on %s:%d (%s CSV rows)", client.host, client.port, rows)
+        else:
+            master_data = master_future.result()
+            product_index = master_data.index
+            logger.debug("Built ProductID index over %s CSV rows", len(product_index))
+
+    except ConnectionError as e:
+        cap.release()
+        _messagebox().showerror("Service Error", f"Error: {e}")
+        return
     except FileNotFoundError:
-        messagebox.showerror("CSV Error", f"Error: CSV file '{csv_file_path}' not found.")
+        cap.release()
+        _messagebox().showerror("CSV Error", f"Error: CSV file '{csv_file_path}' not found.")
         return
-    except Exception as e:
-        messagebox.showerror("CSV Error", f"Error reading CSV file '{csv_file_path}': {e}")
+    except ValueError as e:
+        cap.release()
+        _messagebox().showerror("CSV Column Error", f"Error: {e}")
         return
-
-    # Get slicing parameters from the user via GUI
-    messagebox.showinfo("Input Parameters", 
-                         "Please enter the string slicing parameters for the main part.\n\n"
-                         "These define which parts of the CustomerID strings will be compared.")
-
-    start_a = get_integer_input_gui("Enter start index for CSV CustomerID (main part): ", "CSV Main Start")
-    if start_a is None: return
-    end_a = get_integer_input_gui("Enter end index for CSV CustomerID (main part): ", "CSV Main End")
-    if end_a is None: return
-    start_b = get_integer_input_gui("Enter start index for QR2 CustomerID (main part): ", "QR2 Main Start")
-    if start_b is None: return
-    end_b = get_integer_input_gui("Enter end index for QR2 CustomerID (main part): ", "QR2 Main End")
-    if end_b is None: return
-    
-    messagebox.showinfo("Parameters Set", "Parameters set. Initializing camera...")
-
-    # Initialize camera
-    cap = None
-    for i in range(0, 3):
-        cap = cv2.VideoCapture(i)
-        if cap.isOpened():
-            print(f"Camera opened at index {i}")
-            break
-        if cap: cap.release() 
-    
-    if not cap or not cap.isOpened():
-        messagebox.showerror("Camera Error", "Error: Could not open any webcam.")
-        print("Error: Could not open any webcam.")
+    except Exception as e:
+        cap.release()
+        _messagebox().showerror("CSV Error", f"Error reading CSV file '{csv_file_path}': {e}")
         return
+    startup['master data wait'] = time.perf_counter() - wait_start
 
     # Define workflow states
     SCAN_PRODUCT = 0
@@ -154,101 +306,313 @@ def scan_and_compare_qrcodes():
 
     print("\n=== QR Code Scanner Workflow Started ===")
 
+    # Successful matches are written by a background, batching log writer
+    # (by the validation service, for a thin client)
+    match_log = scan_db = dedup = None
+    if client is None:
+        try:
+            match_log = MatchLogWriter(match_log_file, backend=log_backend, fsync_interval=log_fsync_interval)
+        except Exception as e:
+            cap.release()
+            _messagebox().showerror("Log Error", f"Failed to open match log: {e}")
+            return
+
+        try:
+            scan_db = ScanDatabase(scan_db_file)
+        except Exception as e:
+            logger.error("Scan database disabled, could not open '%s': %s", scan_db_file, e)
+
+    if dedup_window is not None and client is None:
+        try:
+            dedup = ScanDeduplicator(dedup_window, pair_list_file if remember_pairs else None)
+        except Exception as e:
+            logger.error("Duplicate-scan check disabled, could not load '%s': %s", pair_list_file, e)
+
+    # Capture and decoding run in background threads; this loop only draws and handles keys
+    metrics_server = None
+    if metrics_port is not None:
+        try:
+            metrics_server = serve_metrics(metrics_port)
+        except OSError as e:
+            logger.error("Metrics endpoint disabled, could not listen on port %s: %s", metrics_port, e)
+
+    pipeline = ScanPipeline(cap, decoder=DECODE_PATHS[decode_path],
+                            process_pool=use_process_pool, workers=decode_workers,
+                            adaptive=adaptive).start()
+    frame_seq = 0
+
+    # Pick up edits to the master CSV while scanning; the new index is built off-thread
+    watcher = None
+    if reload_interval and client is None:
+        try:
+            # Not waited for: if the hash is not done yet, the watcher thread takes it itself
+            fingerprint = (fingerprint_future.result()
+                           if fingerprint_future.done() and fingerprint_future.exception() is None else None)
+            watcher = MasterDataWatcher(csv_file_path, interval=reload_interval, data=master_data,
+                                        fingerprint=fingerprint).start()
+        except Exception as e:
+            logger.error("Master data hot reload disabled: %s", e)
+
+    # Auto-scan state: results are shown as banners on the video instead of blocking message boxes
+    stable = StableDecode(stable_frames)
+    scan_rate = ScanRate()
+    banner = Banner()
+    result_time = 0.0
+    popups = {'info': 'showinfo', 'warning': 'showwarning', 'error': 'showerror'}
+    banner_colors = {'info': highlight_color, 'warning': warning_color, 'error': warning_color}
+
+    # Multi-code state: pairs in the current frame and the outcome of the last comparison
+    frame_pairs = []
+    multi_key = None
+    multi_results = {}
+
+    panel = OverlayLayer(font, line_type)
+    footer = OverlayLayer(font, line_type)
+
+    def hud_lines():
+        """The status panel for the current state, as TextLines for the cached overlay layer."""
+        small = font_scale * 0.7
+        detail_color = (255, 255, 0)
+        lines = []
+        if multi_code:
+            status_text = f"MULTI: {len(frame_pairs)} product/customer pair(s) in view"
+            action_text = "AUTO: Hold the labels steady" if auto_scan else "Press 's' to COMPARE all pairs in view"
+            status_color = info_color
+            if unpaired_products or unpaired_customers:
+                lines.append(TextLine(f"Unpaired: {len(unpaired_products)} product, {len(unpaired_customers)} customer",
+                                      (20, y_start + y_offset*2), small, detail_color, font_thickness, False))
+        elif current_state == SCAN_PRODUCT:
+            status_text = "STATE: Scan PRODUCT QR"
+            action_text = "AUTO: Hold the product QR steady" if auto_scan else "Press 's' to SAVE product QR & Lookup CSV"
+            status_color = info_color
+        elif current_state == SCAN_CUSTOMER:
+            status_text = "STATE: Scan CUSTOMER QR"
+            action_text = "AUTO: Hold the customer QR steady" if auto_scan else "Press 's' to SAVE customer QR & COMPARE"
+            status_color = info_color
+        elif comparison_result:
+            status_text = "RESULT: MATCH FOUND! (Press 's' for new scan)"
+            action_text = "Press 's' to start NEW product scan"
+            status_color = highlight_color
+        else:
+            status_text = "RESULT: NO MATCH! (Press 's' to rescan customer)"
+            action_text = "Press 's' to RESCAN customer QR"
+            status_color = warning_color
+
+        # Previously scanned data for context
+        if not multi_code and (qr1_product_id or current_state == COMPARE_RESULT):
+            details = [f"Product ID (CSV): {qr1_product_id}", f"CSV Customer ID: {csv_customer_id}",
+                       f"QR1 Qty: {qr1_qty}"]
+            if current_state == COMPARE_RESULT:
+                details.append(f"QR2 Qty: {qr2_qty}")
+            lines += [TextLine(text, (20, y_start + y_offset * (i + 2)), small, detail_color, font_thickness, False)
+                      for i, text in enumerate(details)]
+
+        # Status and action text
+        y_pos = y_start
+        for text, color in ((status_text, status_color), (action_text, text_color)):
+            lines.append(TextLine(text, (20, y_pos), font_scale, color, font_thickness, True))
+            y_pos += y_offset
+
+        # Detected QR data
+        if current_data:
+            lines.append(TextLine("Detected QR Data:", (20, y_pos), font_scale * 0.8, detail_color, font_thickness, False))
+            y_pos += 25
+            for text in wrap(current_data):
+                lines.append(TextLine(text, (20, y_pos), font_scale * 0.8, detail_color, font_thickness, True))
+                y_pos += 25
+        return lines
+
+    def footer_lines(rate_text, frame_shape):
+        height, width = frame_shape[:2]
+        lines = [TextLine("Press 'q' to quit", (10, height - 20), 0.6, (255, 255, 255), 1, False)]
+        if rate_text:
+            text_width = cv2.getTextSize(rate_text, font, 0.6, 1)[0][0]
+            lines.append(TextLine(rate_text, (width - text_width - 10, height - 20), 0.6, (255, 255, 255), 1, False))
+        return lines
+
+    def notify(kind, title, text):
+        if auto_scan:
+            banner.show(text, banner_colors[kind])
+        else:
+            getattr(_messagebox(), popups[kind])(title, text)
+
+    def save_comparison(qr1_content, qr2_content, qty1, qty2, product_id, customer_id, matched):
+        """
+        Records a compared pair in the scan database and, if it matched and is
+        not a duplicate, in the match log. Returns the duplicate check result.
+        """
+        if scan_db:
+            try:
+                scan_db.record(product_id=product_id, customer_id=customer_id,
+                               qr1_content=qr1_content, qr2_content=qr2_content,
+                               qr1_qty=qty1, qr2_qty=qty2, match=matched)
+            except Exception as e:
+                logger.error("Failed to record scan in '%s': %s", scan_db_file, e)
+
+        duplicate = dedup.check(qr1_content, qr2_content) if (matched and dedup) else None
+        if duplicate:
+            when = "just now" if duplicate == 'recent' else "in an earlier session"
+            print(f"Duplicate scan: this product/customer pair was already logged {when}. Not logging again.")
+        elif matched:
+            # Log the successful match
+            # Change made here: Use 'scanned_qr1_raw_content' instead of 'qr1_product_id' 
+            # for the QR1 field in the log file, as requested.
+            # The writer thread batches records to disk; this call does not block on I/O.
+            match_log.log(qr1_content, qr2_content, qty1, qty2,
+                          product_id=product_id, csv_customer_id=customer_id)
+            logger.debug("Queued match for logging to '%s'", match_log.path)
+            if dedup:
+                try:
+                    dedup.record(qr1_content, qr2_content)
+                except Exception as e:
+                    logger.error("Failed to update the logged pair list: %s", e)
+        return duplicate
+
     while True:
-        ret, frame = cap.read()
-        if not ret:
+        latest = pipeline.wait_for_frame(frame_seq)
+        if latest is None:
             print("Failed to grab frame.")
             break
+        frame_seq, frame = latest
+        render_start = time.perf_counter()
+        METRICS.tick('frame')
+
+        # Swap in reloaded master data between frames
+        if watcher is not None and watcher.current is not master_data:
+            master_data = watcher.current
+            product_index = master_data.index
+            logger.info("Master data updated: %d CSV rows", len(product_index))
+            if auto_scan:
+                banner.show(f"Master data updated: {len(product_index)} rows", info_color)
 
         frame = cv2.convertScaleAbs(frame, alpha=1.2, beta=20)
         
-        # Decode QR codes
-        pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        decoded_objects = decode(pil_img)
+        # Use the most recent decode result from the decode workers
+        decode_seq, decoded_objects = pipeline.latest_decode_seq()
         
         current_data = None 
-        if decoded_objects:
-            obj = decoded_objects[0]
-            current_data = obj.data.decode('utf-8').strip()
+        if multi_code:
+            # Outline product codes in yellow and customer codes in magenta, and join
+            # each pair with a line colored by its last comparison. A thin client's index
+            # answers from its cache and looks new payloads up in the background.
+            with METRICS.time('lookup'):
+                products, customers = classify_codes(decoded_objects, product_index)
+            frame_pairs, unpaired_products, unpaired_customers = pair_codes(products, customers)
+            multi_key = tuple(sorted((product.payload, customer.payload) for product, customer in frame_pairs)) or None
+            for code in products + customers:
+                if len(code.points) == 4:
+                    pts = np.array(code.points, np.int32).reshape((-1, 1, 2))
+                    cv2.polylines(frame, [pts], True, info_color if code.product_id else (255, 0, 255), 2)
+            for product, customer in frame_pairs:
+                matched = multi_results.get((product.payload, customer.payload))
+                color = text_color if matched is None else (highlight_color if matched else warning_color)
+                cv2.line(frame, tuple(int(v) for v in product.center), tuple(int(v) for v in customer.center), color, 2)
+        elif decoded_objects:
+            current_data, points = decoded_objects[0]
             
             # Draw polygon around detected QR code
-            points = obj.polygon
             if len(points) == 4:
-                pts = [(p.x, p.y) for p in points]
-                pts = np.array(pts, np.int32).reshape((-1, 1, 2))
+                pts = np.array(points, np.int32).reshape((-1, 1, 2))
                 cv2.polylines(frame, [pts], True, (0, 255, 0), 2)
 
         # --- Display UI and Workflow Status ---
-        y_pos = y_start
-        
-        if current_state == SCAN_PRODUCT:
-            status_text = "STATE: Scan PRODUCT QR"
-            action_text = "Press 's' to SAVE product QR & Lookup CSV"
-            status_color = info_color
-            # Displaying previously scanned data for context
-            if qr1_product_id:
-                cv2.putText(frame, f"Product ID (CSV): {qr1_product_id}", (20, y_pos + y_offset*2), font, font_scale * 0.7, (255, 255, 0), font_thickness, line_type)
-                cv2.putText(frame, f"CSV Customer ID: {csv_customer_id}", (20, y_pos + y_offset*3), font, font_scale * 0.7, (255, 255, 0), font_thickness, line_type)
-                cv2.putText(frame, f"QR1 Qty: {qr1_qty}", (20, y_pos + y_offset*4), font, font_scale * 0.7, (255, 255, 0), font_thickness, line_type)
+        # The panel is only re-rendered when what it shows changes; otherwise the cached layer is blended in
+        panel_key = (current_state, comparison_result, qr1_product_id, csv_customer_id, qr1_qty, qr2_qty,
+                     current_data)
+        if multi_code:
+            panel_key += (len(frame_pairs), len(unpaired_products), len(unpaired_customers))
+        panel.update(panel_key, hud_lines, frame.shape)
+        panel.composite(frame)
 
-        elif current_state == SCAN_CUSTOMER:
-            status_text = "STATE: Scan CUSTOMER QR"
-            action_text = "Press 's' to SAVE customer QR & COMPARE"
-            status_color = info_color
-            if qr1_product_id:
-                cv2.putText(frame, f"Product ID (CSV): {qr1_product_id}", (20, y_pos + y_offset*2), font, font_scale * 0.7, (255, 255, 0), font_thickness, line_type)
-                cv2.putText(frame, f"CSV Customer ID: {csv_customer_id}", (20, y_pos + y_offset*3), font, font_scale * 0.7, (255, 255, 0), font_thickness, line_type)
-                cv2.putText(frame, f"QR1 Qty: {qr1_qty}", (20, y_pos + y_offset*4), font, font_scale * 0.7, (255, 255, 0), font_thickness, line_type)
-        
-        else: # COMPARE_RESULT
-            if comparison_result:
-                status_text = "RESULT: MATCH FOUND! (Press 's' for new scan)"
-                action_text = "Press 's' to start NEW product scan"
-                status_color = highlight_color
-            else:
-                status_text = "RESULT: NO MATCH! (Press 's' to rescan customer)"
-                action_text = "Press 's' to RESCAN customer QR"
-                status_color = warning_color
-            
-            cv2.putText(frame, f"Product ID (CSV): {qr1_product_id}", (20, y_pos + y_offset*2), font, font_scale * 0.7, (255, 255, 0), font_thickness, line_type)
-            cv2.putText(frame, f"CSV Customer ID: {csv_customer_id}", (20, y_pos + y_offset*3), font, font_scale * 0.7, (255, 255, 0), font_thickness, line_type)
-            cv2.putText(frame, f"QR1 Qty: {qr1_qty}", (20, y_pos + y_offset*4), font, font_scale * 0.7, (255, 255, 0), font_thickness, line_type)
-            cv2.putText(frame, f"QR2 Qty: {qr2_qty}", (20, y_pos + y_offset*5), font, font_scale * 0.7, (255, 255, 0), font_thickness, line_type)
-
-
-        # Display status and action text
-        for i, line in enumerate([status_text, action_text]):
-            text_size = cv2.getTextSize(line, font, font_scale, font_thickness)[0]
-            cv2.rectangle(frame, (10, y_pos - text_size[1] - 5), (10 + text_size[0] + 10, y_pos + 5), (0, 0, 0), -1)
-            cv2.putText(frame, line, (20, y_pos), font, font_scale, 
-                                     status_color if i == 0 else text_color, 
-                                     font_thickness, line_type)
-            y_pos += y_offset
+        rate_text = f"Scans/min: {scan_rate.per_minute():.1f} ({scan_rate.total} total)" if auto_scan else None
+        footer.update(rate_text, lambda: footer_lines(rate_text, frame.shape), frame.shape)
+        footer.composite(frame)
 
-        # Display detected QR data
-        if current_data:
-            data_lines = [current_data[i:i+40] for i in range(0, len(current_data), 40)]
-            cv2.putText(frame, "Detected QR Data:", (20, y_pos), font, font_scale * 0.8, (255, 255, 0), font_thickness, line_type)
-            y_pos += 25
-            for line in data_lines:
-                text_size = cv2.getTextSize(line, font, font_scale*0.8, font_thickness)[0]
-                cv2.rectangle(frame, (10, y_pos - text_size[1] - 5), (10 + text_size[0] + 10, y_pos + 5), (0, 0, 0), -1)
-                cv2.putText(frame, line, (20, y_pos), font, font_scale*0.8, 
-                                     (255,255,0), font_thickness, line_type)
-                y_pos += 25
+        if auto_scan:
+            banner.draw(frame)
 
-        cv2.putText(frame, "Press 'q' to quit", (10, frame.shape[0]-20), 
-                             font, 0.6, (255,255,255), 1, line_type)
+        if show_metrics:
+            draw_overlay(frame)
 
         cv2.imshow("QR Code Scanner", frame)
+        METRICS.observe('render', time.perf_counter() - render_start)
+
+        if startup is not None:
+            report_startup(startup, started, dialog_seconds, startup_budget)
+            startup = None
 
         key = cv2.waitKey(1) & 0xFF
         
         if key == ord('q'):
             break
-        
-        elif key == ord('s'):
-            if not current_data:
+        if key == ord('m'):
+            show_metrics = not show_metrics
+
+        commit = key == ord('s')
+        if multi_code:
+            if auto_scan and commit:
+                stable.committed = multi_key
+            elif auto_scan:
+                commit = stable.update(decode_seq, multi_key) is not None
+            if not commit:
+                continue
+            if not frame_pairs:
+                print("No product/customer pair detected to compare.")
+                continue
+
+            try:
+                with METRICS.time('compare'):
+                    if client is not None:
+                        validated = client.validate_many(
+                            [(product.product_id, product.payload, customer.payload)
+                             for product, customer in frame_pairs], slices)
+                        results = [PairResult(product, customer, result)
+                                   for (product, customer), (result, _) in zip(frame_pairs, validated)]
+                        duplicates = [duplicate for _, duplicate in validated]
+                    else:
+                        results = compare_pairs(frame_pairs, start_a, end_a, start_b, end_b,
+                                                csv_file_path=csv_file_path, master_data=master_data)
+            except Exception as e:
+                logger.error("Error during comparison: %s", e)
+                notify('error', "Error", f"An error occurred during comparison: {e}")
+                continue
+
+            multi_results = {}
+            summary = []
+            for n, pair in enumerate(results):
+                qty1, qty2 = pair_quantities(pair)
+                matched = pair.result.match
+                if client is not None:
+                    duplicate = duplicates[n]
+                else:
+                    duplicate = save_comparison(pair.product.payload, pair.customer.payload, qty1, qty2,
+                                                pair.product.product_id, pair.product.customer_id, matched)
+                multi_results[(pair.product.payload, pair.customer.payload)] = matched
+                scan_rate.record()
+                outcome = "DUPLICATE" if duplicate else ("MATCH" if matched else "NO MATCH")
+                summary.append(f"{pair.product.product_id}: {outcome}")
+                print(f"Comparison result for ProductID '{pair.product.product_id}': {outcome}")
+                if pair.result.error:
+                    logger.error("Comparison could not be made: %s", pair.result.error)
+            all_matched = all(pair.result.match for pair in results)
+            notify('info' if all_matched else 'warning', "Comparison Results", "\n".join(summary))
+            continue
+
+        if auto_scan and commit and current_data:
+            # A code saved with 's' must not be committed again by the auto logic
+            stable.committed = current_data
+        elif auto_scan and not commit:
+            if current_state == COMPARE_RESULT:
+                commit = time.monotonic() - result_time >= result_hold
+            else:
+                stable_data = stable.update(decode_seq, current_data)
+                if stable_data is not None:
+                    current_data = stable_data
+                    commit = True
+
+        if commit:
+            # An auto-advance from the result screen does not need a code in view
+            if not current_data and not (auto_scan and current_state == COMPARE_RESULT):
                 print("No QR code detected to save.")
                 continue
                 
@@ -256,22 +620,21 @@ def scan_and_compare_qrcodes():
                 scanned_qr1_raw_content = current_data
                 qr1_qty = extract_quantity(current_data)
                 
-                found_match = False
-                temp_product_id = ""
-                temp_customer_id = ""
-
                 # Find ProductID match in CSV as a substring of the scanned QR1 data
-                for index, row in df.iterrows():
-                    csv_product_id = row['productid']
-                    if csv_product_id in scanned_qr1_raw_content:
-                        temp_product_id = csv_product_id
-                        temp_customer_id = str(row['customerid']).strip()
-                        found_match = True
-                        break 
+                try:
+                    with METRICS.time('lookup'):
+                        if client is not None:
+                            match = product_index.lookup(scanned_qr1_raw_content)
+                        else:
+                            match = product_index.find(scanned_qr1_raw_content)
+                except (ConnectionError, RuntimeError) as e:
+                    logger.error("Product lookup failed: %s", e)
+                    notify('error', "Service Error", f"Product lookup failed: {e}")
+                    continue
                 
-                if not found_match:
-                    messagebox.showwarning("Product ID Not Found", 
-                                           f"No ProductID from '{csv_file_path}' found in QR1 content.")
+                if match is None:
+                    notify('warning', "Product ID Not Found", 
+                           f"No ProductID from '{csv_file_path}' found in QR1 content.")
                     print(f"No ProductID from '{csv_file_path}' found in QR1 content: '{scanned_qr1_raw_content}'")
                     qr1_product_id = "" 
                     csv_customer_id = ""
@@ -279,72 +642,61 @@ def scan_and_compare_qrcodes():
                     continue 
                 else:
                     # Store the matched Product ID and Customer ID from CSV
-                    qr1_product_id = temp_product_id
-                    csv_customer_id = temp_customer_id
+                    qr1_product_id, csv_customer_id = match
                     print(f"Scanned Product QR (Raw): '{scanned_qr1_raw_content}'")
                     print(f"Found matching ProductID from CSV: '{qr1_product_id}'")
                     print(f"Extracted CSV CustomerID: '{csv_customer_id}'")
                     print(f"Extracted QR1 Quantity: '{qr1_qty}'")
-
-                    try:
-                        # Write the matched CSV ProductID to the temporary file. 
-                        # This is used by cmp.compare to ensure the CustomerID in QR2 belongs to a valid ProductID.
-                        with open(qr1_content_for_cmp_file, 'w') as f:
-                            f.write(qr1_product_id) 
-                        print(f"Saved matched CSV ProductID to '{qr1_content_for_cmp_file}'")
-                        current_state = SCAN_CUSTOMER 
-                    except Exception as e:
-                        print(f"ERROR: Failed to write to {qr1_content_for_cmp_file}: {e}")
-                        messagebox.showerror("File Write Error", f"Error saving matched ProductID: {e}")
+                    current_state = SCAN_CUSTOMER 
             
             elif current_state == SCAN_CUSTOMER:
                 qr2_raw_content = current_data
                 qr2_qty = extract_quantity(current_data)
                 
                 try:
-                    # Write the raw QR2 content to the temporary file
-                    with open(qr2_content_file, 'w') as f:
-                        f.write(qr2_raw_content)
-                    print(f"Saved QR2 content to '{qr2_content_file}'")
                     print(f"Extracted QR2 Quantity: '{qr2_qty}'")
                     
-                    # Perform comparison using the file paths
-                    comparison_result = cmp.compare(
-                        qr1_content_for_cmp_file, qr2_content_file, 
-                        start_a, end_a, start_b, end_b
-                    )
+                    # Compare the matched CSV ProductID's CustomerID against the raw QR2 content
+                    with METRICS.time('compare'):
+                        if client is not None:
+                            # The service compares, logs and checks for duplicates in one request
+                            result, duplicate = client.validate(qr1_product_id, scanned_qr1_raw_content,
+                                                                qr2_raw_content, slices)
+                        else:
+                            result = cmp.compare_ids(
+                                qr1_product_id, qr2_raw_content, 
+                                start_a, end_a, start_b, end_b,
+                                csv_file_path=csv_file_path, master_data=master_data
+                            )
+                    comparison_result = result.match
                     
                     print(f"Comparison result: {'MATCH' if comparison_result else 'NO MATCH'}")
-                    
-                    if comparison_result:
-                        messagebox.showinfo("Comparison Result", "MATCH FOUND!")
-                        # Log the successful match
-                        # Change made here: Use 'scanned_qr1_raw_content' instead of 'qr1_product_id' 
-                        # for the QR1 field in the log file, as requested.
-                        log_entry = f"{scanned_qr1_raw_content}\t{qr2_raw_content}\t{qr1_qty}\t{qr2_qty}\n"
-                        try:
-                            with open(match_log_file, 'a') as log_f:
-                                log_f.write(log_entry)
-                            print(f"Successfully logged match to '{match_log_file}'")
-                        except Exception as log_e:
-                            print(f"ERROR: Failed to log match to file: {log_e}")
-                            messagebox.showerror("Log Error", f"Failed to log match to file: {log_e}")
+                    if result.error:
+                        logger.error("Comparison could not be made: %s", result.error)
+
+                    if client is None:
+                        duplicate = save_comparison(scanned_qr1_raw_content, qr2_raw_content, qr1_qty, qr2_qty,
+                                                    qr1_product_id, csv_customer_id, comparison_result)
+                    if duplicate:
+                        when = "just now" if duplicate == 'recent' else "in an earlier session"
+                        notify('warning', "Duplicate Scan", f"MATCH FOUND, but this pair was already logged {when}.\nNot logging it again.")
+                    elif comparison_result:
+                        notify('info', "Comparison Result", "MATCH FOUND!")
                     else:
-                        messagebox.showwarning("Comparison Result", "NO MATCH!")
+                        notify('warning', "Comparison Result", "NO MATCH!")
 
                     current_state = COMPARE_RESULT
+                    result_time = time.monotonic()
+                    scan_rate.record()
                 
                 except Exception as e:
-                    print(f"ERROR: Error during QR2 save or comparison: {e}")
-                    messagebox.showerror("Error", f"An error occurred during comparison: {e}")
+                    logger.error("Error during comparison: %s", e)
+                    notify('error', "Error", f"An error occurred during comparison: {e}")
                     
             elif current_state == COMPARE_RESULT:
                 if comparison_result:
                     # If match found, reset for a new product scan
-                    print("DEBUG: Match found, resetting for new scan. Removing content files.")
-                    for f in [qr1_content_for_cmp_file, qr2_content_file]:
-                        if os.path.exists(f):
-                            os.remove(f)
+                    logger.debug("Match found, resetting for new scan.")
                     
                     # Reset state variables for next scan cycle
                     scanned_qr1_raw_content = ""
@@ -357,22 +709,133 @@ def scan_and_compare_qrcodes():
                     print("Ready for new product scan.")
                 else:
                     # If no match, allow rescan of the customer QR
-                    print("DEBUG: No match, allowing rescan of customer QR. Removing qr2_content_file.")
-                    if os.path.exists(qr2_content_file):
-                        os.remove(qr2_content_file)
+                    logger.debug("No match, allowing rescan of customer QR.")
                     qr2_raw_content = ""
                     qr2_qty = ""
                     current_state = SCAN_CUSTOMER
                     print("Please rescan customer QR.")
 
     # Cleanup upon exit
+    pipeline.stop()
+    if metrics_server is not None:
+        metrics_server.shutdown()
+    if watcher is not None:
+        watcher.stop()
+    decode_stats = pipeline.decode_stats()
+    if decode_stats:
+        logger.info("Adaptive decode stats: %s", decode_stats)
+    cascade = pipeline.cascade_stats()
+    if cascade:
+        logger.info("Cascade decode stats: %s", cascade)
+    if scan_rate.total:
+        logger.info("%d scans compared, %.1f scans/min this session", scan_rate.total, scan_rate.session_per_minute())
     cap.release()
     cv2.destroyAllWindows()
-    print("DEBUG: Application closed. Final cleanup of temporary content files.")
-    for f in [qr1_content_for_cmp_file, qr2_content_file]:
-        if os.path.exists(f):
-            os.remove(f)
+    if client is not None:
+        product_index.close()
+        client.close()
+        logger.info("Application closed.")
+        return
+    match_log.close()
+    if scan_db:
+        scan_db.close()
+    logger.info("Application closed. %d matches logged this session.", match_log.written)
 
 if __name__ == "__main__":
-    scan_and_compare_qrcodes()
+    parser = argparse.ArgumentParser(description="Product/customer QR code scanner")
+    parser.add_argument("--process-pool", action="store_true",
+                        help="decode frames in a process pool (for multi-core machines)")
+    parser.add_argument("--decode-workers", type=int, default=None,
+                        help="number of decode processes (default: CPU count)")
+    parser.add_argument("--decode-path", choices=sorted(DECODE_PATHS), default='pil',
+                        help="frame decode path: 'pil' (original), 'gray' (lower CPU per frame) "
+                             "or 'cascade' (escalates on a miss for small, glared or blurred labels)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="track the last code's region and skip decoding frames without motion")
+    parser.add_argument("--full-scan-every", type=int, default=15,
+                        help="with --adaptive, force a full-frame decode at least every N frames")
+    parser.add_argument("--motion-threshold", type=float, default=2.0,
+                        help="with --adaptive, mean pixel difference below which a frame is skipped")
+    parser.add_argument("--source", default=None,
+                        help="camera index, video file/URL, image folder or 'synthetic:PAYLOAD,...' "
+                             "(default: first available webcam)")
+    parser.add_argument("--log-backend", choices=sorted(LOG_BACKENDS), default='tsv',
+                        help="match log format (sqlite/parquet write next to match_log.txt)")
+    parser.add_argument("--log-fsync-interval", type=float, default=5.0,
+                        help="seconds between match log fsyncs; 0 syncs after every batch")
+    parser.add_argument("--metrics", action="store_true", help="show the FPS/latency overlay (toggle with 'm')")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus-format metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="DEBUG shows the per-scan lookup and comparison details")
+    parser.add_argument("--reload-interval", type=float, default=2.0,
+                        help="seconds between checks of userr.csv for changes; 0 disables hot reload")
+    parser.add_argument("--dedup-window", type=float, default=300,
+                        help="seconds after a product/customer pair is logged during which it is not logged again")
+    parser.add_argument("--remember-pairs", action="store_true",
+                        help=f"never log a pair again that was logged in an earlier session (kept in {PAIR_LIST_NAME})")
+    parser.add_argument("--no-dedup", action="store_true", help="log every match, even repeated pairs")
+    parser.add_argument("--auto", action="store_true",
+                        help="scan without pressing 's': commit codes once they decode steadily")
+    parser.add_argument("--stable-frames", type=int, default=3,
+                        help="with --auto, consecutive identical decodes needed to commit a code")
+    parser.add_argument("--multi", action="store_true",
+                        help="compare every product/customer label pair in the frame at once")
+    parser.add_argument("--result-hold", type=float, default=1.5,
+                        help="with --auto, seconds to show a comparison result before moving on")
+    parser.add_argument("--site", default=None,
+                        help="site profile to take the slicing parameters (and any saved option defaults) from; "
+                             "parameters entered in the dialogs are saved to it")
+    parser.add_argument("--profiles", default=DEFAULT_PROFILE_PATH, help="site profile file")
+    parser.add_argument("--slices", type=int, nargs=4, default=None,
+                        metavar=('START_A', 'END_A', 'START_B', 'END_B'),
+                        help="CustomerID slicing parameters, skipping the dialogs (saved to --site if given)")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET,
+                        help="seconds to the first frame above which a slow start is logged as a warning")
+    parser.add_argument("--server", default=None, metavar="HOST:PORT",
+                        help="run as a thin client of a scanService validation service, which does the "
+                             "lookups, comparisons and logging for every terminal")
+
+    # A site profile may hold an "options" object of defaults for any flag above, e.g.
+    # {"decode_path": "gray", "auto": true}. They are parsed like flags placed before the
+    # command line's own, so they are validated the same way and flags given there still win.
+    known, _ = parser.parse_known_args()
+    profile_args, unknown_options = [], []
+    if known.site:
+        options = (load_site_profile(known.site, known.profiles) or {}).get('options') or {}
+        profile_args, unknown_options = options_argv(parser, options)
+        try:
+            parser.parse_args(profile_args)
+        except SystemExit:
+            parser.exit(2, f"Error: Invalid options in the profile for site '{known.site}' ({known.profiles})\n")
+    args = parser.parse_args(profile_args + sys.argv[1:])
+    logging.basicConfig(level=args.log_level, format="%(levelname)s: %(message)s")
+    if unknown_options:
+        logger.warning("Ignoring unknown options in the profile for site '%s': %s",
+                       args.site, ", ".join(unknown_options))
+
+    if args.adaptive and args.process_pool:
+        parser.error("--adaptive decodes on a single thread and cannot be combined with --process-pool")
+
+    if args.slices and args.site:
+        try:
+            save_site_profile(args.site, slices_profile(args.slices), args.profiles)
+        except OSError as e:
+            logger.error("Could not save profile for site '%s': %s", args.site, e)
+
+    adaptive = None
+    if args.adaptive:
+        adaptive = {'full_scan_every': args.full_scan_every, 'motion_threshold': args.motion_threshold}
+
+    scan_and_compare_qrcodes(use_process_pool=args.process_pool, decode_workers=args.decode_workers,
+                             decode_path=args.decode_path, adaptive=adaptive, source=args.source,
+                             log_backend=args.log_backend, log_fsync_interval=args.log_fsync_interval,
+                             dedup_window=None if args.no_dedup else args.dedup_window,
+                             remember_pairs=args.remember_pairs,
+                             auto_scan=args.auto, stable_frames=args.stable_frames,
+                             result_hold=args.result_hold, multi_code=args.multi,
+                             reload_interval=args.reload_interval, show_metrics=args.metrics,
+                             metrics_port=args.metrics_port, slices=args.slices, site=args.site,
+                             profile_path=args.profiles, startup_budget=args.startup_budget,
+                             server=args.server)
 
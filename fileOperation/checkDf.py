@@ -1,8 +1,22 @@
 # fileOperation/checkDf.py
-import pandas as pd
+import logging
 import os 
+from collections import namedtuple
 
-def compare(file_path_1, file_path_2, start_a, end_a, start_b, end_b):
+from fileOperation.masterData import get_master_data
+from fileOperation.payloadSchema import get_schema, slice_schema
+
+logger = logging.getLogger(__name__)
+
+CSV_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'userr.csv')
+
+# Structured outcome of compare_ids(). `error` is None when the comparison ran.
+CompareResult = namedtuple('CompareResult', [
+    'match', 'product_id', 'csv_customer_id', 'qr2_customer_id',
+    'csv_main_part', 'qr2_main_part', 'error',
+])
+
+def compare(file_path_1, file_path_2, start_a, end_a, start_b, end_b, csv_file_path=CSV_FILE_PATH):
     """
     Compares CustomerID from CSV (looked up using product ID from file_path_1)
     with sliced CustomerID from QR2 (from file_path_2).
@@ -15,23 +29,27 @@ def compare(file_path_1, file_path_2, start_a, end_a, start_b, end_b):
         end_a (int): End index for slicing CSV CustomerID.
         start_b (int): Start index for slicing QR2 CustomerID.
         end_b (int): End index for slicing QR2 CustomerID.
+        csv_file_path (str): Master CSV to look the ProductID up in.
 
     Returns:
         bool: True if the sliced main parts of Customer IDs match, False otherwise.
+
+    This is a thin wrapper around compare_ids() kept for callers that still
+    pass file paths.
     """
-    print("\n--- DEBUG: Entering cmp.compare function (Main Part Only) ---")
+    logger.debug("--- Entering cmp.compare function (Main Part Only) ---")
 
     # Read the ProductID (already looked up from CSV) from the first temporary file
     product_id_from_file1 = ""
     try:
         with open(file_path_1, 'r') as f1:
             product_id_from_file1 = f1.read().strip()
-        print(f"DEBUG: Read ProductID for lookup from {file_path_1}: '{product_id_from_file1}' (length: {len(product_id_from_file1)})")
+        logger.debug("Read ProductID for lookup from %s: '%s' (length: %d)", file_path_1, product_id_from_file1, len(product_id_from_file1))
     except FileNotFoundError:
-        print(f"ERROR: File not found: {file_path_1}")
+        logger.error("File not found: %s", file_path_1)
         return False
     except Exception as e:
-        print(f"ERROR: Failed to read {file_path_1}: {e}")
+        logger.error("Failed to read %s: %s", file_path_1, e)
         return False
 
     # Read raw customer ID from the second temporary file (from QR2 scan)
@@ -39,61 +57,97 @@ def compare(file_path_1, file_path_2, start_a, end_a, start_b, end_b):
     try:
         with open(file_path_2, 'r') as f2:
             customer_id_from_qr2 = f2.read().strip()
-        print(f"DEBUG: Read raw Customer ID from QR2 file {file_path_2}: '{customer_id_from_qr2}' (length: {len(customer_id_from_qr2)})")
+        logger.debug("Read raw Customer ID from QR2 file %s: '%s' (length: %d)", file_path_2, customer_id_from_qr2, len(customer_id_from_qr2))
     except FileNotFoundError:
-        print(f"ERROR: File not found: {file_path_2}")
+        logger.error("File not found: %s", file_path_2)
         return False
     except Exception as e:
-        print(f"ERROR: Failed to read {file_path_2}: {e}")
+        logger.error("Failed to read %s: %s", file_path_2, e)
         return False
 
-    # Load the CSV file
-    csv_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'userr.csv')
-    df_internal = pd.DataFrame() 
+    return compare_ids(product_id_from_file1, customer_id_from_qr2, start_a, end_a, start_b, end_b,
+                       csv_file_path=csv_file_path).match
+
+
+def compare_ids(product_id, qr2_content, start_a, end_a, start_b, end_b, csv_file_path=CSV_FILE_PATH,
+                master_data=None):
+    """
+    Compares the CSV CustomerID for product_id with the sliced CustomerID from
+    the QR2 payload, without going through temporary files.
+
+    Args:
+        product_id (str): The ProductID that was found *within* QR1 content and exists in the CSV.
+        qr2_content (str): The raw QR2 content.
+        start_a (int): Start index for slicing CSV CustomerID.
+        end_a (int): End index for slicing CSV CustomerID.
+        start_b (int): Start index for slicing QR2 CustomerID.
+        end_b (int): End index for slicing QR2 CustomerID.
+        csv_file_path (str): Master CSV to look the ProductID up in.
+        master_data (MasterData): The loaded copy of the master CSV to use, e.g. the one
+            the caller found the ProductID in. Defaults to get_master_data(csv_file_path).
+
+    Returns:
+        CompareResult: `match` is True if the sliced main parts of Customer IDs match.
+            `error` is set when the comparison could not be made at all.
+    """
+    product_id = str(product_id).strip()
+    customer_id_from_qr2 = str(qr2_content).strip()
+    logger.debug("ProductID for lookup: '%s' (length: %d)", product_id, len(product_id))
+    logger.debug("Raw Customer ID from QR2: '%s' (length: %d)", customer_id_from_qr2, len(customer_id_from_qr2))
+
+    # Look up the CustomerID in the shared master data (parsed once per file version)
     try:
-        df_internal = pd.read_csv(csv_file_path, encoding='utf-8-sig', engine='python', sep=',', on_bad_lines='skip')
-        df_internal.columns = df_internal.columns.str.strip().str.lower()
-        if 'productid' not in df_internal.columns or 'customerid' not in df_internal.columns:
-            print(f"ERROR: CSV column error: 'productid' or 'customerid' not found in {csv_file_path}")
-            print(f"DEBUG: CSV columns found: {df_internal.columns.tolist()}")
-            return False
-        df_internal['productid'] = df_internal['productid'].astype(str).str.strip()
-        df_internal['customerid'] = df_internal['customerid'].astype(str).str.strip()
-        print(f"DEBUG: Successfully loaded CSV: {csv_file_path}")
+        if master_data is None:
+            master_data = get_master_data(csv_file_path)
+        logger.debug("Using master data from: %s", master_data.csv_path)
     except FileNotFoundError:
-        print(f"ERROR: CSV file not found at {csv_file_path}")
-        return False
+        logger.error("CSV file not found at %s", csv_file_path)
+        return _failed(product_id, customer_id_from_qr2, f"CSV file not found: {csv_file_path}")
+    except ValueError as e:
+        logger.error("CSV column error: %s", e)
+        return _failed(product_id, customer_id_from_qr2, f"CSV column error: {e}")
     except Exception as e:
-        print(f"ERROR: Error loading CSV in cmp.compare: {e}")
-        return False
+        logger.error("Error loading CSV in cmp.compare: %s", e)
+        return _failed(product_id, customer_id_from_qr2, f"Error loading CSV: {e}")
 
-    # Use the product_id_from_file1 (which is the matched CSV ProductID) to find the CustomerID in the DataFrame
-    matching_rows = df_internal.loc[df_internal['productid'] == product_id_from_file1]
+    # Use the product_id (which is the matched CSV ProductID) to find the CustomerID
+    csv_customer_id = master_data.customer_id_for(product_id)
 
-    if matching_rows.empty:
-        print(f"DEBUG: No matching ProductID '{product_id_from_file1}' found in CSV for direct lookup.")
-        # This case should ideally not be hit if scan_and_compare_qrcodes correctly populated file_path_1
-        return False
+    if csv_customer_id is None:
+        logger.debug("No matching ProductID '%s' found in CSV for direct lookup.", product_id)
+        # This case should ideally not be hit if scan_and_compare_qrcodes passed a ProductID it found in the CSV
+        return _failed(product_id, customer_id_from_qr2, f"ProductID '{product_id}' not found in CSV")
     else:
-        csv_customer_id = str(matching_rows['customerid'].iloc[0]).strip()
-        print(f"DEBUG: Found matching ProductID. CSV Customer ID for comparison: '{csv_customer_id}' (length: {len(csv_customer_id)})")
+        logger.debug("Found matching ProductID. CSV Customer ID for comparison: '%s' (length: %d)", csv_customer_id, len(csv_customer_id))
 
     # Perform string slicing for the main part
     csv_main_part = ""
     qr2_main_part = ""
     try:
-        csv_main_part = csv_customer_id[start_a:end_a].strip()
-        qr2_main_part = customer_id_from_qr2[start_b:end_b].strip()
-        print(f"DEBUG: Slicing Parameters (Main): CSV[{start_a}:{end_a}], QR2[{start_b}:{end_b}]")
-        print(f"DEBUG: CSV Main Part (sliced): '{csv_main_part}' (length: {len(csv_main_part)})")
-        print(f"DEBUG: QR2 Main Part (sliced): '{qr2_main_part}' (length: {len(qr2_main_part)})")
+        csv_main_part = slice_schema(start_a, end_a).extract(csv_customer_id).value
+        qr2_main_part = slice_schema(start_b, end_b).extract(customer_id_from_qr2).value
+        logger.debug("Slicing Parameters (Main): CSV[%s:%s], QR2[%s:%s]", start_a, end_a, start_b, end_b)
+        logger.debug("CSV Main Part (sliced): '%s' (length: %d)", csv_main_part, len(csv_main_part))
+        logger.debug("QR2 Main Part (sliced): '%s' (length: %d)", qr2_main_part, len(qr2_main_part))
     except IndexError as e:
-        print(f"ERROR: Indexing error for main part slicing. Check your start/end parameters. Error: {e}")
-        print(f"DEBUG: CSV Customer ID before slice: '{csv_customer_id}'")
-        print(f"DEBUG: QR2 Customer ID before slice: '{customer_id_from_qr2}'")
-        return False
+        logger.error("Indexing error for main part slicing. Check your start/end parameters. Error: %s", e)
+        logger.debug("CSV Customer ID before slice: '%s'", csv_customer_id)
+        logger.debug("QR2 Customer ID before slice: '%s'", customer_id_from_qr2)
+        return _failed(product_id, customer_id_from_qr2, f"Indexing error for main part slicing: {e}", csv_customer_id)
 
     final_match = (csv_main_part == qr2_main_part)
-    print(f"DEBUG: Main Parts Match Result: {final_match} ('{csv_main_part}' == '{qr2_main_part}')")
-    print("--- DEBUG: Exiting cmp.compare function ---")
-    return final_match
\ No newline at end of file
+    logger.debug("Main Parts Match Result: %s ('%s' == '%s')", final_match, csv_main_part, qr2_main_part)
+    logger.debug("--- Exiting cmp.compare function ---")
+    return CompareResult(final_match, product_id, csv_customer_id, customer_id_from_qr2,
+                         csv_main_part, qr2_main_part, None)
+
+
+def _failed(product_id, qr2_customer_id, error, csv_customer_id=None):
+    return CompareResult(False, product_id, csv_customer_id, qr2_customer_id, "", "", error)
+
+
+def extract_quantity(qr_data):
+    """Extracts the last 4 characters of the QR code data as the quantity (the 'default' payload schema)."""
+    if qr_data is None:
+        return ""
+    return get_schema('default').extract(qr_data).quantity
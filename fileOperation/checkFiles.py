@@ -1,12 +1,17 @@
 # fileOperation/checkFiles.py
 # import ast  # REMOVE this import, it's no longer needed if saving raw string
+import logging
 import os
 
+from fileOperation.payloadSchema import key_schema
+
+logger = logging.getLogger(__name__)
+
 def check(file_location_1, file_location_2, variable):
     """
     Compares a specific 'variable' value from two files,
     assuming the files contain raw multi-line QR code data
-    with 'key: value' pairs.
+    with 'key: value' pairs (see payloadSchema.parse_key_values).
     """
     try:
         with open(file_location_1, 'r') as file1:
@@ -15,43 +20,27 @@ def check(file_location_1, file_location_2, variable):
         with open(file_location_2, 'r') as file2:
             content_2 = file2.read() # Read directly, no ast.literal_eval
 
-        result_1 = {}
-        result_2 = {}
-
-        # Parse content_1
-        for line in content_1.split('\n'):
-            if ':' in line:
-                key, value = line.split(':', 1)
-                result_1[key.strip()] = value.strip()
-
-        # Parse content_2
-        for line in content_2.split('\n'):
-            if ':' in line:
-                key, value = line.split(':', 1)
-                result_2[key.strip()] = value.strip()
-
+        # Parsed once per distinct payload and cached by the key:value schema
         variable = variable.strip()
+        schema = key_schema(variable)
 
-        value_1 = result_1.get(variable)
-        value_2 = result_2.get(variable)
+        value_1 = schema.extract(content_1).value
+        value_2 = schema.extract(content_2).value
 
-        if value_1 is not None and value_2 is not None and value_1 == value_2:
-            print(f"Comparison: '{variable}' value in file 1: '{value_1}'")
-            print(f"Comparison: '{variable}' value in file 2: '{value_2}'")
-            return True
-        else:
-            print(f"Comparison: '{variable}' value in file 1: '{value_1}'")
-            print(f"Comparison: '{variable}' value in file 2: '{value_2}'")
-            return False
+        logger.debug("Comparison: '%s' value in file 1: '%s'", variable, value_1)
+        logger.debug("Comparison: '%s' value in file 2: '%s'", variable, value_2)
+        return value_1 is not None and value_2 is not None and value_1 == value_2
 
     except FileNotFoundError:
-        print(f"Error: One of the files not found. File1: {file_location_1}, File2: {file_location_2}")
+        logger.error("One of the files not found. File1: %s, File2: %s", file_location_1, file_location_2)
         return False
     except Exception as e: # Catch any other errors
-        print(f"An unexpected error occurred in comparison module: {e}")
+        logger.error("An unexpected error occurred in comparison module: %s", e)
         return False
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG, format="%(levelname)s: %(message)s")
+
     # This block is for testing the comparison module independently
     # Create dummy files for testing in the *raw multi-line string* format
     dummy_dir = os.path.dirname(os.path.abspath(__file__))
@@ -0,0 +1,425 @@
+# fileOperation/masterData.py
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+
+from fileOperation.productIndex import ProductIndex, SortedProductIndex
+
+logger = logging.getLogger(__name__)
+
+# The master list lives next to codeRead.py, one level above this package
+DEFAULT_CSV_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'userr.csv'))
+
+# Master lists with at least this many rows get the compact SortedProductIndex
+SORTED_INDEX_MIN_ROWS = 1_000_000
+
+# Rows parsed per chunk when reading the CSV
+CSV_CHUNK_ROWS = 500_000
+
+MASTER_COLUMNS = ['productid', 'customerid']
+
+
+class MasterData:
+    """
+    One loaded copy of the master CSV: the cleaned DataFrame plus the
+    ProductID index built from it, and the file stamp it was loaded from.
+
+    index_kind is 'dict' (ProductIndex), 'sorted' (SortedProductIndex) or
+    None to pick the sorted one for lists of SORTED_INDEX_MIN_ROWS or more.
+    An already built index can be passed in instead.
+    """
+
+    def __init__(self, csv_path, df, mtime, size, index_kind=None, index=None):
+        self.csv_path = csv_path
+        self.df = df
+        self.mtime = mtime
+        self.size = size
+        if index is not None:
+            self.index = index
+            return
+        if index_kind is None:
+            index_kind = 'sorted' if len(df) >= SORTED_INDEX_MIN_ROWS else 'dict'
+        self.index = (SortedProductIndex if index_kind == 'sorted' else ProductIndex).from_dataframe(df)
+
+    def customer_id_for(self, product_id):
+        """Returns the CSV CustomerID for an exact ProductID, or None."""
+        return self.index.get(product_id)
+
+    def find_product(self, payload):
+        """Returns (product_id, customer_id) for the first ProductID found inside payload, or None."""
+        return self.index.find(payload)
+
+
+def _string_dtype():
+    # Arrow-backed strings store IDs in one contiguous buffer instead of one Python object each
+    import pandas as pd
+
+    try:
+        import pyarrow  # noqa: F401
+        return pd.StringDtype('pyarrow')
+    except ImportError:
+        return object
+
+
+def read_master_csv(csv_path, chunksize=CSV_CHUNK_ROWS):
+    """
+    Reads and cleans the ProductID and CustomerID columns of the master CSV.
+
+    Only the two ID columns are kept. With pyarrow installed the file is
+    streamed through pyarrow's CSV reader in blocks and the IDs stay Arrow
+    strings; otherwise pandas' C engine reads it in chunks of `chunksize`
+    rows.
+
+    Raises:
+        FileNotFoundError: If the CSV does not exist.
+        ValueError: If the 'productid' or 'customerid' column is missing.
+    """
+    # pandas is imported on first load so that importing this module stays cheap
+    import pandas as pd
+
+    header = pd.read_csv(csv_path, encoding='utf-8-sig', sep=',', nrows=0)
+    columns = {str(name).strip().lower(): name for name in header.columns}
+    if 'productid' not in columns or 'customerid' not in columns:
+        raise ValueError(f"'productid' or 'customerid' column not found in the CSV file. "
+                         f"Available columns: {list(columns)}")
+
+    string_dtype = _string_dtype()
+    if string_dtype is not object:
+        return _read_ids_pyarrow(csv_path, [columns[name] for name in MASTER_COLUMNS], string_dtype)
+
+    chunks = []
+    reader = pd.read_csv(csv_path, encoding='utf-8-sig', engine='c', sep=',', on_bad_lines='skip',
+                         usecols=[columns['productid'], columns['customerid']], dtype=string_dtype,
+                         chunksize=chunksize)
+    for chunk in reader:
+        chunk = chunk.rename(columns={columns[name]: name for name in MASTER_COLUMNS})
+        # Empty cells become 'nan', as with the old astype(str)
+        chunks.append(pd.DataFrame({name: chunk[name].fillna('nan').str.strip() for name in MASTER_COLUMNS}))
+
+    if not chunks:
+        return pd.DataFrame({name: pd.Series([], dtype=string_dtype) for name in MASTER_COLUMNS})
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _read_ids_pyarrow(csv_path, source_columns, string_dtype, block_size=16 * 1024 * 1024):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        parse_options=pa_csv.ParseOptions(invalid_row_handler=lambda row: 'skip'),
+        convert_options=pa_csv.ConvertOptions(include_columns=source_columns,
+                                              column_types={name: pa.string() for name in source_columns},
+                                              strings_can_be_null=True),
+    )
+    # Empty cells become 'nan', as with the old astype(str)
+    batches = [pa.record_batch([pc.utf8_trim_whitespace(batch.column(name)).fill_null('nan')
+                                for name in source_columns], names=MASTER_COLUMNS)
+               for batch in reader]
+    table = pa.Table.from_batches(batches, schema=pa.schema([(name, pa.string()) for name in MASTER_COLUMNS]))
+    return table.to_pandas(types_mapper={pa.string(): string_dtype}.get)
+
+
+# --- Binary snapshot ---
+
+def snapshot_path(csv_path):
+    """The Feather snapshot kept next to a master CSV."""
+    return csv_path + ".feather"
+
+
+def write_snapshot(csv_path, df, mtime, size):
+    """
+    Writes df as a Feather file next to the CSV, stamped with the CSV's
+    mtime and size so a stale snapshot is never used. Requires pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = pa.Table.from_pandas(df[MASTER_COLUMNS], preserve_index=False)
+    table = table.replace_schema_metadata({b'csv_mtime_ns': str(mtime).encode(), b'csv_size': str(size).encode()})
+    path = snapshot_path(csv_path)
+    # Uncompressed, so the snapshot can be memory-mapped on the next start
+    feather.write_feather(table, path + ".tmp", compression='uncompressed')
+    os.replace(path + ".tmp", path)
+
+
+def read_snapshot(csv_path, mtime, size):
+    """
+    Memory-maps the Feather snapshot of csv_path if it matches the CSV's
+    current mtime and size. Returns a DataFrame, or None if there is no
+    usable snapshot.
+    """
+    path = snapshot_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        import pyarrow.feather as feather
+        table = feather.read_table(path, memory_map=True)
+    except Exception as e:
+        logger.debug("Ignoring unreadable master data snapshot '%s': %s", path, e)
+        return None
+
+    metadata = table.schema.metadata or {}
+    if (metadata.get(b'csv_mtime_ns') != str(mtime).encode() or metadata.get(b'csv_size') != str(size).encode()
+            or table.column_names != MASTER_COLUMNS):
+        return None
+    # Keep the columns as Arrow strings backed by the mapped file rather than Python objects
+    import pyarrow as pa
+    return table.to_pandas(types_mapper={pa.string(): _string_dtype()}.get)
+
+
+_cache = {}
+_lock = threading.Lock()
+# Cache key -> number of running MasterDataWatchers for that CSV
+_watched = {}
+
+
+def load_master_data(csv_path, stat, use_snapshot=True, index_kind=None):
+    """
+    Loads a MasterData for csv_path, from its Feather snapshot when that is
+    up to date, otherwise by parsing the CSV and refreshing the snapshot.
+    """
+    df = read_snapshot(csv_path, stat.st_mtime_ns, stat.st_size) if use_snapshot else None
+    if df is not None:
+        logger.debug("Loaded master data snapshot %s", snapshot_path(csv_path))
+    else:
+        df = read_master_csv(csv_path)
+        if use_snapshot:
+            try:
+                write_snapshot(csv_path, df, stat.st_mtime_ns, stat.st_size)
+            except Exception as e:
+                logger.debug("Master data snapshot not written: %s", e)
+    return MasterData(csv_path, df, stat.st_mtime_ns, stat.st_size, index_kind=index_kind)
+
+
+def get_master_data(csv_path=DEFAULT_CSV_PATH):
+    """
+    Returns the shared MasterData for csv_path, loading it on first use.
+
+    The loaded copy is kept for the life of the process and is only
+    re-read when the file's mtime or size changes, so callers can ask
+    for it on every scan without paying for a CSV parse each time.
+    Across restarts, the Feather snapshot next to the CSV is used
+    instead of parsing the CSV again.
+
+    While a MasterDataWatcher is running for the CSV, the copy it
+    published is returned as is: reloads then only happen on the
+    watcher's thread, never inline in a caller on the scan path.
+
+    Raises:
+        FileNotFoundError: If the CSV does not exist.
+        ValueError: If the 'productid' or 'customerid' column is missing.
+    """
+    csv_path = _cache_key(csv_path)
+    with _lock:
+        data = _cache.get(csv_path)
+        if data is not None and _watched.get(csv_path):
+            return data
+
+    stat = os.stat(csv_path)
+    with _lock:
+        data = _cache.get(csv_path)
+        if data is not None and data.mtime == stat.st_mtime_ns and data.size == stat.st_size:
+            return data
+
+        logger.debug("Loading master data from %s", csv_path)
+        data = load_master_data(csv_path, stat)
+        _cache[csv_path] = data
+        logger.debug("Master data loaded: %s rows", len(data.index))
+        return data
+
+
+def _cache_key(csv_path):
+    return os.path.normcase(os.path.abspath(csv_path))
+
+
+def publish_master_data(data):
+    """Makes data the copy get_master_data() returns for its CSV."""
+    with _lock:
+        _cache[_cache_key(data.csv_path)] = data
+
+
+# --- Hot reload ---
+
+def read_appended_rows(csv_path, tail):
+    """
+    Parses `tail`, bytes appended to the CSV starting at a line boundary,
+    with the columns of the CSV's header and the same cleaning as
+    read_master_csv().
+    """
+    import pandas as pd
+
+    header = pd.read_csv(csv_path, encoding='utf-8-sig', sep=',', nrows=0)
+    columns = {str(name).strip().lower(): position for position, name in enumerate(header.columns)}
+    df = pd.read_csv(io.BytesIO(tail), header=None, encoding='utf-8', engine='c', sep=',', on_bad_lines='skip',
+                     usecols=[columns['productid'], columns['customerid']], dtype=object)
+    df = df.rename(columns={columns[name]: name for name in MASTER_COLUMNS})
+    string_dtype = _string_dtype()
+    # Empty cells become 'nan', exactly as in read_master_csv(), so a delta reload matches a full one
+    return pd.DataFrame({name: df[name].fillna('nan').str.strip().astype(string_dtype) for name in MASTER_COLUMNS})
+
+
+def master_fingerprint(data):
+    """
+    Hashes the CSV bytes data was loaded from, for MasterDataWatcher to tell
+    an append from a rewrite. Returns (digest, last byte), or (None, b"") if
+    the file changed since data was loaded.
+    """
+    digest, last_byte = _file_digest(data.csv_path, data.size)
+    stat = os.stat(data.csv_path)
+    if (stat.st_mtime_ns, stat.st_size) != (data.mtime, data.size):
+        # Changed while hashing; the next reload is a full one
+        return None, b""
+    return digest, last_byte
+
+
+def _file_digest(path, size):
+    """blake2b state over the first `size` bytes of path, and the last of those bytes."""
+    digest = hashlib.blake2b()
+    last = b""
+    with open(path, 'rb') as f:
+        remaining = size
+        while remaining > 0:
+            block = f.read(min(remaining, 1024 * 1024))
+            if not block:
+                break
+            digest.update(block)
+            last = block[-1:]
+            remaining -= len(block)
+    return digest, last
+
+
+class MasterDataWatcher:
+    """
+    Background thread that keeps the shared master data current.
+
+    The CSV's mtime and size are polled every `interval` seconds. After a
+    change has settled (two polls in a row with the same stamp) the new
+    MasterData is built on this thread and published with one reference
+    swap, so readers of `current` (or get_master_data()) see either the old
+    or the new copy, never a half-built one.
+
+    When rows were only appended (the old contents are an unchanged prefix
+    that ended in a newline) only the new rows are parsed and added to a
+    copy of the old index; any other change reloads the whole file.
+    on_reload(data), if given, is called on the watcher thread after each swap.
+
+    data is the already loaded MasterData to start from and fingerprint its
+    master_fingerprint(), if the caller computed it off the startup path;
+    otherwise the CSV is hashed on the first poll.
+    """
+
+    def __init__(self, csv_path=DEFAULT_CSV_PATH, interval=2.0, on_reload=None, data=None, fingerprint=None):
+        self.interval = interval
+        self.on_reload = on_reload
+        self.current = data if data is not None else get_master_data(csv_path)
+        self.reloads = 0
+        self.delta_reloads = 0
+        self._fingerprinted = fingerprint is not None
+        self._digest, self._last_byte = fingerprint if fingerprint is not None else (None, b"")
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="master-data-watcher", daemon=True)
+
+    def start(self):
+        key = _cache_key(self.current.csv_path)
+        with _lock:
+            _watched[key] = _watched.get(key, 0) + 1
+        publish_master_data(self.current)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        key = _cache_key(self.current.csv_path)
+        with _lock:
+            if _watched.get(key, 0) > 1:
+                _watched[key] -= 1
+            else:
+                _watched.pop(key, None)
+
+    def _fingerprint(self):
+        if not self._fingerprinted:
+            self._fingerprinted = True
+            self._digest, self._last_byte = master_fingerprint(self.current)
+
+    def _run(self):
+        try:
+            self._fingerprint()
+        except OSError as e:
+            logger.error("Could not hash the master data, its next change is reloaded in full: %s", e)
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error("Master data reload failed, keeping the loaded copy: %s", e)
+
+    def check(self):
+        """Reloads if the CSV changed since the last check and has stopped changing. Returns True if reloaded."""
+        data = self.current
+        self._fingerprint()
+        try:
+            stat = os.stat(data.csv_path)
+        except FileNotFoundError:
+            return False
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == (data.mtime, data.size):
+            self._pending = None
+            return False
+        if stamp != self._pending:
+            # Still being written; wait for the next poll
+            self._pending = stamp
+            return False
+        self._pending = None
+
+        started = time.perf_counter()
+        new_data = self._load_appended(data, stat)
+        if new_data is not None:
+            self.delta_reloads += 1
+            kind = f"{len(new_data.index) - len(data.index)} appended rows"
+        else:
+            new_data = load_master_data(data.csv_path, stat)
+            self._digest, self._last_byte = master_fingerprint(new_data)
+            kind = "full reload"
+
+        self.current = new_data
+        publish_master_data(new_data)
+        self.reloads += 1
+        logger.info("Master data reloaded (%s): %d rows in %.2fs",
+                    kind, len(new_data.index), time.perf_counter() - started)
+        if self.on_reload is not None:
+            self.on_reload(new_data)
+        return True
+
+    def _load_appended(self, data, stat):
+        """Returns a MasterData extended with the appended rows, or None if the file was not just appended to."""
+        import pandas as pd
+
+        if self._digest is None or stat.st_size <= data.size or self._last_byte != b"\n":
+            return None
+        digest, _ = _file_digest(data.csv_path, data.size)
+        if digest.digest() != self._digest.digest():
+            return None
+
+        with open(data.csv_path, 'rb') as f:
+            f.seek(data.size)
+            tail = f.read(stat.st_size - data.size)
+        new_rows = read_appended_rows(data.csv_path, tail)
+        index = data.index.extended(new_rows['productid'].tolist(), new_rows['customerid'].tolist())
+        df = pd.concat([data.df, new_rows], ignore_index=True)
+        new_data = MasterData(data.csv_path, df, stat.st_mtime_ns, stat.st_size, index=index)
+
+        # Carry the digest forward over the new bytes instead of hashing the whole file again
+        digest.update(tail)
+        self._digest, self._last_byte = digest, tail[-1:]
+        try:
+            write_snapshot(data.csv_path, df, stat.st_mtime_ns, stat.st_size)
+        except Exception as e:
+            logger.debug("Master data snapshot not written: %s", e)
+        return new_data
@@ -0,0 +1,330 @@
+# fileOperation/matchLog.py
+import datetime
+import gzip
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from itertools import islice
+
+from fileOperation.scanDb import ScanDatabase
+
+logger = logging.getLogger(__name__)
+
+# Columns of a structured match log record, in file order
+LOG_FIELDS = ['timestamp', 'qr1_content', 'qr2_content', 'qr1_qty', 'qr2_qty', 'product_id', 'csv_customer_id']
+LOG_HEADER = "\t".join(LOG_FIELDS)
+
+# Attempts at writing the last batch on close() before it is spilled to a side file
+CLOSE_RETRIES = 3
+
+
+def _clean(value):
+    # Tabs and newlines inside QR payloads would break the TSV layout
+    return "" if value is None else str(value).replace("\t", " ").replace("\r", " ").replace("\n", " ")
+
+
+# --- Backends ---
+
+class TsvBackend:
+    """
+    Append-only tab-separated log with a header line.
+
+    The file is rotated to '<name>.<timestamp><ext>.gz' when it grows past
+    max_bytes or is older than rotate_seconds. An existing file that does
+    not start with LOG_HEADER (e.g. the old header-less format) is rotated
+    away on open so old and new records are never mixed.
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, rotate_seconds=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self._file = None
+        self._opened_at = None
+
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+                first_line = f.readline().rstrip("\r\n")
+            if first_line != LOG_HEADER:
+                archive_path = self._rotate()
+                logger.warning("'%s' was in the old log format; its records were moved to '%s' and a new "
+                               "log was started (python -m fileOperation.scanDb import reads both)",
+                               self.path, archive_path)
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, 'a', encoding='utf-8', newline='')
+        if self._file.tell() == 0:
+            self._file.write(LOG_HEADER + "\n")
+        self._opened_at = time.time()
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        base, ext = os.path.splitext(self.path)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        archive_path = f"{base}.{stamp}{ext}.gz"
+        number = 1
+        while os.path.exists(archive_path):
+            number += 1
+            archive_path = f"{base}.{stamp}-{number}{ext}.gz"
+        with open(self.path, 'rb') as src, gzip.open(archive_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+        logger.debug("Rotated match log to '%s'", archive_path)
+        return archive_path
+
+    def write_batch(self, records):
+        for record in records:
+            self._file.write("\t".join(_clean(record.get(field)) for field in LOG_FIELDS) + "\n")
+        self._file.flush()
+
+        too_big = self.max_bytes and self._file.tell() >= self.max_bytes
+        too_old = self.rotate_seconds and time.time() - self._opened_at >= self.rotate_seconds
+        if too_big or too_old:
+            self.sync()
+            self._rotate()
+            self._open()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+class SqliteBackend:
+    """Match log records as matched rows of a scan database (see fileOperation.scanDb)."""
+
+    def __init__(self, path, **_):
+        self.path = path
+        self._db = ScanDatabase(path)
+
+    def write_batch(self, records):
+        self._db.record_many([{
+            'timestamp': record.get('timestamp'),
+            'product_id': record.get('product_id') or None,
+            'customer_id': record.get('csv_customer_id') or None,
+            'qr1_content': record.get('qr1_content'),
+            'qr2_content': record.get('qr2_content'),
+            'qr1_qty': record.get('qr1_qty'),
+            'qr2_qty': record.get('qr2_qty'),
+            'match': True,
+            'source': 'match_log',
+        } for record in records])
+
+    def sync(self):
+        # Every batch is its own committed transaction
+        pass
+
+    def close(self):
+        self._db.close()
+
+
+class ParquetBackend:
+    """
+    Match log records as Parquet part files in a directory (requires pyarrow).
+
+    Each flushed batch becomes its own part file, written to a temporary
+    name and renamed into place, so a crash never leaves a half-written
+    part. Read the whole log with pandas.read_parquet(directory).
+    """
+
+    def __init__(self, path, **_):
+        import pyarrow  # noqa: F401 -- fail early if the optional dependency is missing
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._part = 0
+
+    def write_batch(self, records):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({field: [_clean(record.get(field)) for record in records] for field in LOG_FIELDS})
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        self._part += 1
+        part_path = os.path.join(self.path, f"part-{stamp}-{os.getpid()}-{self._part:06d}.parquet")
+        pq.write_table(table, part_path + ".tmp")
+        os.replace(part_path + ".tmp", part_path)
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    'tsv': TsvBackend,
+    'sqlite': SqliteBackend,
+    'parquet': ParquetBackend,
+}
+
+
+def backend_path(log_path, backend):
+    """Where a backend stores the log for a given match_log.txt path."""
+    base = os.path.splitext(log_path)[0]
+    if backend == 'sqlite':
+        return base + ".db"
+    if backend == 'parquet':
+        return base + "_parquet"
+    return log_path
+
+
+# --- Buffered writer ---
+
+class MatchLogWriter:
+    """
+    Buffered, batched match logger.
+
+    log() only puts the record on a queue; a background thread writes
+    records in batches of up to batch_size, at least every flush_interval
+    seconds, and fsyncs at most every fsync_interval seconds (0 = after
+    every batch, None = leave it to the OS). close() drains the queue and
+    syncs, so no logged record is lost on a normal exit. A failed batch is
+    kept and retried; if the last one still cannot be written on close(),
+    it is spilled to a '<name>.unwritten-<timestamp>.tsv' side file.
+    """
+
+    def __init__(self, log_path, backend='tsv', batch_size=64, flush_interval=1.0, fsync_interval=5.0,
+                 max_bytes=50 * 1024 * 1024, rotate_seconds=None):
+        self.path = backend_path(log_path, backend)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.written = 0
+        self._backend = BACKENDS[backend](self.path, max_bytes=max_bytes, rotate_seconds=rotate_seconds)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="match-log", daemon=True)
+        self._thread.start()
+
+    def log(self, qr1_content, qr2_content, qr1_qty, qr2_qty, product_id="", csv_customer_id="", timestamp=None):
+        """Queues one successful match. The timestamp defaults to now (local time, ISO 8601)."""
+        self._queue.put({
+            'timestamp': timestamp or datetime.datetime.now().isoformat(timespec='seconds'),
+            'qr1_content': qr1_content,
+            'qr2_content': qr2_content,
+            'qr1_qty': qr1_qty,
+            'qr2_qty': qr2_qty,
+            'product_id': product_id,
+            'csv_customer_id': csv_customer_id,
+        })
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._backend.close()
+
+    def _spill(self, records):
+        """Writes records the backend would not take to a TSV side file, so closing never drops them."""
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        spill_path = f"{os.path.splitext(self.path)[0]}.unwritten-{stamp}.tsv"
+        try:
+            with open(spill_path, 'a', encoding='utf-8', newline='') as f:
+                f.write(LOG_HEADER + "\n")
+                for record in records:
+                    f.write("\t".join(_clean(record.get(field)) for field in LOG_FIELDS) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            logger.error("Saved %d unwritten match log records to '%s'", len(records), spill_path)
+        except OSError as e:
+            logger.error("Could not save %d unwritten match log records (%s): %s", len(records), e, records)
+
+    def _run(self):
+        batch = []
+        last_flush = last_sync = time.monotonic()
+        closing = False
+        dirty = False
+        while not closing:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                record = self._queue.get(timeout=timeout)
+                if record is None:
+                    closing = True
+                else:
+                    batch.append(record)
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            if batch and (closing or len(batch) >= self.batch_size or now - last_flush >= self.flush_interval):
+                for attempt in range(1, CLOSE_RETRIES + 1 if closing else 2):
+                    try:
+                        self._backend.write_batch(batch)
+                        self.written += len(batch)
+                        batch = []
+                        dirty = True
+                        break
+                    except Exception as e:
+                        # Keep the batch and retry on the next flush
+                        logger.error("Failed to write match log batch to '%s': %s", self.path, e)
+                        if closing and attempt < CLOSE_RETRIES:
+                            time.sleep(0.1 * attempt)
+                if closing and batch:
+                    self._spill(batch)
+                last_flush = now
+            elif not batch:
+                last_flush = now
+
+            if dirty and self.fsync_interval is not None and (closing or now - last_sync >= self.fsync_interval):
+                try:
+                    self._backend.sync()
+                    dirty = False
+                except Exception as e:
+                    logger.error("Failed to sync match log '%s': %s", self.path, e)
+                last_sync = now
+
+
+# --- Reading logs back ---
+
+# Old header-less logs: QR1, QR2, QTY1, QTY2 separated by tabs padded with stray spaces and empty fields
+_LEGACY_SEPARATOR = r'[\t ]*\t[\t ]*'
+_LEGACY_FIELDS = ['qr1_content', 'qr2_content', 'qr1_qty', 'qr2_qty']
+
+
+def iter_log_chunks(path, chunksize=500000):
+    """
+    Reads a match log (structured or old header-less format, optionally
+    gzipped) in chunks of up to chunksize records.
+
+    Yields:
+        DataFrame: One column per LOG_FIELDS entry, all strings ('' when missing).
+    """
+    # pandas is imported on first use so that importing this module stays cheap
+    import pandas as pd
+
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace', newline='') as f:
+        first_line = f.readline().rstrip("\r\n")
+        structured = first_line == LOG_HEADER
+        pending = [] if structured or not first_line.strip() else [first_line]
+
+        while True:
+            lines = pending + [line.rstrip("\r\n") for line in islice(f, chunksize - len(pending))]
+            pending = []
+            if not lines:
+                return
+            series = pd.Series(lines, dtype=object)
+            series = series[series.str.strip() != ""]
+
+            if structured:
+                chunk = series.str.split("\t", n=len(LOG_FIELDS) - 1, expand=True)
+                chunk = chunk.reindex(columns=range(len(LOG_FIELDS)))
+                chunk.columns = LOG_FIELDS
+            else:
+                chunk = series.str.strip().str.split(_LEGACY_SEPARATOR, n=len(_LEGACY_FIELDS) - 1,
+                                                     regex=True, expand=True)
+                chunk = chunk.reindex(columns=range(len(_LEGACY_FIELDS)))
+                chunk.columns = _LEGACY_FIELDS
+                chunk = chunk[chunk['qr1_content'] != 'PRODUCT_ID_QR_1']
+                chunk = chunk.reindex(columns=LOG_FIELDS)
+
+            yield chunk.fillna("").reset_index(drop=True)
@@ -0,0 +1,269 @@
+# fileOperation/payloadSchema.py
+import argparse
+import json
+import logging
+import re
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Parsed payloads kept per schema; label payloads repeat constantly while a code is in view
+DEFAULT_CACHE_SIZE = 4096
+
+# GS1 group separator (FNC1 inside an element string)
+GS = '\x1d'
+
+# GS1 Application Identifiers: AI -> (fixed data length, or None if variable; maximum data length).
+# AIs 310n-369n (measures) are four digits with six data digits and are handled by prefix.
+GS1_AIS = {
+    '00': (18, 18), '01': (14, 14), '02': (14, 14),
+    '10': (None, 20), '11': (6, 6), '12': (6, 6), '13': (6, 6), '15': (6, 6), '16': (6, 6), '17': (6, 6),
+    '20': (2, 2), '21': (None, 20), '22': (None, 20), '30': (None, 8), '37': (None, 8),
+    '240': (None, 30), '241': (None, 30), '250': (None, 30), '251': (None, 30),
+    '400': (None, 30), '401': (None, 30), '403': (None, 30),
+    '410': (13, 13), '411': (13, 13), '412': (13, 13), '413': (13, 13), '414': (13, 13), '415': (13, 13),
+    '420': (None, 20), '421': (None, 12), '8020': (None, 25),
+}
+_GS1_MEASURE_PREFIXES = ('31', '32', '33', '34', '35', '36')
+_GS1_HRI = re.compile(r'\((\d{2,4})\)([^(]*)')
+
+# Schemas for the label families in use. Payloads are stripped before extraction.
+DEFAULT_SCHEMA_SPECS = {
+    # ProductID/CustomerID labels: the quantity is the last 4 characters
+    'default': {'fields': [{'name': 'quantity', 'slice': [-4, None], 'strip': False}]},
+    # GS1 element strings (e.g. ]C1 01... 10... 37...)
+    'gs1': {'fields': [{'name': 'gtin', 'ai': '01'}, {'name': 'lot', 'ai': '10'}, {'name': 'serial', 'ai': '21'},
+                       {'name': 'quantity', 'ai': '37'}]},
+}
+
+_FIELD_KINDS = ('slice', 'regex', 'key', 'ai')
+
+
+def parse_key_values(payload):
+    """
+    Parses a multi-line 'key: value' payload into a dict. Keys and values are
+    stripped, lines without a ':' are ignored and the last of repeated keys wins.
+    """
+    result = {}
+    for line in payload.split('\n'):
+        if ':' in line:
+            key, value = line.split(':', 1)
+            result[key.strip()] = value.strip()
+    return result
+
+
+def parse_gs1(payload):
+    """
+    Parses a GS1 element string into {AI: value}.
+
+    Accepts the raw form (optional ]C1/]d2/]Q3 symbology prefix, variable-length
+    fields terminated by the GS character) and the human-readable
+    "(01)...(10)..." form. Parsing stops at the first unknown AI.
+    """
+    payload = payload.strip()
+    if payload.startswith('('):
+        return {ai: value.strip() for ai, value in _GS1_HRI.findall(payload)}
+    if payload[:1] == ']':
+        payload = payload[3:]
+
+    elements = {}
+    position = 0
+    while position < len(payload):
+        if payload[position] == GS:
+            position += 1
+            continue
+        for ai_length in (2, 3, 4):
+            ai = payload[position:position + ai_length]
+            spec = GS1_AIS.get(ai)
+            if spec is None and ai_length == 4 and ai[:2] in _GS1_MEASURE_PREFIXES and ai.isdigit():
+                spec = (6, 6)
+            if spec is not None:
+                break
+        else:
+            logger.debug("Unknown GS1 AI at position %d of '%s'", position, payload)
+            break
+
+        start = position + len(ai)
+        fixed, maximum = spec
+        if fixed is not None:
+            end = start + fixed
+        else:
+            separator = payload.find(GS, start)
+            end = min(len(payload) if separator == -1 else separator, start + maximum)
+        elements[ai] = payload[start:end]
+        position = end
+    return elements
+
+
+def _compile_field(spec):
+    """Turns one field spec into a function (payload, key_values, gs1_elements) -> value."""
+    kinds = [kind for kind in _FIELD_KINDS if kind in spec]
+    if len(kinds) != 1:
+        raise ValueError(f"Field '{spec.get('name')}' must have exactly one of: {', '.join(_FIELD_KINDS)}")
+    kind = kinds[0]
+
+    if kind == 'slice':
+        field_slice = slice(*spec['slice'])
+        get = lambda payload, key_values, elements: payload[field_slice]
+    elif kind == 'regex':
+        pattern = re.compile(spec['regex'])
+        group = spec.get('group', 1 if pattern.groups else 0)
+
+        def get(payload, key_values, elements):
+            match = pattern.search(payload)
+            return match.group(group) if match else None
+    elif kind == 'key':
+        key = spec['key'].strip()
+        get = lambda payload, key_values, elements: key_values.get(key)
+    else:
+        ai = str(spec['ai'])
+        get = lambda payload, key_values, elements: elements.get(ai)
+
+    default = spec.get('default')
+    if spec.get('strip', True):
+        def extract(payload, key_values, elements):
+            value = get(payload, key_values, elements)
+            return default if value is None else value.strip()
+        return kind, extract
+    if default is None:
+        return kind, get
+
+    def extract(payload, key_values, elements):
+        value = get(payload, key_values, elements)
+        return default if value is None else value
+    return kind, extract
+
+
+class PayloadSchema:
+    """
+    A declarative payload layout compiled into extractor functions.
+
+    Each field is a dict with a 'name' (a Python identifier) and exactly one of:
+
+    - 'slice': [start, end] character slice, as in Python (None for open ends)
+    - 'regex': pattern searched for in the payload; 'group' picks the group
+      (default: the first group, or the whole match if there is none)
+    - 'key': key of a 'key: value' line in a multi-line payload
+    - 'ai': GS1 Application Identifier, e.g. '01' (GTIN) or '10' (lot)
+
+    Optional per field: 'strip' (default True) strips the extracted value and
+    'default' is returned when the field is missing. With strip_payload the
+    whole payload is stripped first.
+
+    The layout is compiled once; extract() runs the field functions, parsing
+    key/value lines and GS1 elements at most once per payload, and caches
+    results per payload in an LRU cache (keyed by the payload's hash).
+    """
+
+    def __init__(self, name, fields, strip_payload=True, cache_size=DEFAULT_CACHE_SIZE):
+        self.name = name
+        self.fields = [dict(field) for field in fields]
+        self.strip_payload = strip_payload
+
+        names = [field.get('name') for field in self.fields]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Schema '{name}' has duplicate field names")
+        self.record = namedtuple('PayloadFields', names)
+
+        compiled = [_compile_field(field) for field in self.fields]
+        self._extractors = [extract for _, extract in compiled]
+        self._needs_key_values = any(kind == 'key' for kind, _ in compiled)
+        self._needs_gs1 = any(kind == 'ai' for kind, _ in compiled)
+        self.extract = lru_cache(maxsize=cache_size)(self._extract)
+
+    @classmethod
+    def from_spec(cls, name, spec, **kwargs):
+        """Builds a schema from a {'fields': [...], 'strip_payload': bool} dict, e.g. from JSON."""
+        return cls(name, spec['fields'], strip_payload=spec.get('strip_payload', True), **kwargs)
+
+    def _extract(self, payload):
+        """Returns the record (a namedtuple of the fields) for one payload."""
+        payload = '' if payload is None else str(payload)
+        if self.strip_payload:
+            payload = payload.strip()
+        key_values = parse_key_values(payload) if self._needs_key_values else None
+        elements = parse_gs1(payload) if self._needs_gs1 else None
+        return self.record._make(extract(payload, key_values, elements) for extract in self._extractors)
+
+    def extract_many(self, payloads):
+        """
+        Extracts every payload of an iterable (e.g. a log column) in order.
+        Repeated payloads are parsed once.
+        """
+        records = {}
+        extract = self.extract
+        result = []
+        for payload in payloads:
+            record = records.get(payload)
+            if record is None:
+                record = records[payload] = extract(payload)
+            result.append(record)
+        return result
+
+    def cache_info(self):
+        return self.extract.cache_info()
+
+
+# --- Schema registry ---
+
+_schemas = {}
+
+
+def register_schema(schema):
+    _schemas[schema.name] = schema
+    return schema
+
+
+def get_schema(family='default'):
+    """Returns the compiled schema for a product family."""
+    try:
+        return _schemas[family]
+    except KeyError:
+        raise KeyError(f"No payload schema for family '{family}'") from None
+
+
+def load_schemas(path):
+    """
+    Compiles and registers every schema in a JSON file of
+    {family: {'fields': [...], 'strip_payload': bool}}. Returns the family names.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        specs = json.load(f)
+    for family, spec in specs.items():
+        register_schema(PayloadSchema.from_spec(family, spec))
+    logger.debug("Loaded payload schemas %s from '%s'", sorted(specs), path)
+    return list(specs)
+
+
+for _family, _spec in DEFAULT_SCHEMA_SPECS.items():
+    register_schema(PayloadSchema.from_spec(_family, _spec))
+
+
+@lru_cache(maxsize=64)
+def slice_schema(start, end):
+    """A one-field schema taking the stripped [start:end] slice, for user-entered slicing parameters."""
+    return PayloadSchema(f"slice[{start}:{end}]", [{'name': 'value', 'slice': [start, end]}])
+
+
+@lru_cache(maxsize=64)
+def key_schema(key):
+    """A one-field schema reading `key` from a multi-line 'key: value' payload."""
+    return PayloadSchema('key_value', [{'name': 'value', 'key': key}], strip_payload=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Extract fields from QR payloads with a payload schema")
+    parser.add_argument("payloads", nargs='*', help="payloads to parse (default: one per line on stdin)")
+    parser.add_argument("--family", default='default', help="schema to apply (default: 'default')")
+    parser.add_argument("--schemas", help="JSON file with additional schemas")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    if args.schemas:
+        load_schemas(args.schemas)
+    schema = get_schema(args.family)
+    payloads = args.payloads or [line.rstrip("\r\n") for line in sys.stdin]
+    for payload, record in zip(payloads, schema.extract_many(payloads)):
+        print(json.dumps({'payload': payload, **record._asdict()}))
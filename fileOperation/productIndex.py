@@ -0,0 +1,258 @@
+# fileOperation/productIndex.py
+import time
+
+import numpy as np
+
+
+class ProductIndex:
+    """
+    Substring index over the ProductID column of the master CSV.
+
+    The scanner needs "the first CSV row whose ProductID appears somewhere
+    inside the scanned QR payload". Scanning every row with `in` is O(rows),
+    so instead the ProductIDs are hashed into buckets by length. A lookup
+    slices the payload once per distinct ProductID length and does a dict
+    lookup per slice, which is O(len(payload) * number_of_lengths) and does
+    not depend on the number of rows.
+    """
+
+    def __init__(self, product_ids, customer_ids):
+        """
+        Args:
+            product_ids (iterable): ProductIDs in CSV row order (already stripped).
+            customer_ids (iterable): CustomerIDs in the same order.
+        """
+        # ProductID -> (row number of first occurrence, CustomerID)
+        self._rows = {}
+        self._size = 0
+        self._add(product_ids, customer_ids)
+
+    def _add(self, product_ids, customer_ids):
+        for product_id, customer_id in zip(product_ids, customer_ids):
+            if product_id not in self._rows:
+                self._rows[product_id] = (self._size, customer_id)
+            self._size += 1
+        self._lengths = sorted({len(product_id) for product_id in self._rows})
+
+    def extended(self, product_ids, customer_ids):
+        """
+        Returns a new index with rows appended after the existing ones.
+        This index is not modified, so it can stay in use meanwhile.
+        """
+        index = ProductIndex([], [])
+        index._rows = dict(self._rows)
+        index._size = self._size
+        index._add(product_ids, customer_ids)
+        return index
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Builds the index from a DataFrame with 'productid' and 'customerid' columns."""
+        return cls(df['productid'].tolist(), df['customerid'].tolist())
+
+    def __len__(self):
+        return self._size
+
+    def get(self, product_id):
+        """Returns the CustomerID for an exact ProductID, or None if it is not in the CSV."""
+        entry = self._rows.get(product_id)
+        if entry is None:
+            return None
+        return entry[1]
+
+    def find(self, payload):
+        """
+        Finds the ProductID from the CSV that occurs as a substring of `payload`.
+
+        If several ProductIDs occur in the payload, the one from the earliest
+        CSV row wins, matching the old row-by-row scan.
+
+        Returns:
+            tuple: (product_id, customer_id), or None if nothing matches.
+        """
+        rows = self._rows
+        best = None
+        payload_len = len(payload)
+        for length in self._lengths:
+            if length > payload_len:
+                break
+            for start in range(payload_len - length + 1):
+                entry = rows.get(payload[start:start + length])
+                if entry is not None and (best is None or entry[0] < best[1][0]):
+                    best = (payload[start:start + length], entry)
+        if best is None:
+            return None
+        return best[0], best[1][1]
+
+
+class SortedProductIndex:
+    """
+    Compact variant of ProductIndex for very large master lists.
+
+    Instead of a dict of Python strings, the IDs are kept as fixed-width
+    UTF-8 byte arrays (a few bytes per character instead of ~60 bytes of
+    object overhead per string). Each ProductID length has its own sorted
+    key array, stored at exactly that width, so one unusually long ID does
+    not widen the arrays of all the others. Lookups binary-search each
+    bucket with np.searchsorted, testing all substrings of that length of
+    the payload in one call. Same interface and results as ProductIndex.
+    """
+
+    def __init__(self, product_ids, customer_ids):
+        # Length -> (sorted keys, CSV row of each key, CustomerID of each key)
+        self._buckets = {}
+        self._size = 0
+        self._add(product_ids, customer_ids)
+
+    def _add(self, product_ids, customer_ids):
+        # Encoded values stay Python bytes objects until they are split by length;
+        # one fixed-width array of all of them would be as wide as the longest ID
+        product_ids = _encode(product_ids)
+        customer_ids = _encode(customer_ids)
+        rows = np.arange(self._size, self._size + len(product_ids))
+        lengths = np.fromiter(map(len, product_ids), dtype=np.int64, count=len(product_ids))
+
+        # Existing buckets are replaced, never modified, so an index handed out
+        # earlier keeps working while extended() builds the new one
+        buckets = dict(self._buckets)
+        for length in np.unique(lengths).tolist():
+            picked = np.flatnonzero(lengths == length)
+            keys = product_ids[picked].astype(f'S{max(length, 1)}')
+            key_rows = rows[picked]
+            customers = customer_ids[picked].astype(bytes)
+            if length in buckets:
+                old_keys, old_rows, old_customers = buckets[length]
+                keys = np.concatenate([old_keys, keys])
+                key_rows = np.concatenate([old_rows, key_rows])
+                customers = np.concatenate([old_customers, customers])
+            # A stable sort keeps the first row first among duplicates, and only that row is kept
+            order = np.argsort(keys, kind='stable')
+            keys, key_rows, customers = keys[order], key_rows[order], customers[order]
+            first = np.ones(len(keys), bool)
+            first[1:] = keys[1:] != keys[:-1]
+            buckets[length] = (keys[first], key_rows[first], customers[first])
+
+        self._buckets = buckets
+        self._lengths = sorted(buckets)
+        self._size += len(product_ids)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Builds the index from a DataFrame with 'productid' and 'customerid' columns."""
+        return cls(df['productid'].tolist(), df['customerid'].tolist())
+
+    def extended(self, product_ids, customer_ids):
+        """
+        Returns a new index with rows appended after the existing ones. Only
+        the buckets of the new rows' lengths are rebuilt; this index is not
+        modified, so it can stay in use meanwhile.
+        """
+        index = SortedProductIndex([], [])
+        index._buckets = self._buckets
+        index._size = self._size
+        index._add(product_ids, customer_ids)
+        return index
+
+    def __len__(self):
+        return self._size
+
+    def get(self, product_id):
+        """Returns the CustomerID for an exact ProductID, or None if it is not in the CSV."""
+        product_id = product_id.encode('utf-8')
+        bucket = self._buckets.get(len(product_id))
+        if bucket is None:
+            return None
+        keys, _, customers = bucket
+        position = np.searchsorted(keys, product_id)
+        if position < len(keys) and keys[position] == product_id:
+            return customers[position].decode('utf-8')
+        return None
+
+    def find(self, payload):
+        """
+        Finds the ProductID from the CSV that occurs as a substring of `payload`.
+        The earliest CSV row wins, as in ProductIndex.find.
+
+        Returns:
+            tuple: (product_id, customer_id), or None if nothing matches.
+        """
+        # Byte offsets are fine: a UTF-8 encoded ID can only match on character boundaries
+        data = payload.encode('utf-8')
+        best = None
+        for length in self._lengths:
+            if length > len(data):
+                break
+            keys, rows, customers = self._buckets[length]
+            candidates = np.array([data[start:start + length] for start in range(len(data) - length + 1)],
+                                  dtype=keys.dtype)
+            positions = np.minimum(np.searchsorted(keys, candidates), len(keys) - 1)
+            hits = positions[keys[positions] == candidates]
+            if len(hits):
+                position = hits[np.argmin(rows[hits])]
+                if best is None or rows[position] < best[0]:
+                    best = (rows[position], keys[position], customers[position])
+        if best is None:
+            return None
+        return best[1].decode('utf-8'), best[2].decode('utf-8')
+
+
+def _encode(values):
+    """Encodes strings to UTF-8 in a numpy object array."""
+    encoded = np.empty(len(values), dtype=object)
+    encoded[:] = [str(value).encode('utf-8') for value in values]
+    return encoded
+
+
+def _linear_find(product_ids, customer_ids, payload):
+    """The original row-by-row scan, kept for the benchmark below."""
+    for product_id, customer_id in zip(product_ids, customer_ids):
+        if product_id in payload:
+            return product_id, customer_id
+    return None
+
+
+if __name__ == '__main__':
+    # Lookup latency benchmark with synthetic master data of increasing size.
+    import random
+
+    random.seed(0)
+    lookups = 200
+    for rows in (1_000, 100_000, 1_000_000):
+        product_ids = [f"HHID{n:08d}" for n in range(rows)]
+        customer_ids = [f"HHID3{n:08d}ID0018" for n in range(rows)]
+
+        start = time.perf_counter()
+        index = ProductIndex(product_ids, customer_ids)
+        build_time = time.perf_counter() - start
+
+        # Payloads look like real product labels: prefix + ProductID + quantity
+        payloads = [f"LBL-{random.choice(product_ids)}-0009" for _ in range(lookups)]
+
+        start = time.perf_counter()
+        for payload in payloads:
+            index.find(payload)
+        indexed_time = (time.perf_counter() - start) / lookups
+
+        start = time.perf_counter()
+        sorted_index = SortedProductIndex(product_ids, customer_ids)
+        sorted_build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for payload in payloads:
+            assert sorted_index.find(payload) == index.find(payload)
+        sorted_time = (time.perf_counter() - start) / lookups - indexed_time
+
+        # The linear scan is far too slow to run every lookup at 1M rows
+        linear_lookups = payloads[:max(1, lookups * 1_000 // rows)]
+        start = time.perf_counter()
+        for payload in linear_lookups:
+            _linear_find(product_ids, customer_ids, payload)
+        linear_time = (time.perf_counter() - start) / len(linear_lookups)
+
+        for payload in linear_lookups:
+            assert index.find(payload) == _linear_find(product_ids, customer_ids, payload)
+
+        print(f"{rows:>9} rows: build {build_time * 1000:8.1f} ms | "
+              f"indexed lookup {indexed_time * 1e6:8.2f} us | "
+              f"sorted build {sorted_build_time * 1000:8.1f} ms, lookup {sorted_time * 1e6:8.2f} us | "
+              f"linear scan {linear_time * 1e6:10.1f} us")
@@ -0,0 +1,138 @@
+# fileOperation/reconcile.py
+import argparse
+import logging
+import os
+import time
+
+import pandas as pd
+
+from fileOperation.masterData import DEFAULT_CSV_PATH, get_master_data
+from fileOperation.matchLog import iter_log_chunks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_PATH = os.path.join(os.path.dirname(DEFAULT_CSV_PATH), 'match_log.txt')
+
+# Columns of the mismatch report, in file order
+REPORT_FIELDS = ['status', 'timestamp', 'product_id', 'qr1_content', 'qr2_content', 'logged_customer_id',
+                 'csv_customer_id', 'csv_main_part', 'qr2_main_part', 'source']
+
+
+def master_table(master_data):
+    """
+    The master CSV as a 'product_id' -> 'csv_customer_id' frame to merge
+    log records with. The first CSV row wins for repeated ProductIDs, like
+    the scanner's index.
+    """
+    return (master_data.df[['productid', 'customerid']]
+            .drop_duplicates('productid')
+            .rename(columns={'productid': 'product_id', 'customerid': 'csv_customer_id'}))
+
+
+def reconcile_chunk(chunk, master_data, start_a, end_a, start_b, end_b, master=None):
+    """
+    Re-validates a chunk of logged pairs against the current master CSV.
+
+    The ProductID is taken from the log when it was recorded; old records
+    that only kept the raw QR1 payload are looked up once per distinct
+    payload. The CustomerID comparison is the same as checkDf.compare_ids,
+    done for the whole chunk at once: a merge on ProductID followed by
+    vectorized .str slicing. master is master_table(master_data), built
+    once by the caller for all chunks; it is built here if not given.
+
+    Returns:
+        DataFrame: The chunk with 'csv_customer_id', 'csv_main_part',
+        'qr2_main_part' and 'status' ('match', 'mismatch' or
+        'unknown_product') columns; 'logged_customer_id' is the CustomerID
+        the CSV had when the pair was logged.
+    """
+    chunk = chunk.rename(columns={'csv_customer_id': 'logged_customer_id', 'product_id': 'logged_product_id'})
+
+    # Fill in ProductIDs for records that do not have one
+    product_id = chunk['logged_product_id'].str.strip()
+    missing = product_id == ""
+    if missing.any():
+        qr1 = chunk.loc[missing, 'qr1_content']
+        found = {}
+        for payload in qr1.unique():
+            match = master_data.find_product(payload)
+            found[payload] = match[0] if match else ""
+        product_id = product_id.copy()
+        product_id[missing] = qr1.map(found)
+    chunk['product_id'] = product_id
+
+    if master is None:
+        master = master_table(master_data)
+    merged = chunk.merge(master, on='product_id', how='left')
+
+    known = merged['csv_customer_id'].notna()
+    merged['csv_main_part'] = merged['csv_customer_id'].fillna("").str.slice(start_a, end_a).str.strip()
+    merged['qr2_main_part'] = merged['qr2_content'].str.strip().str.slice(start_b, end_b).str.strip()
+    matched = known & (merged['csv_main_part'] == merged['qr2_main_part'])
+
+    merged['status'] = 'mismatch'
+    merged.loc[matched, 'status'] = 'match'
+    merged.loc[~known, 'status'] = 'unknown_product'
+    return merged
+
+
+def reconcile(log_paths, start_a, end_a, start_b, end_b, csv_file_path=DEFAULT_CSV_PATH,
+              output_path=None, chunksize=500000):
+    """
+    Re-validates every pair in the given match logs against the master CSV.
+
+    Logs are processed chunk by chunk, so memory use does not grow with the
+    size of the log. Records that no longer match (or whose ProductID is
+    no longer in the CSV) are appended to output_path as CSV.
+
+    Returns:
+        dict: Record counts per status, plus 'records' and 'seconds'.
+    """
+    started = time.perf_counter()
+    master_data = get_master_data(csv_file_path)
+    master = master_table(master_data)
+    counts = {'records': 0, 'match': 0, 'mismatch': 0, 'unknown_product': 0}
+    header_written = False
+
+    for path in log_paths:
+        logger.debug("Reconciling '%s' against '%s'", path, master_data.csv_path)
+        for chunk in iter_log_chunks(path, chunksize):
+            result = reconcile_chunk(chunk, master_data, start_a, end_a, start_b, end_b, master=master)
+            counts['records'] += len(result)
+            for status, number in result['status'].value_counts().items():
+                counts[status] += int(number)
+
+            failures = result[result['status'] != 'match']
+            if output_path and len(failures):
+                failures = failures.assign(source=os.path.basename(path)).reindex(columns=REPORT_FIELDS)
+                failures.to_csv(output_path, mode='a' if header_written else 'w', header=not header_written,
+                                index=False)
+                header_written = True
+
+    if output_path and not header_written:
+        pd.DataFrame(columns=REPORT_FIELDS).to_csv(output_path, index=False)
+    counts['seconds'] = time.perf_counter() - started
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-validate logged matches against the current master CSV")
+    parser.add_argument("logs", nargs='*', default=[DEFAULT_LOG_PATH],
+                        help="match logs to check, plain or .gz (default: match_log.txt)")
+    parser.add_argument("--slices", type=int, nargs=4, required=True,
+                        metavar=('START_A', 'END_A', 'START_B', 'END_B'),
+                        help="CustomerID slices compared, as entered in the scanner")
+    parser.add_argument("--csv", default=DEFAULT_CSV_PATH, help="master CSV with ProductID/CustomerID")
+    parser.add_argument("-o", "--output", default="reconcile_mismatches.csv",
+                        help="CSV report of records that no longer match")
+    parser.add_argument("--chunksize", type=int, default=500000, help="log records processed at a time")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    summary = reconcile(args.logs, *args.slices, csv_file_path=args.csv, output_path=args.output,
+                        chunksize=args.chunksize)
+    print(f"Checked {summary['records']} logged pairs in {summary['seconds']:.2f}s: "
+          f"{summary['match']} match, {summary['mismatch']} mismatch, "
+          f"{summary['unknown_product']} with a ProductID no longer in the CSV")
+    if summary['mismatch'] or summary['unknown_product']:
+        print(f"Mismatches written to '{args.output}'")
@@ -0,0 +1,302 @@
+# fileOperation/scanDb.py
+import argparse
+import datetime
+import glob
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scans.db'))
+
+SCAN_FIELDS = ['timestamp', 'product_id', 'customer_id', 'qr1_content', 'qr2_content',
+               'qr1_qty', 'qr2_qty', 'match', 'source']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id          INTEGER PRIMARY KEY,
+    timestamp   TEXT NOT NULL,  -- local time, ISO 8601
+    product_id  TEXT,           -- ProductID matched in the CSV
+    customer_id TEXT,           -- CustomerID from the CSV for that ProductID
+    qr1_content TEXT,           -- raw product QR payload
+    qr2_content TEXT,           -- raw customer QR payload
+    qr1_qty     TEXT,
+    qr2_qty     TEXT,
+    match       INTEGER,        -- 1 match, 0 no match, NULL unknown
+    source      TEXT            -- 'scanner', 'match_log', 'json', ...
+);
+CREATE INDEX IF NOT EXISTS idx_scans_product ON scans (product_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_scans_customer ON scans (customer_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_scans_timestamp ON scans (timestamp);
+CREATE TABLE IF NOT EXISTS imports (
+    path  TEXT PRIMARY KEY,
+    size  INTEGER,
+    mtime REAL,
+    rows  INTEGER   -- records read from the file, including ones already in the database
+);
+"""
+
+
+def now_timestamp():
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+class ScanDatabase:
+    """
+    Embedded SQLite store of every scan, with indexes on ProductID,
+    CustomerID and timestamp.
+
+    The database runs in WAL mode so reports can query it while a scanner
+    is writing. One connection is shared behind a lock, so a ScanDatabase
+    can be used from several threads.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def record(self, **scan):
+        """Inserts one scan. Missing fields are NULL; the timestamp defaults to now."""
+        self.record_many([scan])
+
+    def record_many(self, scans):
+        """Inserts many scans in a single transaction."""
+        rows = []
+        for scan in scans:
+            match = scan.get('match')
+            rows.append([scan.get('timestamp') or now_timestamp()]
+                        + [scan.get(field) for field in SCAN_FIELDS[1:7]]
+                        + [None if match is None else int(bool(match)), scan.get('source', 'scanner')])
+        placeholders = ", ".join("?" for _ in SCAN_FIELDS)
+        with self._lock, self._conn:
+            self._conn.executemany(f"INSERT INTO scans ({', '.join(SCAN_FIELDS)}) VALUES ({placeholders})", rows)
+
+    def query(self, product_id=None, customer_id=None, since=None, until=None, match=None, limit=1000):
+        """
+        Returns scans as a list of dicts, newest first.
+
+        Args:
+            product_id (str): Exact ProductID.
+            customer_id (str): Exact CSV CustomerID.
+            since (str): Earliest timestamp (inclusive), ISO 8601; a date like '2024-05-01' works.
+            until (str): Latest timestamp (exclusive).
+            match (bool): Only matches (True) or only mismatches (False).
+            limit (int): Maximum number of rows, or None for all.
+        """
+        where, params = self._filters(product_id, customer_id, since, until, match)
+        sql = f"SELECT * FROM scans{where} ORDER BY timestamp DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def count(self, product_id=None, customer_id=None, since=None, until=None, match=None):
+        """Counts the scans matching the same filters as query()."""
+        where, params = self._filters(product_id, customer_id, since, until, match)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM scans{where}", params).fetchone()[0]
+
+    @staticmethod
+    def _filters(product_id, customer_id, since, until, match):
+        clauses, params = [], []
+        for column, value in (('product_id', product_id), ('customer_id', customer_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if match is not None:
+            clauses.append("match = ?")
+            params.append(int(bool(match)))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- One-shot import of the older flat files ---
+
+    def _previous_import(self, path):
+        with self._lock:
+            return self._conn.execute("SELECT size, mtime, rows FROM imports WHERE path = ?",
+                                      [os.path.abspath(path)]).fetchone()
+
+    def _drop_known(self, scans):
+        """Drops the scans already in the database, by timestamp and both payloads."""
+        with self._lock:
+            return [scan for scan in scans
+                    if self._conn.execute("SELECT 1 FROM scans WHERE timestamp = ? AND qr1_content IS ? "
+                                          "AND qr2_content IS ? LIMIT 1",
+                                          [scan.get('timestamp'), scan.get('qr1_content'),
+                                           scan.get('qr2_content')]).fetchone() is None]
+
+    def _mark_imported(self, path, stat, rows):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO imports (path, size, mtime, rows) VALUES (?, ?, ?, ?)",
+                               [os.path.abspath(path), stat.st_size, stat.st_mtime, rows])
+
+    def import_file(self, path, master_data=None, force=False):
+        """
+        Imports a match log (structured or old header-less TSV, optionally
+        gzipped) or a JSON list of scanned payloads. Each file is imported
+        once; re-running skips files that have not changed unless force=True,
+        and for a file that grew only the records after the ones read last
+        time are imported. Scans already in the database (same timestamp and
+        payloads, e.g. recorded by the scanner itself) are never added again.
+
+        master_data (a fileOperation.masterData.MasterData) is used to fill in
+        ProductID/CustomerID for old records that only kept raw payloads.
+
+        Returns:
+            int: Number of scans imported (0 if skipped).
+        """
+        stat = os.stat(path)
+        previous = None if force else self._previous_import(path)
+        if previous is not None and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime:
+            logger.debug("Skipping already imported file: %s", path)
+            return 0
+
+        if path.endswith('.json'):
+            scans = _read_json_list(path)
+        else:
+            scans = _read_match_log(path)
+        read = len(scans)
+        if previous is not None and stat.st_size > previous['size']:
+            # Appended to since the last import: its first records are in the database already
+            scans = scans[previous['rows']:]
+
+        if master_data is not None:
+            for scan in scans:
+                if not scan.get('product_id') and scan.get('qr1_content'):
+                    product = master_data.find_product(scan['qr1_content'])
+                    if product is not None:
+                        scan['product_id'], scan['customer_id'] = product
+
+        scans = self._drop_known(scans)
+        self.record_many(scans)
+        self._mark_imported(path, stat, read)
+        logger.info("Imported %d scans from '%s'", len(scans), path)
+        return len(scans)
+
+
+def _file_timestamp(path):
+    return datetime.datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec='seconds')
+
+
+def _read_match_log(path):
+    """Reads a match log in the structured (header) or old 4-column format."""
+    from fileOperation.matchLog import iter_log_chunks
+
+    # Old records have no timestamps; the file's modification time is the best available one
+    timestamp = _file_timestamp(path)
+    scans = []
+    for chunk in iter_log_chunks(path):
+        for record in chunk.to_dict('records'):
+            scans.append({'timestamp': record['timestamp'] or timestamp,
+                          'product_id': record['product_id'] or None,
+                          'customer_id': record['csv_customer_id'] or None,
+                          'qr1_content': record['qr1_content'], 'qr2_content': record['qr2_content'] or None,
+                          'qr1_qty': record['qr1_qty'] or None, 'qr2_qty': record['qr2_qty'] or None,
+                          'match': True, 'source': 'match_log'})
+    return scans
+
+
+def _read_json_list(path):
+    """Reads a JSON list of scanned payloads, or of 'QR1<TAB>QR2' pairs from the duplicate checker."""
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    timestamp = _file_timestamp(path)
+    scans = []
+    for entry in entries if isinstance(entries, list) else []:
+        qr1_content, _, qr2_content = str(entry).partition("\t")
+        scans.append({'timestamp': timestamp, 'qr1_content': qr1_content, 'qr2_content': qr2_content or None,
+                      'source': 'json'})
+    return scans
+
+
+def _is_old_match_log(path):
+    """True if path is a match log in the old header-less format (plain or gzipped)."""
+    from fileOperation.matchLog import LOG_HEADER
+
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        return f.readline().rstrip("\r\n") != LOG_HEADER
+
+
+def default_import_paths(root=os.path.dirname(DEFAULT_DB_PATH)):
+    """
+    The flat files in the repo root that predate the database: match logs in
+    the old format (as written, or rotated away into an archive) and the
+    original scanner's JSON scan lists.
+
+    Structured match logs, their archives and side files, and the duplicate
+    checker's pair list are left out: every scan in them was also recorded
+    in the database by the scanner.
+    """
+    logs = [os.path.join(root, 'match_log.txt')] + sorted(glob.glob(os.path.join(root, 'match_log.*.txt.gz')))
+    paths = [path for path in logs if os.path.exists(path) and _is_old_match_log(path)]
+    paths += [path for path in (os.path.join(root, 'scanned_qrcodes_master_list.json'),
+                                os.path.join(root, 'qr_contents', 'scanned_qrcodes.json'))
+              if os.path.exists(path)]
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Query or fill the local scan database")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="database file (default: scans.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    query_parser = commands.add_parser('query', help="list scans")
+    query_parser.add_argument("--product", help="exact ProductID")
+    query_parser.add_argument("--customer", help="exact CSV CustomerID")
+    query_parser.add_argument("--since", help="earliest timestamp or date, e.g. 2024-05-01")
+    query_parser.add_argument("--until", help="timestamp or date to stop before")
+    query_parser.add_argument("--today", action="store_true", help="only scans from today")
+    query_parser.add_argument("--matches", action="store_true", help="only matches")
+    query_parser.add_argument("--mismatches", action="store_true", help="only mismatches")
+    query_parser.add_argument("--limit", type=int, default=100)
+    query_parser.add_argument("--count", action="store_true", help="print only the number of scans")
+
+    import_parser = commands.add_parser('import', help="import match logs and JSON scan lists")
+    import_parser.add_argument("paths", nargs='*', help="files to import (default: the repo's existing logs)")
+    import_parser.add_argument("--force", action="store_true", help="re-import files imported before")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    db = ScanDatabase(args.db)
+
+    if args.command == 'query':
+        since = datetime.date.today().isoformat() if args.today else args.since
+        match = True if args.matches else (False if args.mismatches else None)
+        if args.count:
+            print(db.count(args.product, args.customer, since, args.until, match))
+        else:
+            for scan in reversed(db.query(args.product, args.customer, since, args.until, match, args.limit)):
+                print("\t".join("" if scan[field] is None else str(scan[field]) for field in SCAN_FIELDS))
+    else:
+        try:
+            from fileOperation.masterData import get_master_data
+            master_data = get_master_data()
+        except Exception as e:
+            logger.debug("Importing without ProductID lookup, master data unavailable: %s", e)
+            master_data = None
+        total = sum(db.import_file(path, master_data, force=args.force)
+                    for path in (args.paths or default_import_paths()))
+        print(f"Imported {total} scans into '{args.db}'")
+
+    db.close()
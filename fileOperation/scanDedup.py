@@ -0,0 +1,221 @@
+# fileOperation/scanDedup.py
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Logged "QR1<TAB>QR2" pair keys for the long-term duplicate check. This is kept apart from
+# scanned_qrcodes_master_list.json, which holds the bare ProductIDs of the original scanner.
+PAIR_LIST_NAME = "scanned_pairs.json"
+
+
+class RecentScans:
+    """
+    Keys seen in the last window_seconds, capped at max_items.
+
+    Entries are kept in insertion order in an OrderedDict, so expiring old
+    ones and evicting past the cap only ever touches the front.
+    """
+
+    def __init__(self, window_seconds=300, max_items=10000):
+        self.window_seconds = window_seconds
+        self.max_items = max_items
+        self._items = OrderedDict()
+
+    def _expire(self, now):
+        while self._items:
+            key, seen_at = next(iter(self._items.items()))
+            if now - seen_at < self.window_seconds and len(self._items) <= self.max_items:
+                break
+            self._items.popitem(last=False)
+
+    def __contains__(self, key):
+        self._expire(time.monotonic())
+        return key in self._items
+
+    def add(self, key):
+        self._items.pop(key, None)
+        self._items[key] = time.monotonic()
+        self._expire(time.monotonic())
+
+    def __len__(self):
+        return len(self._items)
+
+
+class BloomFilter:
+    """
+    Scalable Bloom filter: membership in O(k) with no false negatives.
+
+    When more than `capacity` keys have been added, a new layer with twice
+    the capacity and half the error rate is stacked on top, so the overall
+    false-positive rate stays below roughly 2 * error_rate however large
+    the pair list grows.
+    """
+
+    def __init__(self, capacity=100000, error_rate=1e-6):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = 0
+        self._layers = []
+        self._add_layer(capacity, error_rate / 2)
+
+    def _add_layer(self, capacity, error_rate):
+        bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        hashes = max(1, round(bits / capacity * math.log(2)))
+        self._layers.append({'bits': bytearray((bits + 7) // 8), 'size': bits, 'hashes': hashes,
+                             'capacity': capacity, 'count': 0})
+
+    @staticmethod
+    def _positions(key, size, hashes):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % size for i in range(hashes)]
+
+    def __contains__(self, key):
+        for layer in self._layers:
+            bits = layer['bits']
+            if all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key, layer['size'], layer['hashes'])):
+                return True
+        return False
+
+    def add(self, key):
+        layer = self._layers[-1]
+        if layer['count'] >= layer['capacity']:
+            self._add_layer(layer['capacity'] * 2, self.error_rate / 2 ** (len(self._layers) + 1))
+            layer = self._layers[-1]
+        bits = layer['bits']
+        for p in self._positions(key, layer['size'], layer['hashes']):
+            bits[p >> 3] |= 1 << (p & 7)
+        layer['count'] += 1
+        self.count += 1
+
+
+class JsonListFile:
+    """
+    A JSON array of strings on disk that is appended to in place.
+
+    append() seeks back over the closing ']' and writes ', "new"]', so each
+    new entry costs one small write instead of rewriting the whole list.
+    The file stays valid JSON after every append.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("[]")
+
+    def load(self):
+        """Returns the current entries as a list of strings."""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            raise ValueError(f"'{self.path}' does not contain a JSON list")
+        return [str(entry) for entry in entries]
+
+    def append(self, entries):
+        if not entries:
+            return
+        with open(self.path, 'r+b') as f:
+            # Find the closing bracket, skipping trailing whitespace
+            char = prev = b""
+            position = f.seek(0, os.SEEK_END)
+            while position > 0:
+                f.seek(position - 1)
+                char = f.read(1)
+                if not char.isspace():
+                    break
+                position -= 1
+            if char != b']':
+                raise ValueError(f"'{self.path}' does not end with a JSON list")
+
+            # Is the list empty? Look at the last non-space character before ']'
+            before = position - 1
+            while before > 0:
+                f.seek(before - 1)
+                prev = f.read(1)
+                if not prev.isspace():
+                    break
+                before -= 1
+            separator = b"" if prev == b"[" else b", "
+
+            f.seek(position - 1)
+            encoded = ", ".join(json.dumps(entry) for entry in entries).encode('utf-8')
+            f.write(separator + encoded + b"]")
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ScanDeduplicator:
+    """
+    Duplicate-scan suppression for product/customer pairs.
+
+    - A RecentScans window catches an operator pressing 's' twice: a pair is
+      suppressed for window_seconds after it was logged, then logged again.
+    - Optionally (pair_list_path given) every logged pair is also appended
+      in place to a persistent JSON list, and a BloomFilter over that list
+      suppresses a pair logged in any earlier session, for good, in O(1)
+      without keeping every pair in memory.
+    """
+
+    def __init__(self, window_seconds=300, pair_list_path=None, max_recent=10000, error_rate=1e-6):
+        self.recent = RecentScans(window_seconds, max_recent)
+        self.pair_list = None
+        self.seen = None
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        if pair_list_path is None:
+            return
+
+        self.pair_list = JsonListFile(pair_list_path)
+        entries = self.pair_list.load()
+        self.seen = BloomFilter(capacity=max(100000, len(entries) * 2), error_rate=error_rate)
+        for entry in entries:
+            self.seen.add(entry)
+        logger.debug("Loaded %s logged pairs from '%s'", len(entries), pair_list_path)
+
+    @staticmethod
+    def pair_key(qr1_content, qr2_content):
+        return f"{qr1_content}\t{qr2_content}"
+
+    def check(self, qr1_content, qr2_content):
+        """
+        Returns:
+            str: 'recent' if the pair was logged within the time window,
+                 'seen' if it is (very probably) in the persistent pair list,
+                 None if it is new.
+        """
+        key = self.pair_key(qr1_content, qr2_content)
+        with self._lock:
+            if key in self.recent:
+                return 'recent'
+            if self.seen is not None and key in self.seen:
+                return 'seen'
+            return None
+
+    def record(self, qr1_content, qr2_content):
+        """Remembers a logged pair (and appends it to the pair list, if there is one)."""
+        self.record_many([(qr1_content, qr2_content)])
+
+    def record_many(self, pairs):
+        """Remembers several logged (qr1_content, qr2_content) pairs with a single pair list append."""
+        new_keys = []
+        with self._lock:
+            for qr1_content, qr2_content in pairs:
+                key = self.pair_key(qr1_content, qr2_content)
+                self.recent.add(key)
+                if self.seen is not None and key not in self.seen:
+                    self.seen.add(key)
+                    new_keys.append(key)
+        # The fsynced append runs under its own lock, so check() is never held up by the disk
+        if new_keys:
+            with self._file_lock:
+                self.pair_list.append(new_keys)
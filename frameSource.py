@@ -0,0 +1,270 @@
+import logging
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+
+class FrameSource:
+    """
+    Base class for anything that produces BGR frames.
+
+    Sources follow the cv2.VideoCapture calling convention (read() returns
+    (ret, frame), plus isOpened() and release()), so they can be handed to
+    ScanPipeline or any loop written against a VideoCapture. They can also
+    be iterated over and used as context managers.
+    """
+
+    name = "source"
+
+    def read(self):
+        raise NotImplementedError
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+    def __iter__(self):
+        while True:
+            ret, frame = self.read()
+            if not ret:
+                return
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+# --- Webcam ---
+
+def default_backends():
+    """Capture backends worth trying on this platform, most specific first."""
+    if sys.platform == 'win32':
+        return [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]
+    if sys.platform == 'darwin':
+        return [cv2.CAP_AVFOUNDATION, cv2.CAP_ANY]
+    return [cv2.CAP_V4L2, cv2.CAP_ANY]
+
+
+class WebcamSource(FrameSource):
+    """
+    A local camera.
+
+    With index=None, camera indices 0-2 are probed; with backends=None the
+    platform defaults are tried in order. Requested width/height/fps are set
+    on the device and the values the driver actually negotiated are read
+    back into self.width, self.height and self.fps.
+    """
+
+    def __init__(self, index=None, backends=None, width=None, height=None, fps=None):
+        self.cap = None
+        indices = range(0, 3) if index is None else [index]
+        for i in indices:
+            for backend in backends or default_backends():
+                cap = cv2.VideoCapture(i, backend)
+                if cap.isOpened():
+                    self.cap = cap
+                    self.index = i
+                    self.backend = backend
+                    break
+                cap.release()
+            if self.cap is not None:
+                break
+
+        if self.cap is None:
+            self.width = self.height = self.fps = None
+            return
+
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.name = f"camera {self.index}"
+        logger.info("Camera opened at index %d with backend %d (%dx%d @ %.0f fps)",
+                    self.index, self.backend, self.width, self.height, self.fps)
+
+    def read(self):
+        if self.cap is None:
+            return False, None
+        return self.cap.read()
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+# --- Video file / stream ---
+
+class VideoFileSource(FrameSource):
+    """
+    A video file or stream URL (e.g. rtsp://) opened through cv2.VideoCapture.
+
+    With realtime=True frames are paced at the file's frame rate, so a
+    recording behaves like a live camera. With loop=True the file restarts
+    at the end instead of running out.
+    """
+
+    def __init__(self, path, loop=False, realtime=False):
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.name = os.path.basename(path) or path
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._next_frame_time = None
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+
+        if ret and self.realtime:
+            now = time.perf_counter()
+            if self._next_frame_time is not None and now < self._next_frame_time:
+                time.sleep(self._next_frame_time - now)
+            self._next_frame_time = max(now, self._next_frame_time or now) + 1.0 / self.fps
+        return ret, frame
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+
+# --- Image folder ---
+
+class ImageFolderSource(FrameSource):
+    """The images in a directory, in file-name order."""
+
+    def __init__(self, folder, loop=False):
+        self.folder = folder
+        self.loop = loop
+        self.name = os.path.basename(os.path.normpath(folder))
+        self.paths = sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.position = 0
+        self.current_path = None
+
+    def read(self):
+        while True:
+            if self.position >= len(self.paths):
+                if not self.loop or not self.paths:
+                    return False, None
+                self.position = 0
+            self.current_path = self.paths[self.position]
+            self.position += 1
+            frame = cv2.imread(self.current_path)
+            if frame is not None:
+                return True, frame
+            logger.error("Could not read image: %s", self.current_path)
+
+    def isOpened(self):
+        return bool(self.paths)
+
+
+# --- Synthetic ---
+
+class SyntheticSource(FrameSource):
+    """
+    Renders QR codes with qr_generate's QR settings onto a blank frame.
+
+    Each payload is shown for frames_per_payload frames, cycling through
+    the list. Gaussian noise (standard deviation in grey levels) and blur
+    (kernel size) can be added to imitate a real camera. count limits the
+    total number of frames; None means unlimited. The same seed always
+    produces the same frames.
+    """
+
+    def __init__(self, payloads, frame_size=(640, 480), code_size=240, noise=0.0, blur=0,
+                 frames_per_payload=1, count=None, seed=0):
+        from qr_generate import make_qr_image
+
+        self.payloads = list(payloads)
+        self.frame_size = frame_size
+        self.noise = noise
+        self.blur = blur
+        self.frames_per_payload = frames_per_payload
+        self.count = count
+        self.frame_number = 0
+        self.name = "synthetic"
+        self._rng = np.random.default_rng(seed)
+
+        width, height = frame_size
+        self._frames = []
+        for payload in self.payloads:
+            code = np.array(make_qr_image(payload).convert('L'))
+            code = cv2.resize(code, (code_size, code_size), interpolation=cv2.INTER_NEAREST)
+            frame = np.full((height, width), 255, np.uint8)
+            x0 = (width - code_size) // 2
+            y0 = (height - code_size) // 2
+            frame[y0:y0 + code_size, x0:x0 + code_size] = code
+            self._frames.append(cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+
+    @property
+    def current_payload(self):
+        """The payload rendered in the most recently read frame."""
+        if not self.payloads or self.frame_number == 0:
+            return None
+        return self.payloads[((self.frame_number - 1) // self.frames_per_payload) % len(self.payloads)]
+
+    def read(self):
+        if not self._frames or (self.count is not None and self.frame_number >= self.count):
+            return False, None
+        frame = self._frames[(self.frame_number // self.frames_per_payload) % len(self._frames)]
+        self.frame_number += 1
+
+        if self.blur:
+            kernel = self.blur | 1  # GaussianBlur needs an odd kernel size
+            frame = cv2.GaussianBlur(frame, (kernel, kernel), 0)
+        if self.noise:
+            noisy = frame + self._rng.normal(0, self.noise, frame.shape)
+            frame = np.clip(noisy, 0, 255).astype(np.uint8)
+        else:
+            frame = frame.copy()
+        return True, frame
+
+    def isOpened(self):
+        return bool(self._frames)
+
+
+def open_source(spec=None, **options):
+    """
+    Opens a frame source from a short description:
+
+    - None or a camera index (int or digit string) -> WebcamSource
+    - "synthetic:PAYLOAD1,PAYLOAD2"                 -> SyntheticSource
+    - a directory                                   -> ImageFolderSource
+    - anything else (file path or stream URL)       -> VideoFileSource
+
+    Extra keyword options are passed to the source's constructor.
+    """
+    if spec is None:
+        return WebcamSource(**options)
+    if isinstance(spec, int) or str(spec).isdigit():
+        return WebcamSource(index=int(spec), **options)
+    if spec.startswith('synthetic:'):
+        return SyntheticSource(spec[len('synthetic:'):].split(','), **options)
+    if os.path.isdir(spec):
+        return ImageFolderSource(spec, **options)
+    return VideoFileSource(spec, **options)
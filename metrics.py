@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Stages timed by the scanner, in pipeline order
+STAGES = ['capture', 'preprocess', 'decode', 'latency', 'lookup', 'compare', 'render']
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class StageStats:
+    """Rolling window of the last `window` durations of one stage, plus lifetime count and sum."""
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self, quantiles=QUANTILES):
+        """Returns {quantile: seconds} over the rolling window (empty if nothing was recorded)."""
+        if not self.samples:
+            return {}
+        values = np.quantile(np.fromiter(self.samples, float, len(self.samples)), quantiles)
+        return dict(zip(quantiles, values.tolist()))
+
+
+class Metrics:
+    """
+    Process-wide stage timings and event rates.
+
+    Recording is a perf_counter() call and a deque append under a lock, so
+    it is cheap enough to leave on in the frame loop. Percentiles are only
+    computed when someone asks for them (the overlay or /metrics).
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._stages = {}
+        self._events = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, stage, seconds):
+        recorded = getattr(self._local, 'recorded', None)
+        if recorded is not None:
+            recorded.append((stage, seconds))
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats(self.window)
+            stats.add(seconds)
+
+    @contextmanager
+    def recording(self):
+        """
+        Also collects the (stage, seconds) samples observed on this thread
+        inside the with-block into the yielded list, so a worker process can
+        send them back to the parent with its result.
+        """
+        recorded = self._local.recorded = []
+        try:
+            yield recorded
+        finally:
+            self._local.recorded = None
+
+    @contextmanager
+    def time(self, stage):
+        """Times the body of a with-block as one sample of `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def tick(self, event):
+        """Counts one occurrence of `event` (e.g. a displayed frame) for rate()."""
+        now = time.perf_counter()
+        with self._lock:
+            times = self._events.get(event)
+            if times is None:
+                times = self._events[event] = deque(maxlen=self.window)
+            times.append(now)
+
+    def rate(self, event, span=2.0):
+        """Occurrences of `event` per second over the last `span` seconds."""
+        now = time.perf_counter()
+        with self._lock:
+            times = self._events.get(event)
+            if not times:
+                return 0.0
+            recent = sum(1 for t in times if now - t <= span)
+        return recent / span
+
+    def snapshot(self):
+        """Returns {stage: {'count', 'sum', 'p50', 'p95', 'p99'}} with times in seconds."""
+        with self._lock:
+            stages = {stage: (stats.count, stats.total, list(stats.samples)) for stage, stats in self._stages.items()}
+        result = {}
+        for stage, (count, total, samples) in stages.items():
+            entry = {'count': count, 'sum': total}
+            if samples:
+                values = np.quantile(np.asarray(samples, float), QUANTILES)
+                entry.update({f"p{round(q * 100)}": v for q, v in zip(QUANTILES, values.tolist())})
+            result[stage] = entry
+        return result
+
+    def prometheus_text(self):
+        """The metrics in the Prometheus text exposition format."""
+        lines = ["# HELP bht_stage_seconds Time spent per scanner stage (rolling-window quantiles).",
+                 "# TYPE bht_stage_seconds summary"]
+        for stage, entry in sorted(self.snapshot().items()):
+            for q in QUANTILES:
+                key = f"p{round(q * 100)}"
+                if key in entry:
+                    lines.append(f'bht_stage_seconds{{stage="{stage}",quantile="{q}"}} {entry[key]:.6f}')
+            lines.append(f'bht_stage_seconds_sum{{stage="{stage}"}} {entry["sum"]:.6f}')
+            lines.append(f'bht_stage_seconds_count{{stage="{stage}"}} {entry["count"]}')
+
+        lines += ["# HELP bht_event_rate Events per second over the last 2 seconds.",
+                  "# TYPE bht_event_rate gauge"]
+        with self._lock:
+            events = sorted(self._events)
+        for event in events:
+            lines.append(f'bht_event_rate{{event="{event}"}} {self.rate(event):.3f}')
+        return "\n".join(lines) + "\n"
+
+
+# Shared by the pipeline threads and the UI loop
+METRICS = Metrics()
+
+
+def draw_overlay(frame, metrics=METRICS, stages=STAGES, origin=None):
+    """
+    Draws FPS and p50/p95 per stage in the top-right corner of the frame.
+    """
+    lines = [f"UI {metrics.rate('frame'):.1f} fps | decode {metrics.rate('decode'):.1f}/s"]
+    snapshot = metrics.snapshot()
+    for stage in stages:
+        entry = snapshot.get(stage)
+        if entry and 'p50' in entry:
+            lines.append(f"{stage:<10} p50 {entry['p50'] * 1000:6.1f}  p95 {entry['p95'] * 1000:6.1f} ms")
+
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    scale, thickness, line_height = 0.45, 1, 18
+    width = max(cv2.getTextSize(line, font, scale, thickness)[0][0] for line in lines)
+    x, y = origin or (frame.shape[1] - width - 15, 10)
+    cv2.rectangle(frame, (x - 5, y), (x + width + 5, y + line_height * len(lines) + 6), (0, 0, 0), -1)
+    for i, line in enumerate(lines):
+        cv2.putText(frame, line, (x, y + line_height * (i + 1)), font, scale, (255, 255, 255), thickness, cv2.LINE_AA)
+
+
+# --- HTTP endpoint ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics = METRICS
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.metrics.prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics endpoint: " + format, *args)
+
+
+def serve_metrics(port, host='127.0.0.1', metrics=METRICS):
+    """
+    Serves metrics in Prometheus text format at http://host:port/metrics
+    from a daemon thread. Binds to localhost by default. Returns the server;
+    call shutdown() on it to stop.
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,), {'metrics': metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, server.server_address[1])
+    return server
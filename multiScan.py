@@ -0,0 +1,102 @@
+from collections import namedtuple
+
+from fileOperation import checkDf as cmp
+from fileOperation.checkDf import extract_quantity
+
+# One decoded code in a frame. For customer codes product_id and customer_id are None.
+Code = namedtuple('Code', ['payload', 'points', 'center', 'product_id', 'customer_id'])
+
+# A product code and the customer code paired with it, plus the comparison of the two
+PairResult = namedtuple('PairResult', ['product', 'customer', 'result'])
+
+
+def _center(points):
+    if not points:
+        return (0.0, 0.0)
+    return (sum(x for x, _ in points) / len(points), sum(y for _, y in points) / len(points))
+
+
+def classify_codes(decoded, product_index):
+    """
+    Splits the codes decoded from one frame into product and customer codes.
+
+    A code is a product code if a ProductID from the CSV occurs in its
+    payload (the same test the single-code workflow uses for QR1);
+    everything else is treated as a customer code. A payload decoded twice
+    in the same frame is only kept once.
+
+    Args:
+        decoded (list): (data, points) tuples, as returned by the scan pipeline decoders.
+        product_index (ProductIndex): Index over the master CSV.
+
+    Returns:
+        tuple: (products, customers), two lists of Code.
+    """
+    products, customers = [], []
+    seen = set()
+    for payload, points in decoded:
+        if not payload or payload in seen:
+            continue
+        seen.add(payload)
+        match = product_index.find(payload)
+        if match is None:
+            customers.append(Code(payload, points, _center(points), None, None))
+        else:
+            products.append(Code(payload, points, _center(points), match[0], match[1]))
+    return products, customers
+
+
+def pair_codes(products, customers):
+    """
+    Pairs each product code with the nearest customer code.
+
+    Pairs are assigned greedily, closest first, so with several pallets in
+    view each label goes with the label next to it and no code is used twice.
+
+    Returns:
+        tuple: (pairs, unpaired_products, unpaired_customers), where pairs is
+               a list of (product, customer) Code tuples ordered left to right.
+    """
+    distances = sorted(
+        ((p.center[0] - c.center[0]) ** 2 + (p.center[1] - c.center[1]) ** 2, i, j)
+        for i, p in enumerate(products) for j, c in enumerate(customers)
+    )
+    used_products, used_customers = set(), set()
+    pairs = []
+    for _, i, j in distances:
+        if i in used_products or j in used_customers:
+            continue
+        used_products.add(i)
+        used_customers.add(j)
+        pairs.append((products[i], customers[j]))
+
+    pairs.sort(key=lambda pair: (pair[0].center[0], pair[0].center[1]))
+    unpaired_products = [p for i, p in enumerate(products) if i not in used_products]
+    unpaired_customers = [c for j, c in enumerate(customers) if j not in used_customers]
+    return pairs, unpaired_products, unpaired_customers
+
+
+def compare_pairs(pairs, start_a, end_a, start_b, end_b, csv_file_path=cmp.CSV_FILE_PATH, master_data=None):
+    """Runs checkDf.compare_ids on every (product, customer) pair. Returns a list of PairResult."""
+    return [PairResult(product, customer,
+                       cmp.compare_ids(product.product_id, customer.payload, start_a, end_a, start_b, end_b,
+                                       csv_file_path=csv_file_path, master_data=master_data))
+            for product, customer in pairs]
+
+
+def scan_frame(decoded, product_index, start_a, end_a, start_b, end_b, csv_file_path=cmp.CSV_FILE_PATH):
+    """
+    Classifies, pairs and compares all codes decoded from one frame.
+
+    Returns:
+        tuple: (results, unpaired_products, unpaired_customers)
+    """
+    products, customers = classify_codes(decoded, product_index)
+    pairs, unpaired_products, unpaired_customers = pair_codes(products, customers)
+    results = compare_pairs(pairs, start_a, end_a, start_b, end_b, csv_file_path=csv_file_path)
+    return results, unpaired_products, unpaired_customers
+
+
+def pair_quantities(pair_result):
+    """(QR1 quantity, QR2 quantity) of a PairResult."""
+    return extract_quantity(pair_result.product.payload), extract_quantity(pair_result.customer.payload)
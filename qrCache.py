@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.qr_cache')
+
+
+def cache_key(payload, settings, fill_color="black", back_color="white"):
+    """
+    Content address of a generated QR image: a SHA-256 over the payload and
+    every parameter that changes the rendered PNG.
+    """
+    material = json.dumps({
+        'payload': payload,
+        'version': settings.get('version'),
+        'error_correction': settings.get('error_correction'),
+        'box_size': settings.get('box_size'),
+        'border': settings.get('border'),
+        'fill_color': fill_color,
+        'back_color': back_color,
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class QrImageCache:
+    """
+    Two-tier cache of rendered QR PNGs keyed by cache_key().
+
+    - Memory tier: the memory_items most recently used PNGs.
+    - Disk tier: one file per key under cache_dir/<first two hex chars>/,
+      kept below max_bytes by evicting the least recently used files. File
+      mtimes record recency, so the LRU order survives restarts.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=512 * 1024 * 1024, memory_items=1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()
+        self._disk = OrderedDict()  # key -> size, least recently used first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._load_disk_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def _load_disk_index(self):
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.png'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def get(self, key):
+        """Returns the cached PNG bytes for key, or None."""
+        with self._lock:
+            png_bytes = self._memory.get(key)
+            if png_bytes is not None:
+                self._memory.move_to_end(key)
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self.hits += 1
+                return png_bytes
+
+            if key not in self._disk:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    png_bytes = f.read()
+                os.utime(path)
+            except OSError:
+                self._disk_bytes -= self._disk.pop(key)
+                self.misses += 1
+                return None
+            self._disk.move_to_end(key)
+            self._remember(key, png_bytes)
+            self.hits += 1
+            return png_bytes
+
+    def put(self, key, png_bytes):
+        """Stores png_bytes under key in both tiers."""
+        with self._lock:
+            self._remember(key, png_bytes)
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(png_bytes)
+            os.replace(temp_path, path)
+
+            self._disk_bytes += len(png_bytes) - self._disk.pop(key, 0)
+            self._disk[key] = len(png_bytes)
+            self._evict()
+
+    def get_or_create(self, key, render):
+        """Returns the cached PNG for key, calling render() to create and store it on a miss."""
+        png_bytes = self.get(key)
+        if png_bytes is None:
+            png_bytes = render()
+            self.put(key, png_bytes)
+        return png_bytes
+
+    def _remember(self, key, png_bytes):
+        self._memory[key] = png_bytes
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        while self._disk_bytes > self.max_bytes and len(self._disk) > 1:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._memory.pop(key, None)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'disk_files': len(self._disk),
+                'disk_bytes': self._disk_bytes, 'memory_items': len(self._memory)}
+
+
+def write_if_changed(path, png_bytes):
+    """Writes png_bytes to path unless the file already holds exactly those bytes. Returns True if written."""
+    try:
+        if os.path.getsize(path) == len(png_bytes):
+            with open(path, 'rb') as f:
+                if f.read() == png_bytes:
+                    return False
+    except OSError:
+        pass
+    with open(path, 'wb') as f:
+        f.write(png_bytes)
+    return True
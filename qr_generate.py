@@ -1,10 +1,38 @@
 import qrcode
+import argparse
+import csv
+import io
+import json
+import logging
 import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from qrCache import DEFAULT_CACHE_DIR, QrImageCache, cache_key, write_if_changed
 
-def create_qr_code_from_file(file_path):
+logger = logging.getLogger(__name__)
+
+# QR settings shared by every generator in this repo (labels, synthetic test frames)
+QR_SETTINGS = {
+    'version': None,
+    'error_correction': qrcode.constants.ERROR_CORRECT_H,
+    'box_size': 10,
+    'border': 4,
+}
+
+def make_qr_image(qr_data, fill_color="black", back_color="white", **settings):
+    """Builds a QR code image for qr_data using QR_SETTINGS, overridden by any keyword settings."""
+    qr = qrcode.QRCode(**dict(QR_SETTINGS, **settings))
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    return qr.make_image(fill_color=fill_color, back_color=back_color)
+
+def create_qr_code_from_file(file_path, cache=None):
     # ... (previous code for create_qr_code_from_file function) ...
+    # If a QrImageCache is given, unchanged payloads are served from it instead of re-encoded,
+    # and the PNG is only rewritten when its content actually changed.
     if not os.path.exists(file_path):
-        print(f"Error: File not found at '{file_path}'")
+        logger.error("File not found at '%s'", file_path)
         return
 
     try:
@@ -12,50 +40,276 @@ def create_qr_code_from_file(file_path):
             file_content = f.read()
 
         if not file_content.strip():
-            print(f"Warning: File '{file_path}' is empty or contains only whitespace. QR code will be empty.")
+            logger.warning("File '%s' is empty or contains only whitespace. QR code will be empty.", file_path)
             qr_data = ""
         else:
             qr_data = file_content
 
-        qr = qrcode.QRCode(
-            version=None,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=4,
-        )
-
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
+        png_bytes = render_qr_png(qr_data, cache=cache)
 
         file_name_without_ext = os.path.splitext(os.path.basename(file_path))[0]
         output_qr_filename = f"{file_name_without_ext}_qrcode.png"
 
         output_qr_path = os.path.join(os.path.dirname(os.path.abspath(file_path)), output_qr_filename)
 
-        img.save(output_qr_path)
-        print(f"QR Code successfully generated and saved to: {output_qr_path}")
+        if write_if_changed(output_qr_path, png_bytes):
+            print(f"QR Code successfully generated and saved to: {output_qr_path}")
+        else:
+            print(f"QR Code unchanged, kept existing file: {output_qr_path}")
 
     except Exception as e:
-        print(f"An error occurred: {e}")
+        logger.error("An error occurred: %s", e)
+
+# --- Bulk label generation ---
+
+# (error correction, ((segment mode, segment length), ...)) -> smallest QR version that fits.
+# The segments qrcode splits a payload into fix its bit length exactly, so the cached version is
+# the one best_fit() would pick for this payload alone, whatever was rendered before it.
+_version_cache = {}
+
+def _build_qr_png(qr_data, settings):
+    """Encodes qr_data with the given QR settings and returns the PNG bytes."""
+    qr = qrcode.QRCode(**settings)
+    qr.add_data(qr_data)
+    version = settings.get('version')
+    if not version:
+        key = (settings['error_correction'], tuple((segment.mode, len(segment)) for segment in qr.data_list))
+        version = _version_cache.get(key)
+        if version is None:
+            version = _version_cache[key] = qr.best_fit()
+    qr.version = version
+    qr.make(fit=False)
+
+    buffer = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer)
+    return buffer.getvalue()
+
+def render_qr_png(qr_data, settings=None, cache=None):
+    """Returns the PNG bytes for qr_data, served from `cache` (a QrImageCache) when possible."""
+    settings = dict(QR_SETTINGS, **(settings or {}))
+    if cache is None:
+        return _build_qr_png(qr_data, settings)
+    return cache.get_or_create(cache_key(qr_data, settings), lambda: _build_qr_png(qr_data, settings))
+
+def _render_labels(payloads, settings):
+    """Worker entry point: renders a list of payloads to a list of PNG bytes."""
+    return [_build_qr_png(payload, settings) for payload in payloads]
+
+def read_payload_rows(source_path, columns=('ProductID',)):
+    """
+    Yields (name, payload) for every non-empty value of the given columns in a
+    CSV or JSONL file. Column names are matched case-insensitively, the same
+    way the scanner reads userr.csv. Names look like '<row>_<column>'.
+    """
+    wanted = [column.strip().lower() for column in columns]
+    if source_path.lower().endswith(('.jsonl', '.ndjson')):
+        with open(source_path, 'r', encoding='utf-8') as f:
+            rows = (json.loads(line) for line in f if line.strip())
+            yield from _payloads_from_rows(rows, wanted)
+    else:
+        with open(source_path, 'r', encoding='utf-8-sig', newline='') as f:
+            yield from _payloads_from_rows(csv.DictReader(f), wanted)
+
+def _payloads_from_rows(rows, wanted):
+    for number, row in enumerate(rows):
+        row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+        for column in wanted:
+            value = row.get(column)
+            if value is not None and str(value).strip():
+                yield f"{number:07d}_{column}", str(value).strip()
+
+class LabelWriter:
+    """
+    Writes generated labels to one of:
+    - 'dir': PNG files in numbered shard subdirectories of shard_size files each
+    - 'zip': PNG files inside a single ZIP archive
+    - 'pdf': printable sheets with cols x rows labels per page and the payload under each code.
+      Every shard_size labels go to their own file ('labels.00000.pdf', 'labels.00001.pdf', ...),
+      written as soon as it is full, so pages do not pile up in memory on large runs. A run
+      that fits in one file is written to the output name itself.
+    """
+
+    def __init__(self, output, output_format='dir', shard_size=1000, cols=4, rows=6, cell_px=300):
+        self.output = output
+        self.output_format = output_format
+        self.shard_size = shard_size
+        self.count = 0
+        self.unchanged = 0
+        if output_format == 'dir':
+            os.makedirs(output, exist_ok=True)
+        elif output_format == 'zip':
+            self._zip = zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED)
+        elif output_format == 'pdf':
+            self._pages = []
+            self._page = None
+            self._pdf_files = []
+            self._cols, self._rows, self._cell = cols, rows, cell_px
+        else:
+            raise ValueError(f"Unknown output format: {output_format}")
+
+    def write(self, name, payload, png_bytes):
+        if self.output_format == 'dir':
+            shard_dir = os.path.join(self.output, f"{self.count // self.shard_size:05d}")
+            if self.count % self.shard_size == 0:
+                os.makedirs(shard_dir, exist_ok=True)
+            if not write_if_changed(os.path.join(shard_dir, f"{name}.png"), png_bytes):
+                self.unchanged += 1
+        elif self.output_format == 'zip':
+            self._zip.writestr(f"{self.count // self.shard_size:05d}/{name}.png", png_bytes)
+        else:
+            self._add_to_sheet(payload, png_bytes)
+        self.count += 1
+
+    def _add_to_sheet(self, payload, png_bytes):
+        from PIL import Image, ImageDraw
+
+        if self.count % self.shard_size == 0 and self._pages:
+            self._write_pdf()
+        # Each file starts on a new page
+        per_page = self._cols * self._rows
+        slot = self.count % self.shard_size % per_page
+        if slot == 0:
+            self._page = Image.new('L', (self._cols * self._cell, self._rows * self._cell), 255)
+            self._pages.append(self._page)
+        code_px = self._cell - 30
+        code = Image.open(io.BytesIO(png_bytes)).convert('L').resize((code_px, code_px))
+        x = (slot % self._cols) * self._cell + 15
+        y = (slot // self._cols) * self._cell + 5
+        self._page.paste(code, (x, y))
+        ImageDraw.Draw(self._page).text((x, y + code_px), payload[:40], fill=0)
+
+    def _write_pdf(self):
+        base, ext = os.path.splitext(self.output)
+        path = f"{base}.{len(self._pdf_files):05d}{ext}"
+        self._pages[0].save(path, save_all=True, append_images=self._pages[1:], resolution=150)
+        self._pdf_files.append(path)
+        self._pages = []
+        self._page = None
+
+    def close(self):
+        if self.output_format == 'zip':
+            self._zip.close()
+        elif self.output_format == 'pdf':
+            if self._pages:
+                self._write_pdf()
+            if len(self._pdf_files) == 1:
+                os.replace(self._pdf_files[0], self.output)
+
+def generate_bulk(source_path, output, columns=('ProductID',), output_format='dir',
+                  workers=None, batch_size=256, shard_size=1000, settings=None, cache=None):
+    """
+    Generates one QR label per value of `columns` in source_path across a process pool.
+
+    With a QrImageCache, payloads already in the cache are not sent to the
+    pool at all, and only new renders are stored back. Labels are always
+    written in source order.
+
+    Returns:
+        dict: {'codes': labels written, 'rendered': codes actually encoded,
+               'unchanged': existing PNGs left untouched, 'seconds': elapsed,
+               'codes_per_second': throughput}
+    """
+    settings = dict(QR_SETTINGS, **(settings or {}))
+    writer = LabelWriter(output, output_format, shard_size=shard_size)
+    max_in_flight = 4 * (workers or os.cpu_count() or 1)
+    start = time.perf_counter()
+    last_report = start
+
+    def batches():
+        batch = []
+        for item in read_payload_rows(source_path, columns):
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    rendered = 0
+
+    def flush(entry):
+        nonlocal rendered
+        batch, keys, cached, future = entry
+        fresh = iter(future.result()) if future is not None else iter(())
+        for (name, payload), key, png_bytes in zip(batch, keys, cached):
+            if png_bytes is None:
+                png_bytes = next(fresh)
+                rendered += 1
+                if cache is not None:
+                    cache.put(key, png_bytes)
+            writer.write(name, payload, png_bytes)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = []
+            for batch in batches():
+                keys = [cache_key(payload, settings) for _, payload in batch] if cache is not None else [None] * len(batch)
+                cached = [cache.get(key) for key in keys] if cache is not None else [None] * len(batch)
+                misses = [payload for (_, payload), png_bytes in zip(batch, cached) if png_bytes is None]
+                future = executor.submit(_render_labels, misses, settings) if misses else None
+                pending.append((batch, keys, cached, future))
+                # Keep a bounded number of batches in flight so large runs do not pile up in memory
+                if len(pending) >= max_in_flight:
+                    flush(pending.pop(0))
+                now = time.perf_counter()
+                if now - last_report >= 5:
+                    print(f"Generated {writer.count} codes ({writer.count / (now - start):.0f} codes/s)")
+                    last_report = now
+            for entry in pending:
+                flush(entry)
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - start
+    return {'codes': writer.count, 'rendered': rendered, 'unchanged': writer.unchanged, 'seconds': seconds,
+            'codes_per_second': writer.count / seconds if seconds else 0.0}
 
 if __name__ == "__main__":
-    # --- Example Usage ---
-    # 1. Create a dummy text file for testing
+    parser = argparse.ArgumentParser(description="Generate QR code PNGs")
+    parser.add_argument("--bulk", metavar="SOURCE",
+                        help="CSV or JSONL file to generate labels from (e.g. userr.csv)")
+    parser.add_argument("--columns", nargs='+', default=['ProductID'],
+                        help="columns to encode, one code per value (default: ProductID)")
+    parser.add_argument("--output", default="qr_labels",
+                        help="output directory, .zip or .pdf file (default: qr_labels)")
+    parser.add_argument("--format", choices=['dir', 'zip', 'pdf'], default=None,
+                        help="output format (default: from the output extension)")
+    parser.add_argument("--workers", type=int, default=None, help="generator processes (default: CPU count)")
+    parser.add_argument("--shard-size", type=int, default=1000, help="PNG files per output subdirectory, or labels per PDF file")
+    parser.add_argument("--cache-dir", default=None,
+                        help="content-addressed PNG cache directory (default: .qr_cache next to this script)")
+    parser.add_argument("--cache-max-mb", type=int, default=512, help="size limit of the on-disk cache")
+    parser.add_argument("--no-cache", action="store_true", help="always re-encode every payload")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    cache = None
+    if not args.no_cache:
+        cache = QrImageCache(args.cache_dir or DEFAULT_CACHE_DIR, max_bytes=args.cache_max_mb * 1024 * 1024)
+
+    if args.bulk:
+        output_format = args.format or os.path.splitext(args.output)[1].lstrip('.').lower() or 'dir'
+        stats = generate_bulk(args.bulk, args.output, columns=args.columns, output_format=output_format,
+                              workers=args.workers, shard_size=args.shard_size, cache=cache)
+        print(f"\nGenerated {stats['codes']} codes in {stats['seconds']:.1f}s "
+              f"({stats['codes_per_second']:.0f} codes/s) into '{args.output}': "
+              f"{stats['rendered']} encoded, {stats['unchanged']} files unchanged")
+    else:
+        # --- Example Usage ---
+        # 1. Create a dummy text file for testing
 
-    # No 'with open' block here if you don't want to create the file
-    # If dummyFile1.txt doesn't exist, create_qr_code_from_file will report an error.
+        # No 'with open' block here if you don't want to create the file
+        # If dummyFile1.txt doesn't exist, create_qr_code_from_file will report an error.
 
-    # Now, let's create a QR code from its content
+        # Now, let's create a QR code from its content
 
-    for num in range(1,3):
-        dummy_file_name = f"dummy_file_{num}.txt"
-        print(f"\n--- Generating QR Code from 'dummyFile{num}.txt' ---")
-        create_qr_code_from_file(dummy_file_name)
+        for num in range(1,3):
+            dummy_file_name = f"dummy_file_{num}.txt"
+            print(f"\n--- Generating QR Code from 'dummyFile{num}.txt' ---")
+            create_qr_code_from_file(dummy_file_name, cache=cache)
 
 
-    # with open(f'dummy_file_2.txt', 'w') as file:
-    #     file.write(f'HHID3004ID0018')
+        # with open(f'dummy_file_2.txt', 'w') as file:
+        #     file.write(f'HHID3004ID0018')
 
-    print("\nGeneration process complete.")
\ No newline at end of file
+        print("\nGeneration process complete.")
\ No newline at end of file
@@ -0,0 +1,733 @@
+import ctypes
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from pyzbar.pyzbar import decode
+from PIL import Image
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# --- Decoding ---
+
+def decode_frame(frame):
+    """
+    Decodes every QR/barcode in a BGR frame.
+
+    This is a plain module-level function so it can also be sent to a
+    process pool.
+
+    Returns:
+        list: One (data, points) tuple per code, where data is the stripped
+              UTF-8 payload and points is the list of (x, y) polygon corners.
+    """
+    start = time.perf_counter()
+    frame = cv2.convertScaleAbs(frame, alpha=1.2, beta=20)
+    pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    decode_start = time.perf_counter()
+    decoded = [(obj.data.decode('utf-8').strip(), [(p.x, p.y) for p in obj.polygon])
+               for obj in decode(pil_img)]
+    METRICS.observe('preprocess', decode_start - start)
+    METRICS.observe('decode', time.perf_counter() - decode_start)
+    return decoded
+
+
+class GrayDecoder:
+    """
+    Grayscale decode path that skips the RGB copy and the PIL wrapper.
+
+    Each frame is converted once into a preallocated single-channel buffer,
+    brightened in place, and handed to zbar through a ctypes view of the
+    same memory, so no per-frame image copies are made after the first frame.
+    The buffer is sized for the largest frame seen; smaller images (the
+    AdaptiveDecoder's ROI crops) use a view of its start, so switching
+    between crops and full frames does not allocate.
+    """
+
+    def __init__(self, alpha=1.2, beta=20):
+        self.alpha = alpha
+        self.beta = beta
+        self._buffer = None
+
+    def __call__(self, frame):
+        start = time.perf_counter()
+        height, width = frame.shape[:2]
+        size = height * width
+        if self._buffer is None or self._buffer.size < size:
+            self._buffer = np.empty(size, np.uint8)
+        gray = self._buffer[:size].reshape(height, width)
+        pixels = (ctypes.c_ubyte * size).from_buffer(self._buffer)
+
+        if frame.ndim == 2:
+            np.copyto(gray, frame)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        cv2.convertScaleAbs(gray, dst=gray, alpha=self.alpha, beta=self.beta)
+
+        decode_start = time.perf_counter()
+        decoded = [(obj.data.decode('utf-8').strip(), [(p.x, p.y) for p in obj.polygon])
+                   for obj in decode((pixels, width, height))]
+        METRICS.observe('preprocess', decode_start - start)
+        METRICS.observe('decode', time.perf_counter() - decode_start)
+        return decoded
+
+
+_thread_state = threading.local()
+
+
+def decode_frame_gray(frame):
+    """
+    Module-level wrapper around GrayDecoder, so the grayscale path can be
+    sent to a process pool. Each thread/process keeps its own buffers.
+    """
+    decoder = getattr(_thread_state, 'gray_decoder', None)
+    if decoder is None:
+        decoder = _thread_state.gray_decoder = GrayDecoder()
+    return decoder(frame)
+
+
+def _decode_gray(gray):
+    """Decodes a single-channel uint8 image; returns (data, points) tuples like decode_frame."""
+    gray = np.ascontiguousarray(gray)
+    height, width = gray.shape
+    return [(obj.data.decode('utf-8').strip(), [(p.x, p.y) for p in obj.polygon])
+            for obj in decode((gray.tobytes(), width, height))]
+
+
+# Cascade stages, cheapest first
+CASCADE_STAGES = ('gray', 'clahe', 'threshold', 'upscale', 'sharpen')
+
+
+class CascadeDecoder:
+    """
+    Decode path for small, glare-washed or slightly blurred labels.
+
+    Stages are tried cheapest first and the cascade stops at the first one
+    that decodes anything:
+
+    - 'gray': the brightened grayscale frame (the same single pass as GrayDecoder).
+      It keeps the scanner's usual alpha/beta brightening rather than decoding
+      the raw grayscale, so the first stage reads exactly what 'gray' does.
+    - 'clahe': local contrast equalisation, which recovers codes under glare
+    - 'threshold': adaptive threshold, for uneven lighting across the label
+    - 'upscale': 2x upscale of candidate code regions, for codes too small to read
+    - 'sharpen': unsharp mask on the upscaled regions, for slight blur
+
+    The escalation stages only run when the frame has code-like regions
+    (dense edges in both directions), so an empty scene costs one decode
+    plus a cheap edge check; `escalated` counts the frames on which an
+    escalation stage actually ran. Each stage records attempts, hits and time;
+    once a stage has had drop_after attempts with a hit rate below
+    min_hit_rate it is skipped, and dropped stages are given another chance
+    every retry_every frames in case conditions change.
+
+    last_call describes the latest frame as (escalated, [(stage, hit, seconds)
+    per stage run], dropped stages), so a pool worker's calls can be counted
+    by a CascadeDecoder in the parent with replay().
+    """
+
+    def __init__(self, stages=CASCADE_STAGES, alpha=1.2, beta=20, scale=2, drop_after=300,
+                 min_hit_rate=0.01, retry_every=3000, max_regions=4, min_region=24):
+        unknown = set(stages) - set(CASCADE_STAGES)
+        if unknown:
+            raise ValueError(f"Unknown cascade stages: {', '.join(sorted(unknown))}")
+        self.stages = list(stages)
+        self.alpha = alpha
+        self.beta = beta
+        self.scale = scale
+        self.drop_after = drop_after
+        self.min_hit_rate = min_hit_rate
+        self.retry_every = retry_every
+        self.max_regions = max_regions
+        self.min_region = min_region
+
+        self._clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+        self._stats = {stage: {'attempts': 0, 'hits': 0, 'seconds': 0.0} for stage in self.stages}
+        self.dropped = set()
+        self.frames = 0
+        self.hits = 0
+        self.escalated = 0
+        self.last_call = None
+
+    def __call__(self, frame):
+        start = time.perf_counter()
+        self.frames += 1
+        if self.dropped and self.frames % self.retry_every == 0:
+            logger.info("Retrying dropped cascade stages: %s", ", ".join(sorted(self.dropped)))
+            for stage in self.dropped:
+                self._stats[stage].update(attempts=0, hits=0)
+            self.dropped.clear()
+
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        context = {'gray': gray}
+        decoded = []
+        escalated = False
+        attempts = []
+        for stage in self.stages:
+            if stage in self.dropped:
+                continue
+            if stage != 'gray':
+                if not self._regions(context):
+                    break
+                escalated = True
+            stage_start = time.perf_counter()
+            decoded = getattr(self, f"_stage_{stage}")(context)
+            attempts.append((stage, bool(decoded), time.perf_counter() - stage_start))
+            self._record(*attempts[-1])
+            if decoded:
+                self.hits += 1
+                break
+        if escalated:
+            self.escalated += 1
+        self.last_call = (escalated, attempts, sorted(self.dropped))
+
+        METRICS.observe('decode', time.perf_counter() - start)
+        return decoded
+
+    def replay(self, call):
+        """Counts a frame decoded by another CascadeDecoder (e.g. in a pool worker) from its last_call."""
+        escalated, attempts, dropped = call
+        self.frames += 1
+        for stage, hit, seconds in attempts:
+            stats = self._stats[stage]
+            stats['attempts'] += 1
+            stats['seconds'] += seconds
+            stats['hits'] += hit
+        if any(hit for _, hit, _ in attempts):
+            self.hits += 1
+        if escalated:
+            self.escalated += 1
+        self.dropped = set(dropped)
+
+    def add(self, other):
+        """Adds the counters of another CascadeDecoder to this one."""
+        self.frames += other.frames
+        self.hits += other.hits
+        self.escalated += other.escalated
+        for stage, stats in other._stats.items():
+            for key, value in stats.items():
+                self._stats[stage][key] += value
+        self.dropped |= other.dropped
+
+    def _record(self, stage, hit, seconds):
+        stats = self._stats[stage]
+        stats['attempts'] += 1
+        stats['seconds'] += seconds
+        if hit:
+            stats['hits'] += 1
+        elif (stage != 'gray' and stats['attempts'] >= self.drop_after
+              and stats['hits'] < self.min_hit_rate * stats['attempts']):
+            self.dropped.add(stage)
+            logger.info("Dropping cascade stage '%s': %d hits in %d attempts",
+                        stage, stats['hits'], stats['attempts'])
+
+    # --- Stages ---
+
+    def _stage_gray(self, context):
+        return _decode_gray(cv2.convertScaleAbs(context['gray'], alpha=self.alpha, beta=self.beta))
+
+    def _stage_clahe(self, context):
+        return _decode_gray(self._equalized(context))
+
+    def _stage_threshold(self, context):
+        binary = cv2.adaptiveThreshold(context['gray'], 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                       cv2.THRESH_BINARY, 31, 5)
+        return _decode_gray(binary)
+
+    def _stage_upscale(self, context):
+        return self._decode_regions(context, sharpen=False)
+
+    def _stage_sharpen(self, context):
+        return self._decode_regions(context, sharpen=True)
+
+    def _equalized(self, context):
+        if 'equalized' not in context:
+            context['equalized'] = self._clahe.apply(context['gray'])
+        return context['equalized']
+
+    def _regions(self, context):
+        """
+        Bounding boxes (x0, y0, x1, y1) of up to max_regions code-like areas,
+        found on a half-size edge map; computed once per frame.
+        """
+        if 'regions' in context:
+            return context['regions']
+        gray = context['gray']
+        small = cv2.resize(gray, (gray.shape[1] // 2, gray.shape[0] // 2), interpolation=cv2.INTER_AREA)
+        gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8))
+        _, edges = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        height, width = gray.shape
+        regions = []
+        for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:self.max_regions]:
+            x, y, w, h = cv2.boundingRect(contour)
+            # QR codes are roughly square and mostly filled with edges
+            if min(w, h) * 2 < self.min_region or max(w, h) > 3 * min(w, h):
+                continue
+            if cv2.contourArea(contour) < 0.5 * w * h:
+                continue
+            pad = max(w, h) // 4 + 4
+            regions.append((max(0, 2 * (x - pad)), max(0, 2 * (y - pad)),
+                            min(width, 2 * (x + w + pad)), min(height, 2 * (y + h + pad))))
+        context['regions'] = regions
+        return regions
+
+    def _decode_regions(self, context, sharpen):
+        equalized = self._equalized(context)
+        decoded = []
+        for x0, y0, x1, y1 in context['regions']:
+            roi = cv2.resize(equalized[y0:y1, x0:x1], None, fx=self.scale, fy=self.scale,
+                             interpolation=cv2.INTER_CUBIC)
+            if sharpen:
+                blurred = cv2.GaussianBlur(roi, (0, 0), 2.0)
+                roi = cv2.addWeighted(roi, 1.8, blurred, -0.8, 0)
+            decoded += [(data, [(x0 + x // self.scale, y0 + y // self.scale) for x, y in points])
+                        for data, points in _decode_gray(roi)]
+        return decoded
+
+    def stats(self):
+        """Returns the frame counters and per-stage attempts, hits, hit rate and ms per attempt."""
+        stages = {}
+        for stage, stats in self._stats.items():
+            attempts = stats['attempts']
+            stages[stage] = {
+                'attempts': attempts,
+                'hits': stats['hits'],
+                'hit_rate': stats['hits'] / attempts if attempts else 0.0,
+                'ms_per_attempt': stats['seconds'] * 1000 / attempts if attempts else 0.0,
+                'dropped': stage in self.dropped,
+            }
+        return {'frames': self.frames, 'hits': self.hits, 'escalated': self.escalated, 'stages': stages}
+
+
+# Every CascadeDecoder created by decode_frame_cascade in this process, for cascade_stats()
+_cascade_decoders = []
+_cascade_lock = threading.Lock()
+
+
+def decode_frame_cascade(frame):
+    """
+    Module-level wrapper around CascadeDecoder, so the cascade can be sent
+    to a process pool. Each thread/process keeps its own stage statistics.
+    """
+    decoder = getattr(_thread_state, 'cascade_decoder', None)
+    if decoder is None:
+        decoder = _thread_state.cascade_decoder = CascadeDecoder()
+        with _cascade_lock:
+            _cascade_decoders.append(decoder)
+    return decoder(frame)
+
+
+def cascade_stats():
+    """CascadeDecoder.stats() summed over the threads that used decode_frame_cascade, or None if none did."""
+    with _cascade_lock:
+        decoders = list(_cascade_decoders)
+    if not decoders:
+        return None
+    total = CascadeDecoder()
+    for decoder in decoders:
+        total.add(decoder)
+    return total.stats()
+
+
+def _decode_recorded(decoder, frame):
+    """
+    Runs decoder in a pool worker and returns (decoded, samples, cascade_call):
+    the worker's preprocess/decode timings go back to the parent's METRICS,
+    and for the cascade path its CascadeDecoder.last_call is sent along too.
+    """
+    with METRICS.recording() as samples:
+        decoded = decoder(frame)
+    cascade_call = _thread_state.cascade_decoder.last_call if decoder is decode_frame_cascade else None
+    return decoded, samples, cascade_call
+
+
+# Selectable decode paths: 'pil' is the original brighten -> RGB -> PIL path
+DECODE_PATHS = {
+    'pil': decode_frame,
+    'gray': decode_frame_gray,
+    'cascade': decode_frame_cascade,
+}
+
+
+def benchmark_decode_paths(frames, repeat=3, paths=DECODE_PATHS):
+    """
+    Times each decode path over the same frames.
+
+    Returns:
+        dict: path name -> {'ms_per_frame', 'cpu_ms_per_frame', 'codes'}
+    """
+    results = {}
+    for name, decoder in paths.items():
+        decoder(frames[0])  # warm-up, allocates buffers
+        codes = 0
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        for _ in range(repeat):
+            for frame in frames:
+                codes += len(decoder(frame))
+        count = repeat * len(frames)
+        results[name] = {
+            'ms_per_frame': (time.perf_counter() - wall_start) * 1000 / count,
+            'cpu_ms_per_frame': (time.process_time() - cpu_start) * 1000 / count,
+            'codes': codes // repeat,
+        }
+    return results
+
+
+# --- ROI tracking / frame skipping ---
+
+class AdaptiveDecoder:
+    """
+    Wraps a decode function so that it does less work on unchanging scenes.
+
+    - If a cheap motion metric (mean absolute difference of a small grayscale
+      thumbnail against the last decoded frame) is below motion_threshold,
+      decoding is skipped and the previous result is reused.
+    - Once a code has been found, the following frames only decode a padded
+      crop around its polygon.
+    - A full-frame decode runs when the crop misses, when nothing is being
+      tracked, and at least every full_scan_every frames, so new codes
+      elsewhere in the frame are still picked up.
+
+    stats() returns hit-rate and CPU-per-frame counters for tuning. CPU is
+    the calling thread's (time.thread_time), so the wrapped decoder must run
+    on that thread rather than in another process.
+    """
+
+    def __init__(self, decoder=decode_frame, full_scan_every=15, roi_padding=0.5,
+                 motion_threshold=2.0, motion_size=(64, 48)):
+        self.decoder = decoder
+        self.full_scan_every = full_scan_every
+        self.roi_padding = roi_padding
+        self.motion_threshold = motion_threshold
+        self.motion_size = motion_size
+
+        self._roi = None            # (x0, y0, x1, y1) around the last codes found
+        self._reference = None      # motion thumbnail of the last decoded frame
+        self._last_result = []
+        self._since_full_scan = 0
+
+        self.frames = 0
+        self.skipped = 0
+        self.roi_attempts = 0
+        self.roi_hits = 0
+        self.full_scans = 0
+        self.full_hits = 0
+        self.cpu_seconds = 0.0
+
+    def __call__(self, frame):
+        cpu_start = time.thread_time()
+        try:
+            return self._decode(frame)
+        finally:
+            self.cpu_seconds += time.thread_time() - cpu_start
+
+    def _decode(self, frame):
+        self.frames += 1
+        self._since_full_scan += 1
+
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        thumbnail = cv2.resize(gray, self.motion_size, interpolation=cv2.INTER_AREA)
+        if (self._reference is not None and self._since_full_scan < self.full_scan_every
+                and cv2.absdiff(thumbnail, self._reference).mean() < self.motion_threshold):
+            self.skipped += 1
+            return self._last_result
+        self._reference = thumbnail
+
+        if self._roi is not None and self._since_full_scan < self.full_scan_every:
+            self.roi_attempts += 1
+            x0, y0, x1, y1 = self._roi
+            decoded = [(data, [(x + x0, y + y0) for x, y in points])
+                       for data, points in self.decoder(frame[y0:y1, x0:x1])]
+            if decoded:
+                self.roi_hits += 1
+                return self._remember(decoded, frame)
+
+        self.full_scans += 1
+        self._since_full_scan = 0
+        decoded = self.decoder(frame)
+        if decoded:
+            self.full_hits += 1
+        return self._remember(decoded, frame)
+
+    def _remember(self, decoded, frame):
+        self._last_result = decoded
+        points = [point for _, polygon in decoded for point in polygon]
+        if not points:
+            self._roi = None
+            return decoded
+
+        height, width = frame.shape[:2]
+        xs = [x for x, _ in points]
+        ys = [y for _, y in points]
+        pad_x = int((max(xs) - min(xs)) * self.roi_padding) + 16
+        pad_y = int((max(ys) - min(ys)) * self.roi_padding) + 16
+        self._roi = (max(0, min(xs) - pad_x), max(0, min(ys) - pad_y),
+                     min(width, max(xs) + pad_x), min(height, max(ys) + pad_y))
+        return decoded
+
+    def stats(self):
+        """Returns the decode counters as a dict."""
+        decoded_frames = self.frames - self.skipped
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'roi_attempts': self.roi_attempts,
+            'roi_hits': self.roi_hits,
+            'full_scans': self.full_scans,
+            'full_hits': self.full_hits,
+            'decode_hit_rate': (self.roi_hits + self.full_hits) / decoded_frames if decoded_frames else 0.0,
+            'cpu_ms_per_frame': self.cpu_seconds * 1000 / self.frames if self.frames else 0.0,
+        }
+
+
+# --- Latest-frame-wins queue ---
+
+class LatestQueue:
+    """
+    A queue that only ever holds the newest item.
+
+    put() replaces whatever is waiting, so a slow consumer always gets the
+    most recent frame instead of working through a backlog of stale ones.
+    """
+
+    def __init__(self):
+        self._item = None
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            self._item = item
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Waits for the next item. Returns None if the queue was closed or the wait timed out."""
+        with self._cond:
+            if self._item is None and not self._closed:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+# --- Capture / decode threads ---
+
+class ScanPipeline:
+    """
+    Runs capture and decoding off the UI thread.
+
+    - A capture thread reads frames from `cap` as fast as the camera delivers them.
+    - Decode workers take the newest captured frame from a LatestQueue and
+      publish their result; frames that arrive while a worker is busy are dropped.
+    - The UI thread calls wait_for_frame() and latest_decode() to draw the
+      newest frame with the newest decode result, so preview and keypresses
+      run at camera speed rather than decode speed.
+
+    With process_pool=True, decoding is sent to a ProcessPoolExecutor and one
+    decode worker thread per process keeps it busy.
+
+    With adaptive set to a dict of AdaptiveDecoder options, frames go through
+    an AdaptiveDecoder (ROI tracking and frame skipping). Its state is
+    per-stream, so a single decode worker thread feeds it. That cannot keep
+    a process pool busy, and its CPU figure only covers the decode thread,
+    so adaptive decoding and process_pool cannot be combined.
+    """
+
+    def __init__(self, cap, decoder=decode_frame, process_pool=False, workers=None, adaptive=None):
+        if process_pool and adaptive is not None:
+            raise ValueError("Adaptive decoding runs on a single decode thread and cannot use a process pool")
+        self.cap = cap
+        self.decoder = decoder
+        self.process_pool = process_pool
+        self.workers = workers or ((os.cpu_count() or 1) if process_pool else 1)
+        self.adaptive = None
+        self._adaptive_options = adaptive
+        self._decode = decoder
+        # Pool workers' cascade calls are counted here, since their decoders live in other processes
+        self._pool_cascade = CascadeDecoder() if process_pool and decoder is decode_frame_cascade else None
+        self._pool_cascade_lock = threading.Lock()
+
+        self._decode_queue = LatestQueue()
+        self._frame_cond = threading.Condition()
+        self._frame = None
+        self._frame_seq = 0
+        self._result = []
+        self._result_seq = 0
+        self._result_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._executor = None
+        self._threads = []
+        self.failed = False
+
+    def start(self):
+        if self.process_pool:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._decode = self._decode_in_pool
+            decode_threads = self.workers
+        else:
+            decode_threads = 1
+
+        if self._adaptive_options is not None:
+            self.adaptive = AdaptiveDecoder(self._decode, **self._adaptive_options)
+            self._decode = self.adaptive
+
+        self._threads.append(threading.Thread(target=self._capture_loop, name="capture", daemon=True))
+        for i in range(decode_threads):
+            self._threads.append(threading.Thread(target=self._decode_loop, name=f"decode-{i}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logger.debug("Scan pipeline started with %d decode worker(s)%s",
+                     decode_threads, " in a process pool" if self.process_pool else "")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._decode_queue.close()
+        with self._frame_cond:
+            self._frame_cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._threads = []
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            captured_at = time.perf_counter()
+            if not ret:
+                self.failed = True
+                break
+            METRICS.observe('capture', captured_at - start)
+            with self._frame_cond:
+                self._frame_seq += 1
+                self._frame = frame
+                seq = self._frame_seq
+                self._frame_cond.notify_all()
+            self._decode_queue.put((seq, frame, captured_at))
+
+        self._decode_queue.close()
+        with self._frame_cond:
+            self._frame_cond.notify_all()
+
+    def _decode_loop(self):
+        while not self._stop.is_set():
+            item = self._decode_queue.get(timeout=0.5)
+            if item is None:
+                if self.failed:
+                    break
+                continue
+            seq, frame, captured_at = item
+            try:
+                decoded = self._decode(frame)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.error("Decoding failed: %s", e)
+                continue
+
+            # Capture-to-result latency, including time spent waiting for a decode worker
+            METRICS.observe('latency', time.perf_counter() - captured_at)
+            METRICS.tick('decode')
+
+            with self._result_lock:
+                # Several workers may finish out of order; never replace a newer result
+                if seq > self._result_seq:
+                    self._result_seq = seq
+                    self._result = decoded
+
+    def _decode_in_pool(self, frame):
+        decoded, samples, cascade_call = self._executor.submit(_decode_recorded, self.decoder, frame).result()
+        for stage, seconds in samples:
+            METRICS.observe(stage, seconds)
+        if cascade_call is not None:
+            with self._pool_cascade_lock:
+                self._pool_cascade.replay(cascade_call)
+        return decoded
+
+    def decode_stats(self):
+        """Returns the AdaptiveDecoder counters, or None when adaptive decoding is off."""
+        if self.adaptive is None:
+            return None
+        return self.adaptive.stats()
+
+    def cascade_stats(self):
+        """Returns the CascadeDecoder counters, or None when the cascade decode path is not used."""
+        if self.decoder is not decode_frame_cascade:
+            return None
+        if self._pool_cascade is not None:
+            with self._pool_cascade_lock:
+                return self._pool_cascade.stats()
+        return cascade_stats()
+
+    def wait_for_frame(self, last_seq, timeout=1.0):
+        """
+        Waits for a frame newer than last_seq.
+
+        Returns:
+            tuple: (seq, frame), or None once capture has failed or the pipeline stopped.
+        """
+        with self._frame_cond:
+            while self._frame_seq <= last_seq:
+                if self.failed or self._stop.is_set():
+                    return None
+                self._frame_cond.wait(timeout)
+            return self._frame_seq, self._frame
+
+    def latest_decode(self):
+        """Returns the newest decode result as a list of (data, points) tuples."""
+        with self._result_lock:
+            return self._result
+
+    def latest_decode_seq(self):
+        """Returns (seq, result) for the newest decode result; seq is the frame it was decoded from."""
+        with self._result_lock:
+            return self._result_seq, self._result
+
+
+if __name__ == "__main__":
+    # Compare decode paths on image files, or on frames grabbed from the first camera
+    import sys
+
+    image_paths = sys.argv[1:]
+    if image_paths:
+        frames = [cv2.imread(path) for path in image_paths]
+        frames = [frame for frame in frames if frame is not None]
+    else:
+        cap = cv2.VideoCapture(0)
+        frames = []
+        while cap.isOpened() and len(frames) < 30:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+
+    if not frames:
+        print("Error: No frames to benchmark. Pass image paths or connect a camera.")
+        sys.exit(1)
+
+    for name, stats in benchmark_decode_paths(frames).items():
+        print(f"{name:>7}: {stats['ms_per_frame']:7.2f} ms/frame, "
+              f"{stats['cpu_ms_per_frame']:7.2f} CPU ms/frame, {stats['codes']} codes")
+
+    cascade = getattr(_thread_state, 'cascade_decoder', None)
+    if cascade is not None:
+        for stage, stats in cascade.stats()['stages'].items():
+            print(f"  cascade {stage:<9} {stats['hits']:>5}/{stats['attempts']:<5} hits, "
+                  f"{stats['ms_per_attempt']:6.2f} ms/attempt{' (dropped)' if stats['dropped'] else ''}")
@@ -0,0 +1,559 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fileOperation import checkDf as cmp
+from fileOperation.checkDf import CompareResult, extract_quantity
+from fileOperation.masterData import DEFAULT_CSV_PATH, MasterDataWatcher, get_master_data
+from fileOperation.matchLog import MatchLogWriter, BACKENDS as LOG_BACKENDS
+from fileOperation.scanDb import ScanDatabase
+from fileOperation.scanDedup import ScanDeduplicator, PAIR_LIST_NAME
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+# Requests larger than this (one JSON line) are rejected
+MAX_REQUEST_BYTES = 64 * 1024
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# --- Server ---
+
+class ValidationService:
+    """
+    Scan validation for many terminals over one shared master index.
+
+    Terminals connect over TCP and send one JSON object per line; every
+    request gets one JSON line back, in order, carrying the request's "id".
+    Clients may pipeline: send many requests before reading any responses.
+
+    Requests ("op"):
+    - ping: {} -> {"rows"}
+    - lookup: {"payload"} -> {"found", "product_id", "customer_id", "quantity"}
+    - validate: {"product_id", "qr1", "qr2", "slices": [start_a, end_a, start_b, end_b],
+      "terminal"} -> the checkDf.CompareResult fields plus "duplicate"
+    - stats: {} -> request counters
+
+    validate runs checkDf.compare_ids against the master data the watcher
+    published (or the copy loaded at startup without hot reload), so a CSV
+    change is never parsed on the event loop, and records the scan centrally. Matches go to one MatchLogWriter (batched
+    on its own thread); scan database rows and duplicate-list entries are
+    buffered and written in batches off the event loop, so a slow disk
+    never stalls other terminals. Pairs waiting for the next batch are
+    already counted as duplicates.
+    """
+
+    def __init__(self, csv_file_path=DEFAULT_CSV_PATH, data_dir=DATA_DIR, log_backend='tsv',
+                 dedup_window=300, remember_pairs=False, reload_interval=2.0, flush_interval=0.25,
+                 batch_size=256):
+        self.csv_file_path = csv_file_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self.watcher = None
+        self._master_data = get_master_data(csv_file_path)
+        if reload_interval:
+            self.watcher = MasterDataWatcher(csv_file_path, interval=reload_interval,
+                                             data=self._master_data).start()
+
+        self.match_log = MatchLogWriter(os.path.join(data_dir, "match_log.txt"), backend=log_backend)
+        self.scan_db = ScanDatabase(os.path.join(data_dir, "scans.db"))
+        self.dedup = None
+        if dedup_window is not None:
+            pair_list_path = os.path.join(data_dir, PAIR_LIST_NAME) if remember_pairs else None
+            self.dedup = ScanDeduplicator(dedup_window, pair_list_path)
+
+        self.counts = {'connections': 0, 'requests': 0, 'errors': 0, 'lookup': 0, 'validate': 0,
+                       'match': 0, 'logged': 0, 'duplicate': 0}
+        self._pending_scans = []
+        self._pending_pairs = []
+        self._pending_keys = set()
+        self._flush_wanted = None
+        self._server = None
+        self._flusher = None
+
+    @property
+    def master_data(self):
+        return self.watcher.current if self.watcher is not None else self._master_data
+
+    # --- Request handling ---
+
+    def handle_request(self, request):
+        """Handles one decoded request and returns the response dict."""
+        op = request.get('op')
+        if op == 'lookup':
+            self.counts['lookup'] += 1
+            payload = str(request['payload'])
+            match = self.master_data.find_product(payload)
+            return {'found': match is not None, 'product_id': match[0] if match else None,
+                    'customer_id': match[1] if match else None, 'quantity': extract_quantity(payload)}
+        if op == 'validate':
+            return self._validate(request)
+        if op == 'ping':
+            return {'rows': len(self.master_data.index)}
+        if op == 'stats':
+            return dict(self.counts, pending=len(self._pending_scans))
+        raise ValueError(f"Unknown op: {op!r}")
+
+    def _validate(self, request):
+        self.counts['validate'] += 1
+        qr1, qr2 = str(request['qr1']), str(request['qr2'])
+        start_a, end_a, start_b, end_b = (int(value) for value in request['slices'])
+        result = cmp.compare_ids(request['product_id'], qr2, start_a, end_a, start_b, end_b,
+                                 csv_file_path=self.csv_file_path, master_data=self.master_data)
+        qty1, qty2 = extract_quantity(qr1), extract_quantity(qr2)
+
+        self._pending_scans.append({
+            'product_id': result.product_id, 'customer_id': result.csv_customer_id,
+            'qr1_content': qr1, 'qr2_content': qr2, 'qr1_qty': qty1, 'qr2_qty': qty2,
+            'match': result.match, 'source': f"terminal:{request.get('terminal') or 'unknown'}",
+        })
+
+        duplicate = None
+        if result.match:
+            self.counts['match'] += 1
+            key = ScanDeduplicator.pair_key(qr1, qr2)
+            if key in self._pending_keys:
+                duplicate = 'recent'
+            elif self.dedup is not None:
+                duplicate = self.dedup.check(qr1, qr2)
+            if duplicate:
+                self.counts['duplicate'] += 1
+            else:
+                self.match_log.log(qr1, qr2, qty1, qty2, product_id=result.product_id,
+                                   csv_customer_id=result.csv_customer_id)
+                self.counts['logged'] += 1
+                if self.dedup is not None:
+                    self._pending_keys.add(key)
+                    self._pending_pairs.append((qr1, qr2))
+
+        if len(self._pending_scans) >= self.batch_size and self._flush_wanted is not None:
+            self._flush_wanted.set()
+        return dict(result._asdict(), duplicate=duplicate, qr1_qty=qty1, qr2_qty=qty2)
+
+    # --- Batched writes ---
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wanted.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wanted.clear()
+            await self._flush(loop)
+
+    async def _flush(self, loop):
+        scans, self._pending_scans = self._pending_scans, []
+        pairs, self._pending_pairs = self._pending_pairs, []
+        if not scans and not pairs:
+            return
+        try:
+            await loop.run_in_executor(None, self._write_batch, scans, pairs)
+        except Exception as e:
+            logger.error("Failed to write %d scans: %s", len(scans), e)
+        finally:
+            self._pending_keys.difference_update(ScanDeduplicator.pair_key(*pair) for pair in pairs)
+
+    def _write_batch(self, scans, pairs):
+        if scans:
+            self.scan_db.record_many(scans)
+        if pairs:
+            self.dedup.record_many(pairs)
+
+    # --- Connections ---
+
+    async def _handle_connection(self, reader, writer):
+        self.counts['connections'] += 1
+        peer = writer.get_extra_info('peername')
+        logger.debug("Client connected: %s", peer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(b'{"ok": false, "error": "request too long"}\n')
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                writer.write(self._respond(line))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            logger.debug("Client disconnected: %s", peer)
+            writer.close()
+
+    def _respond(self, line):
+        self.counts['requests'] += 1
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            response = self.handle_request(request)
+            response.update(id=request_id, ok=True)
+        except Exception as e:
+            self.counts['errors'] += 1
+            response = {'id': request_id, 'ok': False, 'error': str(e)}
+        return (json.dumps(response) + "\n").encode('utf-8')
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self._flush_wanted = asyncio.Event()
+        self._flusher = asyncio.create_task(self._flush_loop())
+        self._server = await asyncio.start_server(self._handle_connection, host, port, limit=MAX_REQUEST_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Scan validation service listening on %s:%d (%d CSV rows)",
+                    host, self.port, len(self.master_data.index))
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._flusher is not None:
+            self._flusher.cancel()
+        await self._flush(asyncio.get_running_loop())
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.match_log.close()
+        self.scan_db.close()
+        logger.info("Scan validation service stopped: %s", self.counts)
+
+
+def run_service(host='127.0.0.1', port=DEFAULT_PORT, ready=None, **options):
+    """Runs the service until interrupted. `ready`, if given, is a queue that receives the bound port."""
+    async def main():
+        service = await ValidationService(**options).start(host, port)
+        if ready is not None:
+            ready.put(service.port)
+        try:
+            await service.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+# --- Client ---
+
+class ScanServiceClient:
+    """
+    Blocking client for the validation service, used by codeRead's thin-client mode.
+
+    Calls are serialized behind a lock. validate_many() pipelines its
+    requests: they are all sent before the first response is read.
+    """
+
+    def __init__(self, address, terminal=None, timeout=5.0):
+        host, _, port = address.rpartition(':')
+        self.host = host or '127.0.0.1'
+        self.port = int(port) if port else DEFAULT_PORT
+        self.terminal = terminal or socket.gethostname()
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def connect(self):
+        self.close()
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile('rb')
+        return self
+
+    def close(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+            self._sock = self._file = None
+
+    def call_many(self, requests):
+        """Sends the requests pipelined and returns their responses in order. Reconnects once on failure."""
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self.connect()
+                    return self._exchange(requests)
+                except (OSError, ValueError) as e:
+                    self.close()
+                    if attempt == 2:
+                        raise ConnectionError(f"Scan service {self.host}:{self.port} unavailable: {e}") from e
+                    logger.warning("Scan service connection lost (%s), reconnecting", e)
+
+    def _exchange(self, requests):
+        ids = []
+        lines = []
+        for request in requests:
+            self._next_id += 1
+            ids.append(self._next_id)
+            lines.append(json.dumps(dict(request, id=self._next_id)))
+        self._sock.sendall(("\n".join(lines) + "\n").encode('utf-8'))
+
+        # Every response is read before an error is raised, so none is left behind for the next call.
+        # A response out of step with its request means the stream cannot be trusted: the caller
+        # drops the connection (ValueError).
+        responses = []
+        for request_id in ids:
+            line = self._file.readline()
+            if not line:
+                raise ValueError("connection closed by the service")
+            response = json.loads(line)
+            if response.get('id') != request_id:
+                raise ValueError(f"response id {response.get('id')!r} does not match request id {request_id}")
+            responses.append(response)
+
+        errors = [response.get('error') for response in responses if not response.get('ok')]
+        if errors:
+            raise RuntimeError(f"Scan service error: {'; '.join(map(str, errors))}")
+        return responses
+
+    def call(self, request):
+        return self.call_many([request])[0]
+
+    def ping(self):
+        return self.call({'op': 'ping'})
+
+    def lookup(self, payload):
+        """Returns (product_id, customer_id) for a product payload, or None, like ProductIndex.find."""
+        response = self.call({'op': 'lookup', 'payload': payload})
+        return (response['product_id'], response['customer_id']) if response['found'] else None
+
+    def validate_many(self, items, slices):
+        """
+        Validates (product_id, qr1, qr2) triples on the service.
+
+        Returns:
+            list: (CompareResult, duplicate) per item, where duplicate is
+                  None, 'recent' or 'seen' as in ScanDeduplicator.check.
+        """
+        responses = self.call_many([{'op': 'validate', 'product_id': product_id, 'qr1': qr1, 'qr2': qr2,
+                                     'slices': list(slices), 'terminal': self.terminal}
+                                    for product_id, qr1, qr2 in items])
+        return [(CompareResult(*(response[field] for field in CompareResult._fields)), response['duplicate'])
+                for response in responses]
+
+    def validate(self, product_id, qr1, qr2, slices):
+        return self.validate_many([(product_id, qr1, qr2)], slices)[0]
+
+
+class RemoteProductIndex:
+    """
+    ProductIndex stand-in backed by the service, for thin-client mode.
+    Lookups are cached, since the same labels stay in view for many frames.
+
+    find() never blocks, so it can be called from the render loop (e.g. by
+    multiScan.classify_codes every frame): a payload that is not cached yet
+    is looked up on a background thread and reported as not found until the
+    answer arrives. lookup() waits for the service and raises
+    ConnectionError or RuntimeError if it cannot answer.
+    """
+
+    def __init__(self, client, cache_size=1024):
+        self.client = client
+        self.cache_size = cache_size
+        self.last_error = None
+        self._cache = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._lookups = ThreadPoolExecutor(max_workers=1, thread_name_prefix="remote-lookup")
+
+    def _store(self, payload, match):
+        with self._lock:
+            self._cache[payload] = match
+            self._cache.move_to_end(payload)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cached(self, payload):
+        with self._lock:
+            if payload in self._cache:
+                self._cache.move_to_end(payload)
+                return True, self._cache[payload]
+            return False, None
+
+    def lookup(self, payload):
+        """Returns (product_id, customer_id) or None, asking the service if the payload is not cached."""
+        cached, match = self._cached(payload)
+        if not cached:
+            match = self.client.lookup(payload)
+            self._store(payload, match)
+        return match
+
+    def find(self, payload):
+        """Returns the cached (product_id, customer_id) or None; uncached payloads are looked up in the background."""
+        cached, match = self._cached(payload)
+        if cached:
+            return match
+        with self._lock:
+            if payload in self._pending:
+                return None
+            self._pending.add(payload)
+        self._lookups.submit(self._background_lookup, payload)
+        return None
+
+    def _background_lookup(self, payload):
+        try:
+            self._store(payload, self.client.lookup(payload))
+            self.last_error = None
+        except (ConnectionError, RuntimeError) as e:
+            if self.last_error is None:
+                logger.error("Background product lookup failed: %s", e)
+            self.last_error = e
+        finally:
+            with self._lock:
+                self._pending.discard(payload)
+
+    def close(self):
+        self._lookups.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Loopback load test ---
+
+async def _load_client(host, port, requests, depth, latencies):
+    """One terminal: keeps up to `depth` requests in flight and records each request's latency."""
+    reader, writer = await asyncio.open_connection(host, port)
+    sent_at = {}
+    in_flight = asyncio.Semaphore(depth)
+
+    async def send():
+        for number, request in enumerate(requests):
+            await in_flight.acquire()
+            sent_at[number] = time.perf_counter()
+            writer.write((json.dumps(dict(request, id=number)) + "\n").encode('utf-8'))
+            await writer.drain()
+
+    sender = asyncio.create_task(send())
+    for _ in requests:
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - sent_at.pop(response['id']))
+        in_flight.release()
+    await sender
+    writer.close()
+
+
+def _run_load(host, port, clients, requests_per_client, depth, product_ids, slices):
+    async def main():
+        latencies = []
+        jobs = []
+        for client in range(clients):
+            requests = []
+            for n in range(requests_per_client):
+                product_id = product_ids[(client * requests_per_client + n) % len(product_ids)]
+                if n % 2 == 0:
+                    requests.append({'op': 'lookup', 'payload': f"LBL-{product_id}-0009"})
+                else:
+                    requests.append({'op': 'validate', 'product_id': product_id, 'qr1': f"LBL-{product_id}-0009",
+                                     'qr2': f"C-{client}-{n}-0009", 'slices': slices,
+                                     'terminal': f"load-{client}"})
+            jobs.append(_load_client(host, port, requests, depth, latencies))
+        started = time.perf_counter()
+        await asyncio.gather(*jobs)
+        return latencies, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+def load_test(client_counts=(1, 10, 100), requests_per_client=200, depths=(1, 16), rows=100_000):
+    """
+    Starts the service in a separate process on loopback, over a synthetic
+    master CSV and temporary logs, and measures request latency with 1, 10
+    and 100 concurrent clients, each keeping 1 (no pipelining) or 16
+    requests in flight.
+
+    Returns:
+        list: {'clients', 'depth', 'requests', 'requests_per_s', 'p50_ms', 'p95_ms', 'p99_ms'}
+            per client count and depth.
+    """
+    import numpy as np
+
+    with tempfile.TemporaryDirectory(prefix="scan-service-") as workdir:
+        csv_path = os.path.join(workdir, "userr.csv")
+        product_ids = [f"PID{n:08d}" for n in range(rows)]
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            f.write("ProductID,CustomerID\n")
+            f.writelines(f"{pid},HHID3{n:08d}ID0018\n" for n, pid in enumerate(product_ids))
+
+        ready = multiprocessing.Queue()
+        server = multiprocessing.Process(target=run_service, kwargs={
+            'port': 0, 'ready': ready, 'csv_file_path': csv_path, 'data_dir': workdir, 'reload_interval': None})
+        server.start()
+        try:
+            port = ready.get(timeout=60)
+            results = []
+            for clients in client_counts:
+                for depth in depths:
+                    latencies, seconds = _run_load('127.0.0.1', port, clients, requests_per_client, depth,
+                                                   product_ids, [4, 14, 4, 14])
+                    p50, p95, p99 = np.quantile(latencies, [0.5, 0.95, 0.99]) * 1000
+                    results.append({'clients': clients, 'depth': depth, 'requests': len(latencies),
+                                    'requests_per_s': len(latencies) / seconds,
+                                    'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99)})
+            return results
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan validation service shared by many scanner terminals")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="run the service")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for all interfaces)")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--csv", default=DEFAULT_CSV_PATH, help="master CSV with ProductID/CustomerID")
+    serve.add_argument("--data-dir", default=DATA_DIR, help="where the match log, scans.db and pair list live")
+    serve.add_argument("--log-backend", choices=sorted(LOG_BACKENDS), default='tsv')
+    serve.add_argument("--dedup-window", type=float, default=300,
+                       help="seconds after a product/customer pair is logged during which it is not logged again")
+    serve.add_argument("--remember-pairs", action="store_true",
+                       help=f"never log a pair again that was logged in an earlier session (kept in {PAIR_LIST_NAME})")
+    serve.add_argument("--no-dedup", action="store_true", help="log every match, even repeated pairs")
+    serve.add_argument("--reload-interval", type=float, default=2.0,
+                       help="seconds between checks of the CSV for changes; 0 disables hot reload")
+
+    load = commands.add_parser("loadtest", help="measure latency over loopback with concurrent clients")
+    load.add_argument("--clients", type=int, nargs='+', default=[1, 10, 100])
+    load.add_argument("--requests", type=int, default=200, help="requests per client")
+    load.add_argument("--depth", type=int, nargs='+', default=[1, 16],
+                      help="requests each client keeps in flight; 1 is no pipelining (default: 1 16)")
+    load.add_argument("--rows", type=int, default=100_000, help="rows in the synthetic master CSV")
+
+    for command in (serve, load):
+        command.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format="%(levelname)s: %(message)s")
+    # The per-request comparison details would swamp the service's own log
+    logging.getLogger('fileOperation.checkDf').setLevel(max(logging.INFO, logging.getLogger().level))
+
+    if args.command == "serve":
+        run_service(args.host, args.port, csv_file_path=args.csv, data_dir=args.data_dir,
+                    log_backend=args.log_backend, dedup_window=None if args.no_dedup else args.dedup_window,
+                    remember_pairs=args.remember_pairs,
+                    reload_interval=args.reload_interval or None)
+    else:
+        print(f"{'clients':>8} {'depth':>6} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for row in load_test(args.clients, args.requests, args.depth, args.rows):
+            print(f"{row['clients']:>8} {row['depth']:>6} {row['requests']:>9} {row['requests_per_s']:>9.0f} "
+                  f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}")
@@ -0,0 +1,126 @@
+import argparse
+import json
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'site_profiles.json')
+
+# CustomerID slicing parameters, in the order they are asked for
+SLICE_KEYS = ('start_a', 'end_a', 'start_b', 'end_b')
+
+
+def load_profiles(path=DEFAULT_PROFILE_PATH):
+    """
+    Reads every saved site profile.
+
+    Returns:
+        dict: site name -> profile dict; empty if the file does not exist or
+              cannot be parsed.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profiles = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.error("Could not read site profiles from '%s': %s", path, e)
+        return {}
+    if not isinstance(profiles, dict):
+        logger.error("Ignoring site profiles in '%s': expected a JSON object", path)
+        return {}
+    return profiles
+
+
+def load_site_profile(site, path=DEFAULT_PROFILE_PATH):
+    """Returns the saved profile for `site`, or None if there is none."""
+    profile = load_profiles(path).get(site)
+    return profile if isinstance(profile, dict) else None
+
+
+def save_site_profile(site, profile, path=DEFAULT_PROFILE_PATH):
+    """
+    Merges `profile` into the saved profile for `site`. The file is replaced
+    atomically, so a crash never leaves a half-written profile behind.
+    """
+    profiles = load_profiles(path)
+    profiles[site] = dict(profiles.get(site) or {}, **profile)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+    logger.info("Saved profile for site '%s' to '%s'", site, path)
+
+
+def profile_slices(profile):
+    """
+    Returns (start_a, end_a, start_b, end_b) from a profile, or None if the
+    profile does not hold all four as integers.
+    """
+    if not profile:
+        return None
+    values = [profile.get(key) for key in SLICE_KEYS]
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return None
+    return tuple(values)
+
+
+def slices_profile(slices):
+    """The profile entries for a (start_a, end_a, start_b, end_b) tuple."""
+    return dict(zip(SLICE_KEYS, slices))
+
+
+def options_argv(parser, options):
+    """
+    Turns a profile's "options" object ({dest: value}) into command-line
+    arguments for `parser`, so they get the same type and choices checks as
+    flags typed by hand. A true value enables a store_true flag, a list
+    fills an nargs option.
+
+    Returns:
+        tuple: (argv list, names of options the parser does not have)
+    """
+    actions = {action.dest: action for action in parser._actions if action.option_strings}
+    argv = []
+    unknown = []
+    for name, value in options.items():
+        action = actions.get(name)
+        if action is None or name in ('site', 'profiles', 'help'):
+            unknown.append(name)
+        elif action.nargs == 0:
+            if value:
+                argv.append(action.option_strings[-1])
+        elif isinstance(value, list):
+            argv += [action.option_strings[-1]] + [str(item) for item in value]
+        elif value is not None:
+            argv += [action.option_strings[-1], str(value)]
+    return argv, unknown
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show and edit per-site scanner profiles")
+    parser.add_argument("--profiles", default=DEFAULT_PROFILE_PATH, help="site profile file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="list the saved sites")
+    show = commands.add_parser("show", help="print a site's profile")
+    show.add_argument("site")
+    set_slices = commands.add_parser("set-slices", help="save a site's CustomerID slicing parameters")
+    set_slices.add_argument("site")
+    set_slices.add_argument("slices", type=int, nargs=4, metavar=('START_A', 'END_A', 'START_B', 'END_B'))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    if args.command == "list":
+        for site, profile in sorted(load_profiles(args.profiles).items()):
+            slices = profile_slices(profile)
+            print(f"{site}: slices {slices if slices else 'not set'}")
+    elif args.command == "show":
+        profile = load_site_profile(args.site, args.profiles)
+        if profile is None:
+            print(f"Error: No profile for site '{args.site}'", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(profile, indent=2, sort_keys=True))
+    else:
+        save_site_profile(args.site, slices_profile(args.slices), args.profiles)
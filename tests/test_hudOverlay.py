@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+
+from hudOverlay import OverlayLayer, TextLine
+
+LINES = [
+    TextLine("STATE: Scan CUSTOMER QR", (20, 30), 0.7, (0, 255, 255), 1, True),
+    TextLine("Press 's' to SAVE customer QR & COMPARE", (20, 60), 0.7, (255, 255, 255), 1, True),
+    TextLine("Product ID (CSV): PID00001234", (20, 90), 0.49, (255, 255, 0), 1, False),
+    TextLine("QR1 Qty: 0009", (20, 120), 0.49, (255, 255, 0), 2, False),
+]
+
+
+def draw_direct(frame, lines, font=cv2.FONT_HERSHEY_SIMPLEX, padding=(10, 5)):
+    """The scanner's original per-frame drawing: a black box behind boxed lines, then putText."""
+    pad_x, pad_y = padding
+    for line in lines:
+        x, y = line.origin
+        if line.boxed:
+            (width, height), _ = cv2.getTextSize(line.text, font, line.scale, line.thickness)
+            cv2.rectangle(frame, (x - pad_x, y - height - pad_y), (x + width, y + pad_y), (0, 0, 0), -1)
+        cv2.putText(frame, line.text, (x, y), font, line.scale, line.color, line.thickness, cv2.LINE_AA)
+    return frame
+
+
+def test_composite_matches_direct_drawing_within_rounding():
+    frame = np.random.default_rng(0).integers(0, 256, (240, 480, 3), dtype=np.uint8)
+    expected = draw_direct(frame.copy(), LINES)
+
+    overlay = OverlayLayer()
+    overlay.update(tuple(LINES), lambda: LINES, frame.shape)
+    actual = overlay.composite(frame.copy())
+
+    # Anti-aliased edges are blended with integer arithmetic, so they may differ by one level
+    difference = np.abs(actual.astype(int) - expected.astype(int))
+    assert difference.max() <= 1
+
+
+def test_unchanged_key_does_not_render_again():
+    overlay = OverlayLayer()
+    shape = (240, 480, 3)
+    assert overlay.update('a', lambda: LINES, shape)
+    assert not overlay.update('a', lambda: LINES, shape)
+    assert overlay.update('b', lambda: LINES[:1], shape)
+    assert overlay.renders == 2
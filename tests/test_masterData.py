@@ -0,0 +1,40 @@
+import pandas as pd
+
+from fileOperation import checkDf
+from fileOperation.masterData import MasterDataWatcher, get_master_data, read_master_csv
+
+
+def test_delta_reload_matches_full_reload(tmp_path):
+    csv_path = tmp_path / "userr.csv"
+    csv_path.write_text("ProductID,CustomerID\nABCD,HHID3004ID0018\nCDEF, HHID3005ID0018 \n", encoding='utf-8')
+    watcher = MasterDataWatcher(str(csv_path), interval=60)
+    assert not watcher.check()  # the first poll hashes the loaded CSV
+
+    # Empty cells on either side, plus padding that is stripped
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.write("IJKL,\n,HHID9\n MNOP ,HHID3006ID0018\n")
+    assert not watcher.check()  # the next poll only sees the change
+    assert watcher.check()
+    assert watcher.delta_reloads == 1
+
+    delta = watcher.current.df
+    full = read_master_csv(str(csv_path))
+    pd.testing.assert_frame_equal(delta.reset_index(drop=True), full.reset_index(drop=True))
+    assert watcher.current.find_product("xx IJKL 0009") == ('IJKL', 'nan')
+    assert watcher.current.customer_id_for('MNOP') == 'HHID3006ID0018'
+
+
+def test_compare_uses_watched_copy_until_change_settles(tmp_path):
+    csv_path = tmp_path / "userr.csv"
+    csv_path.write_text("ProductID,CustomerID\nABCD,HHID3004ID0018\n", encoding='utf-8')
+    watcher = MasterDataWatcher(str(csv_path), interval=60).start()
+    try:
+        old = watcher.current
+        # A half-written row is not loaded by a scan, only by the watcher once it settles
+        with open(csv_path, 'a', encoding='utf-8') as f:
+            f.write("EFGH,HHID30")
+        assert get_master_data(str(csv_path)) is old
+        result = checkDf.compare_ids('EFGH', 'HHID30', 4, 6, 4, 6, csv_file_path=str(csv_path))
+        assert not result.match and result.csv_customer_id is None
+    finally:
+        watcher.stop()
@@ -0,0 +1,23 @@
+from fileOperation.productIndex import ProductIndex, SortedProductIndex
+
+
+def test_long_outlier_does_not_widen_other_ids():
+    product_ids = [f"HHID{n:04d}" for n in range(1000)] + ["X" * 1000]
+    customer_ids = [f"HHID3{n:04d}ID0018" for n in range(1001)]
+    index = SortedProductIndex(product_ids, customer_ids)
+
+    assert sum(keys.nbytes for keys, _, _ in index._buckets.values()) == 1000 * 8 + 1000
+    assert index.find("LBL-HHID0042-0009") == ('HHID0042', 'HHID30042ID0018')
+    assert index.get("X" * 1000) == 'HHID31000ID0018'
+
+
+def test_extended_matches_dict_index():
+    product_ids = ["ABCD", "CDEF", "AB", "ABCD", "EFGH", "CD", "Ä1"]
+    customer_ids = [f"C{n}" for n in range(len(product_ids))]
+    expected = ProductIndex(product_ids, customer_ids)
+    index = SortedProductIndex(product_ids[:3], customer_ids[:3]).extended(product_ids[3:], customer_ids[3:])
+
+    assert len(index) == len(expected)
+    for payload in ["xxABCDxx", "CDEF", "zzCDzz", "EFGH-AB", "Ä1", "none"]:
+        assert index.find(payload) == expected.find(payload)
+        assert index.get(payload) == expected.get(payload)
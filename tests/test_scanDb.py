@@ -0,0 +1,33 @@
+import gzip
+
+from fileOperation.matchLog import LOG_HEADER
+from fileOperation.scanDb import ScanDatabase, default_import_paths
+
+
+def test_default_import_skips_files_the_scanner_already_recorded(tmp_path):
+    db = ScanDatabase(str(tmp_path / "scans.db"))
+    db.record(timestamp='2026-01-01T10:00:00', qr1_content='A1', qr2_content='B1', match=True)
+    (tmp_path / "match_log.txt").write_text(LOG_HEADER + "\n2026-01-01T10:00:00\tA1\tB1\t1\t1\tA\tB\n")
+    (tmp_path / "scanned_pairs.json").write_text('["A1\\tB1"]')
+    with gzip.open(tmp_path / "match_log.20250101-000000.txt.gz", 'wt') as f:
+        f.write("X1\tY1\t0001\t0001\nX2\tY2\t0001\t0001\n")
+
+    paths = default_import_paths(str(tmp_path))
+    assert paths == [str(tmp_path / "match_log.20250101-000000.txt.gz")]
+    assert sum(db.import_file(path) for path in paths) == 2
+    # Imported explicitly, the structured log still adds nothing the scanner recorded
+    assert db.import_file(str(tmp_path / "match_log.txt")) == 0
+    assert db.count() == 3
+    db.close()
+
+
+def test_grown_file_imports_only_new_records(tmp_path):
+    db = ScanDatabase(str(tmp_path / "scans.db"))
+    log = tmp_path / "old_log.txt"
+    log.write_text("P1\tQ1\t0001\t0001\n")
+    assert db.import_file(str(log)) == 1
+    with open(log, 'a') as f:
+        f.write("P2\tQ2\t0001\t0001\n")
+    assert db.import_file(str(log)) == 1
+    assert sorted(scan['qr1_content'] for scan in db.query()) == ['P1', 'P2']
+    db.close()